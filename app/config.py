@@ -1 +1,55 @@
-BASE_URL = "https://dados.ons.org.br/api/3/action/package_show?id="
\ No newline at end of file
+import os
+import tempfile
+
+BASE_URL = "https://dados.ons.org.br/api/3/action/package_show?id="
+
+# Cache em disco dos parquets do ONS (compartilhado entre os workers do uvicorn).
+# PARQUET_CACHE_MAX_BYTES=0 desativa o cache.
+PARQUET_CACHE_DIR = os.getenv("PARQUET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ons_parquet_cache"))
+PARQUET_CACHE_MAX_BYTES = int(os.getenv("PARQUET_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Cache dos metadados dos pacotes do ONS (package_show): servidos por METADATA_TTL segundos,
+# depois servidos antigos por mais METADATA_STALE segundos enquanto atualizam em segundo plano.
+# A cópia em disco é compartilhada entre os workers; ONS_METADATA_TTL_SECONDS=0 desativa.
+ONS_METADATA_CACHE_DIR = os.getenv("ONS_METADATA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ons_metadata_cache"))
+ONS_METADATA_TTL_SECONDS = float(os.getenv("ONS_METADATA_TTL_SECONDS", "3600"))
+ONS_METADATA_STALE_SECONDS = float(os.getenv("ONS_METADATA_STALE_SECONDS", "86400"))
+
+# Downloads paralelos dos parquets anuais do ONS
+ONS_MAX_PARALLEL_DOWNLOADS = int(os.getenv("ONS_MAX_PARALLEL_DOWNLOADS", "4"))
+ONS_MAX_CONNECTIONS_PER_HOST = int(os.getenv("ONS_MAX_CONNECTIONS_PER_HOST", "8"))
+
+# Parquets a partir de ONS_RANGED_DOWNLOAD_MIN_BYTES são baixados em pedaços de
+# ONS_RANGED_CHUNK_BYTES (HTTP Range), em paralelo, quando o servidor aceita Range (0 desativa)
+ONS_RANGED_DOWNLOAD_MIN_BYTES = int(os.getenv("ONS_RANGED_DOWNLOAD_MIN_BYTES", str(16 * 1024 * 1024)))
+ONS_RANGED_CHUNK_BYTES = int(os.getenv("ONS_RANGED_CHUNK_BYTES", str(4 * 1024 * 1024)))
+
+# Cache em memória dos resultados filtrados (paginação por cursor em /data/ear e /data/hydro)
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "32"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "300"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+# Plano de dtypes compactos (categorical, float32, inteiros pequenos) na leitura dos parquets do ONS
+ONS_COMPACT_DTYPES = os.getenv("ONS_COMPACT_DTYPES", "true").lower() not in ("0", "false", "no")
+
+# Páginas JSON de /data/ear e /data/hydro sem filtro de nome decodificam só os row groups
+# que cobrem a página (estatísticas min/max da coluna de data), não o parquet inteiro
+ONS_LAZY_PAGES = os.getenv("ONS_LAZY_PAGES", "true").lower() not in ("0", "false", "no")
+
+# Execuções de /api/pipeline/run em segundo plano: quantas rodam ao mesmo tempo (as demais
+# esperam na fila) e quantos jobs terminados continuam consultáveis em /api/pipeline/jobs/{id}
+PIPELINE_MAX_CONCURRENT_JOBS = int(os.getenv("PIPELINE_MAX_CONCURRENT_JOBS", "2"))
+PIPELINE_JOB_HISTORY = int(os.getenv("PIPELINE_JOB_HISTORY", "100"))
+
+# Tamanho máximo (linhas) de cada pedaço lido dos parquets na extração do pipeline
+PIPELINE_CHUNK_ROWS = int(os.getenv("PIPELINE_CHUNK_ROWS", "100000"))
+
+# Uploads para o GCS: tamanho dos pedaços do upload resumable (múltiplo de 256 KiB),
+# e upload composto (partes em paralelo + compose) a partir de GCS_COMPOSITE_THRESHOLD bytes (0 desativa)
+GCS_UPLOAD_CHUNK_SIZE = int(os.getenv("GCS_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+GCS_COMPOSITE_THRESHOLD = int(os.getenv("GCS_COMPOSITE_THRESHOLD", str(128 * 1024 * 1024)))
+GCS_COMPOSITE_PART_SIZE = int(os.getenv("GCS_COMPOSITE_PART_SIZE", str(32 * 1024 * 1024)))
+GCS_UPLOAD_MAX_WORKERS = int(os.getenv("GCS_UPLOAD_MAX_WORKERS", "8"))
+
+# Por quanto tempo os metadados do BigQuery (dataset/tabela/schema) ficam em cache no processo
+BIGQUERY_METADATA_TTL_SECONDS = float(os.getenv("BIGQUERY_METADATA_TTL_SECONDS", "600"))
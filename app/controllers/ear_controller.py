@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Query
-from typing import Optional
+from typing import Literal, Optional
 from app.services.ons_service import get_reservoir_data
+from app.services.stream_service import stream_reservoir_data
 
 router = APIRouter()
 
@@ -9,42 +10,16 @@ def get_ear_data(
     package_id: str = Query(..., description="Package ID do dataset EAR"),
     ano: Optional[int] = Query(None, description="Ano específico"),
     mes: Optional[int] = Query(None, description="Mês específico"),
-    nome_reservatorio: Optional[str] = Query(None, description="Nome do reservatório para filtrar"),
+    nome_reservatorio: Optional[str] = Query(None, description="Nome(s) do reservatório, separados por vírgula (sem diferença de acento ou maiúsculas)"),
     start_date: Optional[str] = Query(None, description="Data inicial (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="Data final (YYYY-MM-DD)"),
-    page: int = Query(1, description="Número da página"),
-    page_size: int = Query(100, description="Tamanho da página")
+    page: int = Query(1, ge=1, description="Número da página"),
+    page_size: int = Query(100, ge=1, description="Tamanho da página"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devolvido em next_cursor (substitui page)"),
+    output_format: Literal["json", "ndjson", "arrow"] = Query(
+        "json", alias="format", description="json (paginado), ndjson ou arrow (streaming de todo o resultado)"
+    )
 ):
-    return get_reservoir_data(package_id, ano, mes, nome_reservatorio, start_date, end_date, page, page_size)
-
-def get_ear_data_direct(
-    package_id: str,
-    ano: Optional[int] = None,
-    mes: Optional[int] = None,
-    nome_reservatorio: Optional[str] = None,
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    page: int = 1,
-    page_size: int = 100
-):
-    try:
-        result = get_reservoir_data(
-            package_id=package_id,
-            ano=ano,
-            mes=mes,
-            nome_reservatorio=nome_reservatorio,
-            start_date=start_date,
-            end_date=end_date,
-            page=page,
-            page_size=page_size
-        )
-        
-        if hasattr(result, 'body'):
-            import json
-            data = json.loads(result.body)
-            return data.get('data', [])
-        else:
-            return result
-    except Exception as e:
-        print(f"Erro no ear_direct: {e}")
-        return []
+    if output_format != "json":
+        return stream_reservoir_data(package_id, ano, mes, nome_reservatorio, start_date, end_date, output_format)
+    return get_reservoir_data(package_id, ano, mes, nome_reservatorio, start_date, end_date, page, page_size, cursor=cursor)
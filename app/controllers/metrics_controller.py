@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from app.services.ons_service import download_metrics
+
+router = APIRouter()
+
+@router.get("/metrics/downloads")
+def get_download_metrics():
+    """Leituras do ONS feitas de fato (fresh) e coalescidas com uma leitura em andamento, desde o início do processo."""
+    return download_metrics()
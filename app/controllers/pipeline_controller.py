@@ -1,137 +1,411 @@
 from fastapi import APIRouter, Query
+from google.cloud.exceptions import NotFound
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
-import tempfile
-import os
+import asyncio
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import logging
 import traceback
+from typing import Iterator, List, Literal, Optional, Tuple
 
-from app.controllers.registry_controller import get_registry_direct
-from app.controllers.ear_controller import get_ear_data_direct
-from app.controllers.hydro_controller import get_hydro_data_direct
+from app.config import PIPELINE_JOB_HISTORY, PIPELINE_MAX_CONCURRENT_JOBS
 from app.pipeline.extractors.ons_extractor import (
-    extract_registry_to_df, extract_ear_to_df, extract_hydro_to_df
+    extract_registry_df, extract_ear_df, extract_hydro_df
 )
-from app.pipeline.transformers.data_cleaner import normalize_and_clean
+from app.pipeline.transformers.data_cleaner import normalize_and_clean_frames
 from app.pipeline.transformers.aggregator import aggregate_ear_hydro_registry
-from app.services.gcs_service import upload_to_gcs
+from app.services.gcs_service import upload_bytes_to_gcs
 from app.services.bigquery_service import BigQueryService
-from app.pipeline.transformers.feature_engineering import create_lags, create_diffs, create_rolling_mean
+from app.services.job_runner import Job, JobConflict, JobRunner
+from app.services.ons_dtypes import concat_frames, widen_floats
+from app.services.ons_service import warm_parquet_cache_async
+from app.services.watermark_service import read_watermark, write_watermark
+from app.pipeline.transformers.feature_engineering import create_features, lag, diff, rolling_mean, warmup_periods
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.post("/pipeline/run")
-async def run_pipeline(
-    registry_package_id: str = Query(..., description="Package ID do metadados dos reservatórios"),
-    ear_package_id: str = Query(..., description="Package ID do EAR"),
-    hydro_package_id: str = Query(..., description="Package ID do Hydro"),
-    start_date: str = Query(..., description="Data inicial (YYYY-MM-DD)"),
-    end_date: str = Query(..., description="Data final (YYYY-MM-DD)"),
-    load_to_bigquery: bool = Query(True, description="Carregar dados no BigQuery")
-):
-    try:
-        logger.info("Iniciando pipeline...")
+FEATURE_SPECS = [
+    lag("val_volumeutilcon", 1),
+    lag("val_volumeutilcon", 7),
+    lag("val_volumeutilcon", 14),
+    lag("val_volumeutilcon", 30),
+    diff("val_volumeutilcon", 1),
+    diff("val_volumeutilcon", 7),
+    rolling_mean("val_volumeutilcon", 7),
+]
 
-        # 1. Extração dos dados
-        raw_registry = get_registry_direct(registry_package_id)
-        df_registry = extract_registry_to_df(raw_registry)
+# As etapas abaixo são síncronas (requests, pandas, GCS, BigQuery) e rodam nas
+# threads do JobRunner, fora do event loop e da requisição HTTP.
+_job_runner = JobRunner(PIPELINE_MAX_CONCURRENT_JOBS, PIPELINE_JOB_HISTORY)
 
-        raw_ear = get_ear_data_direct(ear_package_id, start_date=start_date, end_date=end_date, page_size=10000)
-        df_ear = extract_ear_to_df(raw_ear)
+def _committed_watermark(bucket_name: str, ear_package_id: str, hydro_package_id: str):
+    """
+    Marca d'água do pacote EAR já confirmada no BigQuery. Se a execução anterior
+    deixou um load pendente, as datas dele só contam depois que o job terminar
+    sem erros. Retorna (watermark, load_running); sem marca d'água (ou com outro
+    pacote hydro) watermark é None e a execução é completa.
+    """
+    watermark = read_watermark(bucket_name, ear_package_id)
+    if not watermark or watermark.get("hydro_package_id") != hydro_package_id:
+        return None, False
 
-        raw_hydro = get_hydro_data_direct(hydro_package_id, start_date=start_date, end_date=end_date, page_size=10000)
-        df_hydro = extract_hydro_to_df(raw_hydro)
+    pending = watermark.get("pending")
+    if pending:
+        status = BigQueryService().get_job_status(pending["job_id"], pending.get("location"))
+        if status["state"] != "DONE":
+            return watermark, True
+        if not status["errors"]:
+            watermark = {**watermark, "last_date": pending["last_date"], "scale": pending["scale"]}
+    return watermark, False
 
-        # 2. Agregação (merge)
-        df_final = aggregate_ear_hydro_registry(df_ear, df_hydro, df_registry)
+def _plan_incremental(watermark, start_date: str):
+    """
+    Retorna (since, extract_start, scale): o primeiro dia novo, o início da
+    extração (since menos o aquecimento das features diárias) e a escala de
+    normalização já usada na tabela.
+    """
+    if not watermark or not watermark.get("last_date"):
+        return None, start_date, {}
 
-        for col in ["val_volumeutilcon", "ear_reservatorio_percentual", "ear_total_mwmes", "val_volmax"]:
-            if col in df_final.columns:
-                df_final[col] = pd.to_numeric(df_final[col], errors="coerce")
+    since = max(pd.Timestamp(watermark["last_date"]) + pd.Timedelta(days=1), pd.Timestamp(start_date))
+    extract_start = since - pd.Timedelta(days=warmup_periods(FEATURE_SPECS))
+    return since, extract_start.strftime("%Y-%m-%d"), dict(watermark.get("scale") or {})
 
+def _data_dates(df_final: pd.DataFrame) -> pd.Series:
+    """Dia de cada linha (ano/mes/dia vindos de ear_data)."""
+    return pd.to_datetime(
+        df_final[["ano", "mes", "dia"]].rename(columns={"ano": "year", "mes": "month", "dia": "day"}),
+        errors="coerce"
+    )
 
-        # 3. Feature engineering
-        df_final = create_lags(df_final, columns="val_volumeutilcon", lag=1, groupby="id_reservatorio")
-        df_final = create_lags(df_final, columns="val_volumeutilcon", lag=7, groupby="id_reservatorio")
-        df_final = create_lags(df_final, columns="val_volumeutilcon", lag=14, groupby="id_reservatorio")
-        df_final = create_lags(df_final, columns="val_volumeutilcon", lag=30, groupby="id_reservatorio")
-        df_final = create_diffs(df_final, columns="val_volumeutilcon", periods=1, groupby="id_reservatorio")
-        df_final = create_diffs(df_final, columns="val_volumeutilcon", periods=7, groupby="id_reservatorio")
-        df_final = create_rolling_mean(df_final, columns="val_volumeutilcon", window=7, groupby="id_reservatorio")
+def _last_written_date(df_final: pd.DataFrame):
+    if df_final.empty or not {"ano", "mes", "dia"} <= set(df_final.columns):
+        return None
+    return _data_dates(df_final).max().strftime("%Y-%m-%d")
 
-        # 4. Limpeza e normalização FINAL
-        df_final = normalize_and_clean(df_final)
+def _partition_range(df_final: pd.DataFrame):
+    if df_final.empty or "partition_date" not in df_final.columns:
+        return None
+    return {"min": str(df_final["partition_date"].min()), "max": str(df_final["partition_date"].max())}
 
-        # 5. Remove registros sem id_reservatorio (extra segurança)
-        df_final = df_final[df_final["id_reservatorio"].notnull() & (df_final["id_reservatorio"] != "")]
+def _year_windows(start_date: str, end_date: str) -> List[Tuple[str, str]]:
+    """Janelas [início, fim] de até um ano-calendário que cobrem o intervalo."""
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    windows = []
+    while start <= end:
+        window_end = min(pd.Timestamp(year=start.year, month=12, day=31), end)
+        windows.append((start.strftime("%Y-%m-%d"), window_end.strftime("%Y-%m-%d")))
+        start = window_end + pd.Timedelta(days=1)
+    return windows
 
-        today = datetime.now().strftime("%Y-%m-%d")
-        df_final['processed_date'] = today
-        df_final['partition_date'] = today
-        logger.info(f"DataFrame final tem {len(df_final)} registros")
+def _aggregate(df_ear: pd.DataFrame, df_hydro: pd.DataFrame, df_registry: pd.DataFrame) -> pd.DataFrame:
+    # 2. Agregação (merge)
+    df = aggregate_ear_hydro_registry(df_ear, df_hydro, df_registry)
 
-        print(df_final.dtypes)
-        print(df_final.head(10))
+    # float32 da leitura compacta volta a float64 antes das contas (features e normalização)
+    df = widen_floats(df)
+    for col in ["val_volumeutilcon", "ear_reservatorio_percentual", "ear_total_mwmes", "val_volmax"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
 
-        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as temp_csv:
-            df_final.to_csv(temp_csv.name, index=False, encoding="utf-8", sep=",")
-            temp_csv_path = temp_csv.name
+def _group_tail(df: pd.DataFrame, periods: int) -> pd.DataFrame:
+    # últimas `periods` linhas de cada reservatório, na ordem atual
+    if periods <= 0 or df.empty:
+        return df.iloc[:0]
+    return df[df.groupby("id_reservatorio", sort=False).cumcount(ascending=False) < periods]
 
-        logger.info(f"CSV temporário salvo: {temp_csv_path}")
+def _iter_feature_windows(
+    df_registry: pd.DataFrame,
+    ear_package_id: str,
+    hydro_package_id: str,
+    start_date: str,
+    end_date: str,
+    since: pd.Timestamp = None,
+    rows: dict = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Extrai, agrega e calcula as features ano a ano, devolvendo as linhas novas
+    (a partir de since) de cada janela. Cada janela começa com as últimas linhas
+    de cada reservatório da anterior (o aquecimento das features), então o
+    resultado é o mesmo de processar o intervalo inteiro de uma vez, mas só os
+    dados brutos de um ano ficam em memória por vez.
+    """
+    warmup = warmup_periods(FEATURE_SPECS)
+    rows = rows if rows is not None else {}
+    carry = None
+    for window_start, window_end in _year_windows(start_date, end_date):
+        # 1. Extração dos dados da janela
+        df_ear = extract_ear_df(ear_package_id, window_start, window_end)
+        if df_ear.empty:
+            # ano sem EAR: a série de cada reservatório continua da janela anterior
+            continue
+        df_hydro = extract_hydro_df(hydro_package_id, window_start, window_end)
+        rows["ear"] = rows.get("ear", 0) + len(df_ear)
+        rows["hydro"] = rows.get("hydro", 0) + len(df_hydro)
+        if df_hydro.empty:
+            # sem volume útil as linhas do ano cairiam na limpeza; as features recomeçam depois delas
+            logger.warning(f"Sem dados hidráulicos entre {window_start} e {window_end}; janela ignorada")
+            carry = None
+            continue
 
-        # Envia para GCS
-        bucket_name = "sauter_university"
-        gcs_blob_name = f"Data_Engineering/processed/date={today}/processed_dataset.csv"
-        gcs_url = upload_to_gcs(bucket_name, temp_csv_path, gcs_blob_name)
+        df = _aggregate(df_ear, df_hydro, df_registry)
+        del df_ear, df_hydro
+        carried = 0 if carry is None else len(carry)
+        if carried:
+            df = concat_frames([carry, df]).reset_index(drop=True)
 
-        logger.info(f"Arquivo enviado para GCS: {gcs_url}")
+        # 3. Feature engineering (uma ordenação e um agrupamento para todas as features)
+        base_columns = list(df.columns)
+        df = create_features(df, FEATURE_SPECS, groupby="id_reservatorio")
+        carry = _group_tail(df[base_columns], warmup)
+        df = df.iloc[carried:]
 
-        # Carrega no BigQuery
-        bigquery_result = None
-        if load_to_bigquery:
-            try:
-                logger.info("Iniciando carregamento no BigQuery...")
-                bq_service = BigQueryService()
-                gcs_uri = f"gs://{bucket_name}/{gcs_blob_name}"
+        # Execução incremental: só os dias novos seguem; os anteriores serviram de aquecimento
+        if since is not None and "ear_data" in df.columns:
+            df = df[df["ear_data"] >= since]
+        yield df
 
-                bigquery_result = bq_service.load_pipeline_data(
-                    gcs_uri=gcs_uri,
-                    sample_df=df_final
-                )
-                logger.info("Dados carregados no BigQuery com sucesso")
-            except Exception as e:
-                logger.error(f"Erro ao carregar no BigQuery: {str(e)}")
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                bigquery_result = {"error": str(e)}
+def _transform(
+    df_registry: pd.DataFrame,
+    ear_package_id: str,
+    hydro_package_id: str,
+    start_date: str,
+    end_date: str,
+    today: str,
+    since: pd.Timestamp = None,
+    scale: dict = None,
+    rows: dict = None
+) -> pd.DataFrame:
+    windows = _iter_feature_windows(df_registry, ear_package_id, hydro_package_id, start_date, end_date, since, rows)
 
-        os.remove(temp_csv_path)
-        logger.info("Arquivo temporário removido")
+    # 4. Limpeza e normalização FINAL (escala ajustada sobre todas as janelas)
+    frames = normalize_and_clean_frames(windows, scale=scale)
 
-        return JSONResponse(
-            status_code=200,
-            content={
-                "message": "Pipeline executada com sucesso",
-                "gcs_url": gcs_url,
-                "rows": len(df_final),
-                "partition_date": today,
-                "file_path": gcs_blob_name,
-                "bigquery_result": bigquery_result
+    # 5. Remove registros sem id_reservatorio (extra segurança)
+    frames = [df[df["id_reservatorio"].notnull() & (df["id_reservatorio"] != "")] for df in frames]
+    if not frames:
+        return pd.DataFrame()
+    df_final = (concat_frames(frames) if len(frames) > 1 else frames[0]).reset_index(drop=True)
+
+    # DATE no BigQuery (schema explícito). partition_date é o dia dos dados, não o do
+    # processamento (a tabela é particionada por mês dele): reprocessar um intervalo
+    # em outro dia substitui os mesmos dias
+    df_final['processed_date'] = pd.Timestamp(today).date()
+    df_final['partition_date'] = _data_dates(df_final).dt.date
+    logger.info(f"DataFrame final tem {len(df_final)} registros")
+
+    print(df_final.dtypes)
+    print(df_final.head(10))
+    return df_final
+
+def _parquet_bytes(df_final: pd.DataFrame) -> bytes:
+    table = pa.Table.from_pandas(df_final, preserve_index=False)
+    buffer = pa.BufferOutputStream()
+    pq.write_table(table, buffer, compression="zstd")
+    return buffer.getvalue().to_pybytes()
+
+def _upload_parquet(df_final: pd.DataFrame, bucket_name: str, gcs_blob_name: str) -> str:
+    # serializa em memória: nada de arquivo temporário no disco (em RAM) do Cloud Run
+    data = _parquet_bytes(df_final)
+    logger.info(f"Parquet em memória: {len(data)} bytes para {len(df_final)} registros")
+    return upload_bytes_to_gcs(bucket_name, data, gcs_blob_name)
+
+def _submit_bigquery_load(gcs_uri: str, df_final: pd.DataFrame, write_mode: str):
+    # só dispara o job; o andamento é consultado em /pipeline/bigquery/jobs/{job_id}
+    bq_service = BigQueryService()
+    return bq_service.submit_pipeline_load(
+        gcs_uri=gcs_uri,
+        sample_df=df_final,
+        write_mode=write_mode
+    )
+
+def _bigquery_job_status(job_id: str, location: Optional[str]):
+    return BigQueryService().get_job_status(job_id, location)
+
+async def _warm_sources(
+    registry_package_id: str, ear_package_id: str, hydro_package_id: str, start_date: str, end_date: str
+) -> None:
+    warm_results = await asyncio.gather(
+        warm_parquet_cache_async(registry_package_id),
+        warm_parquet_cache_async(ear_package_id, start_date, end_date),
+        warm_parquet_cache_async(hydro_package_id, start_date, end_date),
+        return_exceptions=True
+    )
+    for result in warm_results:
+        if isinstance(result, Exception):
+            logger.warning(f"Falha ao pré-carregar parquets ({result}); a extração fará o download")
+
+def _run_pipeline_job(job: Job) -> Tuple[int, dict]:
+    """Executa a pipeline de um job; retorna (status_code, resultado)."""
+    params = job.params
+    registry_package_id = params["registry_package_id"]
+    ear_package_id = params["ear_package_id"]
+    hydro_package_id = params["hydro_package_id"]
+    start_date, end_date = params["start_date"], params["end_date"]
+    incremental, write_mode = params["incremental"], params["write_mode"]
+
+    logger.info(f"Iniciando pipeline (job {job.id})...")
+    bucket_name = "sauter_university"
+
+    watermark, since, extract_start, scale = None, None, start_date, None
+    if incremental:
+        with job.stage("watermark"):
+            watermark, load_running = _committed_watermark(bucket_name, ear_package_id, hydro_package_id)
+        if load_running:
+            return 409, {
+                "error": "O load da execução incremental anterior ainda está em andamento",
+                "job_id": watermark["pending"]["job_id"]
             }
+        since, extract_start, scale = _plan_incremental(watermark, start_date)
+        committed_scale = dict(scale)
+        if since is not None and since > pd.Timestamp(end_date):
+            logger.info(f"Nada novo até {end_date}; pipeline incremental encerrada")
+            return 200, {"message": "Nenhuma data nova para processar", "rows": 0}
+        logger.info(f"Execução incremental a partir de {since} (extração desde {extract_start})")
+
+    # 0. Download assíncrono dos parquets para o cache em disco
+    with job.stage("warm"):
+        asyncio.run(_warm_sources(registry_package_id, ear_package_id, hydro_package_id, extract_start, end_date))
+
+    # 1-5. Extração (DataFrames tipados direto dos parquets), agregação, features e limpeza, ano a ano
+    today = datetime.now().strftime("%Y-%m-%d")
+    with job.stage("extract_transform") as stage:
+        df_registry = extract_registry_df(registry_package_id)
+        rows = {"registry": len(df_registry), "ear": 0, "hydro": 0}
+        df_final = _transform(
+            df_registry, ear_package_id, hydro_package_id, extract_start, end_date, today, since, scale, rows
         )
+        stage["rows"] = {**rows, "output": len(df_final)}
 
-    except Exception as e:
-        error_message = str(e)
-        error_traceback = traceback.format_exc()
+    if df_final.empty:
+        message = "Nenhuma data nova para processar" if incremental else "Nenhum dado encontrado no intervalo"
+        return 200, {"message": message, "rows": 0}
+
+    # Envia para GCS
+    gcs_blob_name = f"Data_Engineering/processed/date={today}/processed_dataset.parquet"
+    with job.stage("upload") as stage:
+        gcs_url = _upload_parquet(df_final, bucket_name, gcs_blob_name)
+        stage["rows"] = len(df_final)
+
+    logger.info(f"Arquivo enviado para GCS: {gcs_url}")
+
+    # Carrega no BigQuery: o job de load é só disparado, a pipeline não espera por ele
+    bigquery_result = None
+    if params["load_to_bigquery"]:
+        try:
+            with job.stage("bigquery"):
+                logger.info("Iniciando carregamento no BigQuery...")
+                gcs_uri = f"gs://{bucket_name}/{gcs_blob_name}"
+                bigquery_result = _submit_bigquery_load(gcs_uri, df_final, write_mode)
+            bigquery_result["status_url"] = (
+                f"/api/pipeline/bigquery/jobs/{bigquery_result['job_id']}?location={bigquery_result['location']}"
+            )
+            logger.info(f"Load job {bigquery_result['job_id']} disparado")
+        except Exception as e:
+            logger.error(f"Erro ao carregar no BigQuery: {str(e)}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            bigquery_result = {"error": str(e)}
+
+    # Marca d'água: sem BigQuery avança na hora; com load, fica pendente até o job terminar sem erros
+    last_date = None
+    if incremental and not (bigquery_result and "error" in bigquery_result):
+        last_date = _last_written_date(df_final)
+        metadata = {"hydro_package_id": hydro_package_id}
+        if bigquery_result:
+            metadata["pending"] = {
+                "job_id": bigquery_result["job_id"],
+                "location": bigquery_result["location"],
+                "last_date": last_date,
+                "scale": scale
+            }
+            committed_date = watermark.get("last_date") if watermark else None
+            write_watermark(bucket_name, ear_package_id, committed_date, committed_scale, metadata)
+        else:
+            write_watermark(bucket_name, ear_package_id, last_date, scale, metadata)
 
-        logger.error(f"Erro na execução do pipeline: {error_message}")
-        logger.error(f"Traceback completo: {error_traceback}")
+    return 200, {
+        "message": "Pipeline executada com sucesso",
+        "gcs_url": gcs_url,
+        "rows": len(df_final),
+        "processed_date": today,
+        "partitions": _partition_range(df_final),
+        "file_path": gcs_blob_name,
+        "bigquery_result": bigquery_result,
+        "watermark": last_date
+    }
 
+@router.post("/pipeline/run", status_code=202)
+async def run_pipeline(
+    registry_package_id: str = Query(..., description="Package ID do metadados dos reservatórios"),
+    ear_package_id: str = Query(..., description="Package ID do EAR"),
+    hydro_package_id: str = Query(..., description="Package ID do Hydro"),
+    start_date: str = Query(..., description="Data inicial (YYYY-MM-DD)"),
+    end_date: str = Query(..., description="Data final (YYYY-MM-DD)"),
+    load_to_bigquery: bool = Query(True, description="Carregar dados no BigQuery"),
+    incremental: bool = Query(False, description="Processar só as datas após a última execução incremental"),
+    write_mode: Literal["merge", "partition", "append"] = Query(
+        "merge", description="merge: substitui as linhas do mesmo reservatório/dia; partition: substitui os dias (data do dado) presentes no arquivo; append: só acrescenta"
+    )
+):
+    # A pipeline roda em segundo plano (pool limitado por PIPELINE_MAX_CONCURRENT_JOBS);
+    # o andamento é consultado em /pipeline/jobs/{job_id}
+    params = {
+        "registry_package_id": registry_package_id,
+        "ear_package_id": ear_package_id,
+        "hydro_package_id": hydro_package_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "load_to_bigquery": load_to_bigquery,
+        "incremental": incremental,
+        "write_mode": write_mode,
+    }
+    # execuções incrementais do mesmo pacote EAR leem e gravam a mesma marca d'água: uma de cada vez
+    exclusive = f"incremental:{ear_package_id}" if incremental else None
+    try:
+        job, created = _job_runner.submit(params, _run_pipeline_job, exclusive=exclusive)
+    except JobConflict as e:
         return JSONResponse(
-            status_code=500,
+            status_code=409,
             content={
-                "error": error_message,
-                "traceback": error_traceback if logger.level <= logging.DEBUG else None
+                "error": "Já existe uma execução incremental em andamento para este pacote EAR",
+                "job_id": e.job.id,
+                "status_url": f"/api/pipeline/jobs/{e.job.id}"
             }
-        )
\ No newline at end of file
+        )
+    if not created:
+        logger.info(f"Pipeline com os mesmos parâmetros já em andamento: job {job.id}")
+    return JSONResponse(
+        status_code=202,
+        content={
+            "job_id": job.id,
+            "state": job.state,
+            "deduplicated": not created,
+            "status_url": f"/api/pipeline/jobs/{job.id}"
+        }
+    )
+
+@router.get("/pipeline/jobs/{job_id}")
+async def get_pipeline_job(job_id: str):
+    job = _job_runner.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job {job_id} não encontrado"})
+    return JSONResponse(status_code=200, content=job.to_dict())
+
+@router.get("/pipeline/bigquery/jobs/{job_id}")
+async def get_bigquery_job(
+    job_id: str,
+    location: Optional[str] = Query(None, description="Localização do job (retornada junto com o job_id)")
+):
+    try:
+        status = await run_in_threadpool(_bigquery_job_status, job_id, location)
+        return JSONResponse(status_code=200, content=status)
+    except NotFound:
+        return JSONResponse(status_code=404, content={"error": f"Job {job_id} não encontrado"})
+    except Exception as e:
+        logger.error(f"Erro ao consultar o job {job_id}: {str(e)}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
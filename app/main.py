@@ -3,7 +3,8 @@ from app.controllers import (
     ear_controller, 
     hydro_controller, 
     registry_controller,
-    pipeline_controller
+    pipeline_controller,
+    metrics_controller
 )
 
 app = FastAPI(
@@ -17,6 +18,7 @@ app.include_router(ear_controller.router, prefix="/api", tags=["EAR"])
 app.include_router(hydro_controller.router, prefix="/api", tags=["Hydro"])
 app.include_router(registry_controller.router, prefix="/api", tags=["Registry"])
 app.include_router(pipeline_controller.router, prefix="/api", tags=["Pipeline"])
+app.include_router(metrics_controller.router, prefix="/api", tags=["Metrics"])
 
 @app.get("/")
 def read_root():
@@ -1,72 +1,108 @@
+import numpy as np
 import pandas as pd
 import logging
-from typing import Any, List, Dict
+from typing import Iterator, List, Optional
+
+from app.config import PIPELINE_CHUNK_ROWS
+from app.services.ons_dtypes import concat_frames
+from app.services.ons_service import (
+    fetch_package_metadata, find_parquet_url, read_parquet_from_url, iter_reservoir_chunks, resolve_date_range
+)
 
 logger = logging.getLogger(__name__)
 
-def extract_registry_to_df(raw_data: Any) -> pd.DataFrame:
+# Colunas usadas pelo aggregator (chaves de junção + colunas finais)
+PIPELINE_COLUMNS = [
+    "nom_reservatorio",
+    "tip_reservatorio",
+    "nom_bacia",
+    "id_reservatorio",
+    "ear_data",
+    "ear_reservatorio_percentual",
+    "ear_total_mwmes",
+    "val_volmax",
+    "din_instante",
+    "val_volumeutilcon",
+]
+
+def _normalize_types(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Transforma dados brutos do registry controller em DataFrame
+    Mantém as mesmas chaves de junção que a extração via JSON produzia:
+    textos sem espaços nas pontas (vazio vira nulo) e datas truncadas no dia.
     """
-    try:
-        if isinstance(raw_data, dict):
-            # Se é dict com 'data' key
-            if 'data' in raw_data:
-                return pd.DataFrame(raw_data['data'])
-            # Se é dict simples
-            else:
-                return pd.DataFrame([raw_data])
-        elif isinstance(raw_data, list):
-            # Se é lista de registros
-            return pd.DataFrame(raw_data)
-        else:
-            logger.warning(f"Formato de dados registry desconhecido: {type(raw_data)}")
-            return pd.DataFrame()
-            
-    except Exception as e:
-        logger.error(f"Erro ao transformar registry em DataFrame: {e}")
-        return pd.DataFrame()
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            df[col] = df[col].dt.normalize()
+        elif isinstance(dtype, pd.CategoricalDtype):
+            if pd.api.types.infer_dtype(dtype.categories, skipna=True) == "string":
+                # limpa as categorias (poucas) e refaz os códigos, sem tocar em cada linha como texto
+                stripped = dtype.categories.str.strip()
+                codes, categories = pd.factorize(stripped.where(stripped != ""))
+                old_codes = df[col].cat.codes.to_numpy()
+                new_codes = np.where(old_codes < 0, -1, codes[old_codes])
+                df[col] = pd.Categorical.from_codes(new_codes, categories=categories)
+        elif pd.api.types.is_string_dtype(dtype) and pd.api.types.infer_dtype(df[col], skipna=True) == "string":
+            stripped = df[col].str.strip()
+            df[col] = stripped.where(stripped != "")
+    return df
 
-def extract_hydro_to_df(raw_data: Any) -> pd.DataFrame:
+def extract_registry_df(package_id: str, columns: Optional[List[str]] = PIPELINE_COLUMNS) -> pd.DataFrame:
     """
-    Transforma dados brutos do hydro controller em DataFrame
+    Lê o parquet de metadados dos reservatórios direto para um DataFrame tipado
     """
     try:
-        if isinstance(raw_data, dict):
-            if 'data' in raw_data:
-                return pd.DataFrame(raw_data['data'])
-            else:
-                return pd.DataFrame([raw_data])
-        elif isinstance(raw_data, list):
-            return pd.DataFrame(raw_data)
-        else:
-            logger.warning(f"Formato de dados hydro desconhecido: {type(raw_data)}")
+        metadata = fetch_package_metadata(package_id)
+        url = find_parquet_url(metadata)
+        if not url:
+            logger.warning(f"Nenhum arquivo parquet encontrado para o registry {package_id}")
             return pd.DataFrame()
-            
+        df = read_parquet_from_url(url, columns=columns)
+        return _normalize_types(df)
     except Exception as e:
-        logger.error(f"Erro ao transformar hydro em DataFrame: {e}")
-        return pd.DataFrame()
+        logger.error(f"Erro ao extrair registry: {e}")
+        raise
 
-def extract_ear_to_df(raw_data: Any) -> pd.DataFrame:
+def extract_reservoir_chunks(
+    package_id: str,
+    start_date: str,
+    end_date: str,
+    columns: Optional[List[str]] = PIPELINE_COLUMNS,
+    chunk_rows: int = PIPELINE_CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    Percorre todo o intervalo (EAR ou hidráulicos) em DataFrames tipados de até
+    chunk_rows linhas, ano a ano, sem carregar um parquet anual inteiro
+    """
+    start_ts, end_ts = resolve_date_range(None, None, start_date, end_date)
+    for chunk in iter_reservoir_chunks(package_id, start_ts, end_ts, chunk_rows, columns=columns):
+        yield _normalize_types(chunk)
+
+def extract_reservoir_df(
+    package_id: str,
+    start_date: str,
+    end_date: str,
+    columns: Optional[List[str]] = PIPELINE_COLUMNS,
+    chunk_rows: int = PIPELINE_CHUNK_ROWS
+) -> pd.DataFrame:
+    """
+    Junta os pedaços de extract_reservoir_chunks: só as colunas projetadas e já
+    filtradas ficam em memória, nunca o parquet anual bruto. O intervalo inteiro
+    vai para um DataFrame só; a pipeline chama ano a ano para limitar a memória.
+    """
     try:
-        if isinstance(raw_data, dict):
-            if 'data' in raw_data:
-                return pd.DataFrame(raw_data['data'])
-            else:
-                return pd.DataFrame([raw_data])
-        elif isinstance(raw_data, list):
-            return pd.DataFrame(raw_data)
-        else:
-            logger.warning(f"Formato de dados EAR desconhecido: {type(raw_data)}")
+        chunks = list(extract_reservoir_chunks(package_id, start_date, end_date, columns, chunk_rows))
+        if not chunks:
+            logger.warning(f"Nenhum dado encontrado para {package_id} entre {start_date} e {end_date}")
             return pd.DataFrame()
-            
+        logger.info(f"{package_id}: {sum(len(c) for c in chunks)} registros extraídos em {len(chunks)} pedaços")
+        return concat_frames(chunks)
     except Exception as e:
-        logger.error(f"Erro ao transformar EAR em DataFrame: {e}")
-        return pd.DataFrame()
+        logger.error(f"Erro ao extrair dados de {package_id}: {e}")
+        raise
 
-def process_dates(df: pd.DataFrame, df_hydro_sel: pd.DataFrame) -> None:
-    """
-    Processa as colunas de data dos DataFrames df e df_hydro_sel, convertendo para o tipo datetime.date
-    """
-    df["ear_data"] = pd.to_datetime(df["ear_data"]).dt.date
-    df_hydro_sel["din_instante"] = pd.to_datetime(df_hydro_sel["din_instante"]).dt.date
\ No newline at end of file
+def extract_ear_df(package_id: str, start_date: str, end_date: str) -> pd.DataFrame:
+    return extract_reservoir_df(package_id, start_date, end_date)
+
+def extract_hydro_df(package_id: str, start_date: str, end_date: str) -> pd.DataFrame:
+    return extract_reservoir_df(package_id, start_date, end_date)
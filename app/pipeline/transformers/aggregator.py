@@ -1,99 +1,111 @@
+import numpy as np
 import pandas as pd
 import logging
+from typing import List, Tuple
+
+from app.services.ons_dates import parse_dates
 
 logger = logging.getLogger(__name__)
 
+# Colunas finais (exatamente como no SQL)
+FINAL_COLUMNS = [
+    'nom_reservatorio',
+    'tip_reservatorio',
+    'nom_bacia',
+    'ear_data',
+    'ear_reservatorio_percentual',
+    'ear_total_mwmes',
+    'val_volmax',
+    'id_reservatorio',
+    'val_volumeutilcon'
+]
+
+# Presentes no EAR e no registry, ficam com o valor do EAR
+_EAR_PREFERRED = ('nom_bacia', 'tip_reservatorio')
+# Só estas colunas entram nos joins: as finais e a data do hidráulico
+_JOIN_COLUMNS = FINAL_COLUMNS + ['din_instante']
+
+
+def _key_codes(left: List[pd.Series], right: List[pd.Series]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    A chave (uma ou mais colunas) dos dois lados como um único inteiro comum: o
+    merge compara inteiros em vez de texto ou categorias diferentes. Nulo tem
+    código próprio e casa com nulo, como no pd.merge.
+    """
+    left_key, right_key, width = 0, 0, 1
+    for left_col, right_col in zip(left, right):
+        codes, uniques = pd.factorize(pd.concat([left_col, right_col], ignore_index=True), use_na_sentinel=False)
+        left_key = left_key * len(uniques) + codes[:len(left_col)]
+        right_key = right_key * len(uniques) + codes[len(left_col):]
+        width *= len(uniques)
+        if width > 2 ** 32:
+            # mantém a chave combinada longe do estouro do int64
+            codes, uniques = pd.factorize(np.concatenate([left_key, right_key]))
+            left_key, right_key, width = codes[:len(left_key)], codes[len(left_key):], len(uniques)
+    return left_key, right_key
+
+
+def _join_columns(df: pd.DataFrame, exclude: List[str] = ()) -> pd.DataFrame:
+    return df[[col for col in df.columns if col in _JOIN_COLUMNS and col not in exclude]]
+
+
 def aggregate_ear_hydro_registry(
     df_ear: pd.DataFrame,
     df_hydro: pd.DataFrame,
     df_registry: pd.DataFrame
 ) -> pd.DataFrame:
-    # Log inicial
+    """
+    EAR + registry (por nom_reservatorio) + hidráulicos (por id_reservatorio,
+    nom_bacia e data), com o mesmo resultado dos dois pd.merge anteriores: só
+    as colunas usadas entram nos joins e as chaves viram códigos inteiros.
+    """
     logger.info(f"Iniciando agregação com EAR: {len(df_ear)}, HYDRO: {len(df_hydro)}, REGISTRY: {len(df_registry)} registros")
-    
-    # 1. Primeiro JOIN: EAR com REGISTRY (por nom_reservatorio)
-    df_merged = pd.merge(
-        df_ear,
-        df_registry,
-        on='nom_reservatorio',
-        how='left'
+
+    # 1. EAR com REGISTRY (por nom_reservatorio), registry indexado pelo código da chave
+    ear_keys, registry_keys = _key_codes([df_ear['nom_reservatorio']], [df_registry['nom_reservatorio']])
+    registry = _join_columns(df_registry, exclude=['nom_reservatorio'])
+    registry = registry.set_index(pd.Index(registry_keys, name='_registry_key'))
+    df_final = _join_columns(df_ear).assign(_registry_key=ear_keys).join(
+        registry, on='_registry_key', lsuffix='_x', rsuffix='_y'
     )
-    logger.info(f"Após primeiro JOIN (EAR + REGISTRY): {len(df_merged)} registros")
-    
-    # Verificar quais colunas estão disponíveis após o primeiro merge
-    logger.info(f"Colunas após primeiro merge: {sorted(df_merged.columns.tolist())}")
-    
-    # CORREÇÃO: Ajustar nomes de colunas após o primeiro merge
-    # Se nom_bacia_x existe, renomear para nom_bacia
-    if 'nom_bacia_x' in df_merged.columns:
-        df_merged['nom_bacia'] = df_merged['nom_bacia_x']
-    elif 'nom_bacia_y' in df_merged.columns:
-        df_merged['nom_bacia'] = df_merged['nom_bacia_y']
-        
-    # Se tip_reservatorio_x existe, renomear para tip_reservatorio
-    if 'tip_reservatorio_x' in df_merged.columns:
-        df_merged['tip_reservatorio'] = df_merged['tip_reservatorio_x']
-    elif 'tip_reservatorio_y' in df_merged.columns:
-        df_merged['tip_reservatorio'] = df_merged['tip_reservatorio_y']
-    
-    # 2. Segundo JOIN: resultado anterior com HYDRO
-    # Garantir que as colunas de junção existam antes de prosseguir
+    for name in _EAR_PREFERRED:
+        if f"{name}_x" in df_final.columns:
+            df_final[name] = df_final[f"{name}_x"]
+    logger.info(f"Após primeiro JOIN (EAR + REGISTRY): {len(df_final)} registros")
+
+    # 2. Resultado anterior com HYDRO (por id_reservatorio, nom_bacia e data)
     join_columns_left = ['id_reservatorio', 'nom_bacia', 'ear_data']
     join_columns_right = ['id_reservatorio', 'nom_bacia', 'din_instante']
-    
-    # Verificar se as colunas existem
-    if all(col in df_merged.columns for col in join_columns_left) and all(col in df_hydro.columns for col in join_columns_right[:2]):
-        # Converter datas para datetime para comparação adequada
-        if 'ear_data' in df_merged.columns:
-            df_merged['ear_data'] = pd.to_datetime(df_merged['ear_data'], errors='coerce')
-        if 'din_instante' in df_hydro.columns:
-            df_hydro['din_instante'] = pd.to_datetime(df_hydro['din_instante'], errors='coerce')
-        
-        # Executar o segundo JOIN
-        df_final = pd.merge(
-            df_merged,
-            df_hydro,
-            left_on=join_columns_left,
-            right_on=join_columns_right,
-            how='left'
+    if all(col in df_final.columns for col in join_columns_left) and all(col in df_hydro.columns for col in join_columns_right):
+        df_final['ear_data'] = parse_dates(df_final['ear_data'])
+        hydro_dates = parse_dates(df_hydro['din_instante'])
+        left_keys, right_keys = _key_codes(
+            [df_final[col] for col in join_columns_left],
+            [df_hydro['id_reservatorio'], df_hydro['nom_bacia'], hydro_dates]
         )
+        hydro = _join_columns(df_hydro, exclude=join_columns_right)
+        hydro = hydro.set_index(pd.Index(right_keys, name='_hydro_key'))
+        df_final = df_final.assign(_hydro_key=left_keys).join(hydro, on='_hydro_key', lsuffix='_x', rsuffix='_y')
         logger.info(f"Após segundo JOIN (merged + HYDRO): {len(df_final)} registros")
     else:
         logger.warning("Colunas necessárias para o segundo JOIN não encontradas. Mantendo apenas o primeiro merge.")
-        df_final = df_merged
-    
-    # 3. Selecionar as colunas finais (exatamente como no SQL)
-    final_cols = [
-        'nom_reservatorio',
-        'tip_reservatorio',
-        'nom_bacia',
-        'ear_data',
-        'ear_reservatorio_percentual',
-        'ear_total_mwmes',
-        'val_volmax',
-        'id_reservatorio',
-        'val_volumeutilcon'
-    ]
-    
-    # Filtrar apenas as colunas que existem (evita KeyError)
-    existing_cols = [col for col in final_cols if col in df_final.columns]
+
+    # 3. Só as colunas finais que existem (evita KeyError)
+    existing_cols = [col for col in FINAL_COLUMNS if col in df_final.columns]
     logger.info(f"Colunas que existem no resultado final: {existing_cols}")
-    logger.info(f"Colunas que faltam no resultado final: {set(final_cols) - set(existing_cols)}")
-    
-    # IMPORTANTE: Verificar se val_volumeutilcon está presente
+    logger.info(f"Colunas que faltam no resultado final: {set(FINAL_COLUMNS) - set(existing_cols)}")
+
     if 'val_volumeutilcon' not in df_final.columns:
         logger.warning("A coluna val_volumeutilcon não está presente! O feature engineering falhará.")
-    
-    result = df_final[existing_cols].copy()
-    
-    # Adicionar logs para depuração
+
+    result = df_final[existing_cols].reset_index(drop=True)
+
     if 'ear_data' in result.columns:
         try:
-            anos = result['ear_data'].dt.year.unique()
-            logger.info(f"Anos presentes no resultado final: {sorted(anos)}")
             contagem_por_ano = result['ear_data'].dt.year.value_counts().sort_index()
+            logger.info(f"Anos presentes no resultado final: {contagem_por_ano.index.tolist()}")
             logger.info(f"Contagem por ano: {contagem_por_ano.to_dict()}")
-        except:
+        except Exception:
             logger.warning("Não foi possível analisar anos nos resultados")
-    
-    return result.reset_index(drop=True)
\ No newline at end of file
+
+    return result
@@ -1,15 +1,27 @@
 import pandas as pd
+from typing import Dict, Iterable, List, Optional
 from sklearn.preprocessing import MinMaxScaler
 
-def normalize_and_clean(df: pd.DataFrame, date_col: str = "ear_data"):
+from app.services.ons_dates import parse_dates
+from app.services.ons_dtypes import CALENDAR_COLUMNS
+
+# Colunas mantidas como estão (não normalizadas)
+KEY_COLUMNS = ["id_reservatorio", "dia", "mes", "ano"]
+
+def clean_columns(df: pd.DataFrame, date_col: str = "ear_data") -> pd.DataFrame:
+    """Dia/mês/ano a partir da data, sem as colunas de texto: só chaves e colunas numéricas."""
     df = df.copy()
 
     # 1. Criar colunas de dia, mês e ano a partir da data
     if date_col in df.columns:
-        df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+        # já vem datetime64 da extração; texto é convertido uma vez só
+        df[date_col] = parse_dates(df[date_col])
         df["dia"] = df[date_col].dt.day
         df["mes"] = df[date_col].dt.month
         df["ano"] = df[date_col].dt.year
+        if df[date_col].notna().all():
+            # inteiros pequenos (sem datas nulas não há NaN para guardar)
+            df = df.astype({col: dtype for col, dtype in CALENDAR_COLUMNS.items()})
 
     # 2. Remover colunas de nomes/texto
     cols_to_drop = ["nom_reservatorio", "tip_reservatorio", "nom_bacia", "ear_data"]
@@ -18,20 +30,57 @@ def normalize_and_clean(df: pd.DataFrame, date_col: str = "ear_data"):
             df = df.drop(columns=col)
 
     # 3. Selecionar apenas colunas numéricas (exceto id_reservatorio, dia, mes, ano)
-    cols_to_keep = ["id_reservatorio", "dia", "mes", "ano"]
     numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
-    cols_final = cols_to_keep + [col for col in numeric_cols if col not in cols_to_keep]
-    df = df[cols_final]
+    cols_final = KEY_COLUMNS + [col for col in numeric_cols if col not in KEY_COLUMNS]
+    return df[cols_final]
+
+def normalize_and_clean_frames(
+    frames: Iterable[pd.DataFrame],
+    date_col: str = "ear_data",
+    scale: Optional[Dict[str, List[float]]] = None
+) -> List[pd.DataFrame]:
+    """
+    normalize_and_clean sobre vários pedaços de um mesmo lote (ex: um por ano):
+    cada pedaço é limpo assim que chega e a escala é ajustada sobre todos, então
+    o resultado é o mesmo de normalize_and_clean sobre os pedaços concatenados.
+    """
+    cleaned = [clean_columns(df, date_col) for df in frames]
+
+    # pedaços sem alguma coluna numérica ficam com ela nula, como numa concatenação
+    columns = list(dict.fromkeys(col for df in cleaned for col in df.columns))
+    cleaned = [df if list(df.columns) == columns else df.reindex(columns=columns) for df in cleaned]
 
     # 4. Normalizar colunas numéricas (exceto id_reservatorio, dia, mes, ano)
-    cols_to_normalize = [col for col in df.columns if col not in cols_to_keep]
-    if cols_to_normalize:
+    cols_to_normalize = [col for col in columns if col not in KEY_COLUMNS]
+    non_empty = [df for df in cleaned if len(df)]
+    if cols_to_normalize and non_empty and scale is None:
         scaler = MinMaxScaler()
-        df[cols_to_normalize] = scaler.fit_transform(df[cols_to_normalize])
+        for df in non_empty:
+            scaler.partial_fit(df[cols_to_normalize])
+        for df in non_empty:
+            df[cols_to_normalize] = scaler.transform(df[cols_to_normalize])
+    elif cols_to_normalize and scale is not None:
+        for col in cols_to_normalize:
+            if col not in scale and any(df[col].notnull().any() for df in cleaned):
+                scale[col] = [
+                    float(min(df[col].min() for df in cleaned if df[col].notnull().any())),
+                    float(max(df[col].max() for df in cleaned if df[col].notnull().any()))
+                ]
+            if col in scale:
+                low, high = scale[col]
+                for df in cleaned:
+                    df[col] = (df[col] - low) / ((high - low) or 1.0)
 
     # 5. Limpeza: remover linhas onde val_volumeutilcon é nulo
-    if "val_volumeutilcon" in df.columns:
-        df = df[df["val_volumeutilcon"].notnull()]
+    if "val_volumeutilcon" in columns:
+        cleaned = [df[df["val_volumeutilcon"].notnull()] for df in cleaned]
+
+    return [df.reset_index(drop=True) for df in cleaned]
 
-    df = df.reset_index(drop=True)
-    return df
\ No newline at end of file
+def normalize_and_clean(df: pd.DataFrame, date_col: str = "ear_data", scale: Optional[Dict[str, List[float]]] = None):
+    """
+    scale: escala min/max persistida entre execuções ({coluna: [min, max]}).
+    Sem ela a normalização é ajustada neste lote; com ela os valores usam a
+    escala guardada e colunas ainda ausentes são ajustadas e gravadas no dicionário.
+    """
+    return normalize_and_clean_frames([df], date_col, scale)[0]
@@ -1,5 +1,6 @@
+import numpy as np
 import pandas as pd
-from typing import List, Union
+from typing import Dict, List, NamedTuple, Tuple, Union
 
 def create_lags(df: pd.DataFrame, columns: Union[str, List[str]], lag: int = 1, groupby: Union[str, List[str], None] = None) -> pd.DataFrame:
     """
@@ -61,4 +62,151 @@ def create_rolling_mean(df: pd.DataFrame, columns: Union[str, List[str]], window
     else:
         for col in columns:
             df_copy[f"{col}_rollingmean{window}"] = df_copy[col].rolling(window, min_periods=1).mean()
-    return df_copy
\ No newline at end of file
+    return df_copy
+
+class FeatureSpec(NamedTuple):
+    """
+    Uma feature de série temporal calculada por create_features.
+    - kind: "lag", "diff", "rolling_mean" ou "ewm_mean"
+    - column: coluna numérica de origem
+    - param: lag/periods, janela da média móvel ou span da média exponencial
+    Os nomes gerados seguem as funções acima: {col}_lag{n}, {col}_diff{n},
+    {col}_rollingmean{n} e {col}_ewm{n}.
+    """
+    kind: str
+    column: str
+    param: Union[int, float]
+
+    @property
+    def name(self) -> str:
+        suffix = {"lag": "lag", "diff": "diff", "rolling_mean": "rollingmean", "ewm_mean": "ewm"}[self.kind]
+        return f"{self.column}_{suffix}{self.param}"
+
+def lag(column: str, periods: int = 1) -> FeatureSpec:
+    return FeatureSpec("lag", column, periods)
+
+def diff(column: str, periods: int = 1) -> FeatureSpec:
+    return FeatureSpec("diff", column, periods)
+
+def rolling_mean(column: str, window: int = 3) -> FeatureSpec:
+    return FeatureSpec("rolling_mean", column, window)
+
+def ewm_mean(column: str, span: Union[int, float]) -> FeatureSpec:
+    return FeatureSpec("ewm_mean", column, span)
+
+def warmup_periods(specs: List[FeatureSpec]) -> int:
+    """
+    Quantos períodos anteriores ao primeiro registro novo são necessários para
+    que as features de specs saiam iguais às de uma execução completa.
+    A média exponencial depende de todo o histórico e não entra na conta.
+    """
+    periods = [0]
+    for spec in specs:
+        if spec.kind in ("lag", "diff"):
+            periods.append(max(spec.param, 0))
+        elif spec.kind == "rolling_mean":
+            periods.append(spec.param - 1)
+    return max(periods)
+
+def _group_shift(
+    values: np.ndarray, periods: int, pos: np.ndarray, remaining: np.ndarray, fill: float = np.nan
+) -> np.ndarray:
+    # shift dentro de cada grupo; values já está ordenado por grupo
+    out = np.full(len(values), fill)
+    if periods == 0:
+        out[:] = values
+    elif 0 < periods < len(values):
+        out[periods:] = values[:-periods]
+        out[pos < periods] = fill
+    elif 0 < -periods < len(values):
+        out[:periods] = values[-periods:]
+        out[remaining < -periods] = fill
+    return out
+
+def create_features(
+    df: pd.DataFrame,
+    specs: List[FeatureSpec],
+    groupby: Union[str, List[str], None] = None,
+    order_by: Union[str, List[str], None] = None
+) -> pd.DataFrame:
+    """
+    Calcula todas as features de specs com uma única ordenação e um único
+    agrupamento, em numpy, e devolve o DataFrame com as novas colunas.
+    - groupby: coluna(s) que separam as séries (ex: id_reservatorio); linhas
+      com chave nula recebem NaN, como em df.groupby(...)
+    - order_by: coluna(s) que ordenam cada série; sem ela vale a ordem atual
+      das linhas, como em create_lags/create_diffs/create_rolling_mean
+    """
+    n = len(df)
+    if groupby is not None:
+        codes = df.groupby(groupby, sort=False).ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        null_key = codes < 0
+    else:
+        codes = np.zeros(n, dtype=np.int64)
+        null_key = np.zeros(n, dtype=bool)
+
+    if order_by is not None:
+        order_cols = [order_by] if isinstance(order_by, str) else list(order_by)
+        keys = [df[c].to_numpy() for c in reversed(order_cols)]
+        order = np.lexsort(keys + [codes])
+    else:
+        order = np.argsort(codes, kind="stable")
+
+    # posição de cada linha (já ordenada) dentro do seu grupo, a partir do início e do fim
+    sorted_codes = codes[order]
+    boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [n]))
+    sizes = ends - starts
+    pos = np.arange(n) - np.repeat(starts, sizes)
+    remaining = np.repeat(ends, sizes) - np.arange(n) - 1
+
+    sorted_values: Dict[str, np.ndarray] = {}
+    shifts: Dict[Tuple[str, int], np.ndarray] = {}
+
+    def values_of(col: str) -> np.ndarray:
+        if col not in sorted_values:
+            sorted_values[col] = df[col].to_numpy(dtype="float64", na_value=np.nan)[order]
+        return sorted_values[col]
+
+    def shifted(col: str, periods: int) -> np.ndarray:
+        if (col, periods) not in shifts:
+            shifts[(col, periods)] = _group_shift(values_of(col), periods, pos, remaining)
+        return shifts[(col, periods)]
+
+    features = {}
+    for spec in specs:
+        if spec.kind == "lag":
+            result = shifted(spec.column, spec.param)
+        elif spec.kind == "diff":
+            result = values_of(spec.column) - shifted(spec.column, spec.param)
+        elif spec.kind == "rolling_mean":
+            # média das observações não nulas da janela (min_periods=1)
+            values = values_of(spec.column)
+            valid = ~np.isnan(values)
+            filled = np.where(valid, values, 0.0)
+            total = np.zeros(n)
+            count = np.zeros(n)
+            for k in range(spec.param):
+                total += _group_shift(filled, k, pos, remaining, fill=0.0)
+                count += _group_shift(valid, k, pos, remaining, fill=0.0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = np.where(count > 0, total / count, np.nan)
+        elif spec.kind == "ewm_mean":
+            # kernel compilado do pandas percorrendo os grupos já contíguos
+            result = (
+                pd.Series(values_of(spec.column))
+                .groupby(sorted_codes, sort=False)
+                .ewm(span=spec.param)
+                .mean()
+                .to_numpy()
+            )
+        else:
+            raise ValueError(f"Tipo de feature desconhecido: {spec.kind}")
+
+        unsorted = np.empty(n)
+        unsorted[order] = result
+        unsorted[null_key] = np.nan
+        features[spec.name] = unsorted
+
+    return df.assign(**features)
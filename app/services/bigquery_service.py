@@ -1,96 +1,449 @@
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
 import logging
+import threading
+import time
+import uuid
 import pandas as pd
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import BIGQUERY_METADATA_TTL_SECONDS
 
 logger = logging.getLogger(__name__)
 
+WRITE_MODES = ("append", "merge", "partition")
+# chave natural de uma linha da tabela processada: reservatório + dia
+MERGE_KEYS = ["id_reservatorio", "ano", "mes", "dia"]
+CLUSTERING_FIELDS = ["id_reservatorio"]
+# partição mensal pelo dia dos dados: 2000–2024 são ~300 partições, longe dos
+# limites do BigQuery (4.000 partições por job, 10.000 por tabela)
+PARTITION_TYPE = bigquery.TimePartitioningType.MONTH
+MAX_PARTITIONS_PER_JOB = 4000
+SCHEMA_VERSION_LABEL = "schema_version"
+# nomes do SQL padrão que a API pode devolver no schema da tabela
+_TYPE_ALIASES = {"INT64": "INTEGER", "FLOAT64": "FLOAT", "BOOL": "BOOLEAN"}
+
+_clients: Dict[str, bigquery.Client] = {}
+_clients_lock = threading.Lock()
+
+# Metadados conhecidos por processo: datasets que existem e tabelas (None = não existe),
+# com o instante da consulta. Invalidados quando o próprio serviço altera a tabela.
+_datasets: Dict[str, float] = {}
+_tables: Dict[str, tuple] = {}
+_metadata_lock = threading.Lock()
+
+
+def get_bigquery_client(project_id: str) -> bigquery.Client:
+    """Cliente do BigQuery compartilhado pelo processo (um por projeto)."""
+    with _clients_lock:
+        client = _clients.get(project_id)
+        if client is None:
+            client = bigquery.Client(project=project_id)
+            _clients[project_id] = client
+        return client
+
+
+def reset_bigquery_clients() -> None:
+    """Descarta clientes e metadados em cache (testes ou troca de credenciais)."""
+    with _clients_lock:
+        _clients.clear()
+    with _metadata_lock:
+        _datasets.clear()
+        _tables.clear()
+
+
+def _fresh(checked_at: float) -> bool:
+    return time.monotonic() - checked_at < BIGQUERY_METADATA_TTL_SECONDS
+
+
+def bigquery_type(series: pd.Series) -> str:
+    """Tipo do BigQuery para uma coluna do DataFrame final da pipeline"""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return bigquery_type(pd.Series(dtype.categories))
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "FLOAT"
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return "TIMESTAMP"
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return "DATETIME"
+    non_null = series.dropna()
+    if len(non_null) and isinstance(non_null.iloc[0], date) and not isinstance(non_null.iloc[0], datetime):
+        return "DATE"
+    return "STRING"
+
+
+def schema_from_dataframe(df: pd.DataFrame) -> List[bigquery.SchemaField]:
+    return [bigquery.SchemaField(str(col), bigquery_type(df[col]), mode="NULLABLE") for col in df.columns]
+
+
+def _partitions(sample_df: pd.DataFrame) -> List[str]:
+    """Partições mensais (YYYYMM) de partition_date que o arquivo toca, em ordem."""
+    dates = pd.to_datetime(sample_df["partition_date"])
+    if dates.isna().any():
+        raise ValueError("partition_date nulo não é aceito")
+    partitions = sorted(dates.dt.strftime("%Y%m").unique())
+    if len(partitions) > MAX_PARTITIONS_PER_JOB:
+        raise ValueError(
+            f"O arquivo toca {len(partitions)} partições; o BigQuery aceita até {MAX_PARTITIONS_PER_JOB} por job"
+        )
+    return partitions
+
+
+def _check_partitioning(table: Optional[bigquery.Table]) -> None:
+    """Recusa a tabela antiga, particionada por dia (de processamento)."""
+    partitioning = getattr(table, "time_partitioning", None)
+    if partitioning is not None and partitioning.type_ == bigquery.TimePartitioningType.DAY:
+        raise ValueError(
+            f"A tabela {table.full_table_id} é particionada por dia; recrie-a particionada por mês "
+            "de partition_date (ver README, \"Migração da partição\")"
+        )
+
+
+def build_merge_script(
+    table_ref: str,
+    staging_ref: str,
+    gcs_uri: str,
+    columns: List[str],
+    keys: List[str] = MERGE_KEYS
+) -> str:
+    """
+    Script do BigQuery que carrega o arquivo numa tabela de staging (expira em
+    1 dia se o script falhar no meio), faz MERGE na tabela final pela chave e
+    apaga o staging. Roda como um único job consultável por get_job_status.
+    """
+    missing = [k for k in keys if k not in columns]
+    if missing:
+        raise ValueError(f"Colunas da chave do merge ausentes: {missing}")
+
+    def q(name: str) -> str:
+        return f"`{name}`"
+
+    file_format = "PARQUET" if gcs_uri.endswith(".parquet") else "CSV"
+    file_options = f"format = '{file_format}', uris = ['{gcs_uri}']"
+    if file_format == "CSV":
+        file_options += ", skip_leading_rows = 1"
+    on = " AND ".join(f"T.{q(k)} = S.{q(k)}" for k in keys)
+    updates = ", ".join(f"{q(c)} = S.{q(c)}" for c in columns if c not in keys)
+    insert_columns = ", ".join(q(c) for c in columns)
+    insert_values = ", ".join(f"S.{q(c)}" for c in columns)
+    partition = ", ".join(q(k) for k in keys)
+    when_matched = f"WHEN MATCHED THEN UPDATE SET {updates}\n" if updates else ""
+
+    return (
+        f"LOAD DATA OVERWRITE {q(staging_ref)}\n"
+        f"OPTIONS (expiration_timestamp = TIMESTAMP_ADD(CURRENT_TIMESTAMP(), INTERVAL 1 DAY))\n"
+        f"FROM FILES ({file_options});\n"
+        f"MERGE {q(table_ref)} T\n"
+        f"USING (SELECT * FROM {q(staging_ref)} WHERE TRUE QUALIFY ROW_NUMBER() OVER (PARTITION BY {partition}) = 1) S\n"
+        f"ON {on}\n"
+        f"{when_matched}"
+        f"WHEN NOT MATCHED THEN INSERT ({insert_columns}) VALUES ({insert_values});\n"
+        f"DROP TABLE {q(staging_ref)};"
+    )
+
+
+def build_partition_replace_script(
+    table_ref: str,
+    staging_ref: str,
+    gcs_uri: str,
+    columns: List[str],
+    partition_field: str = "partition_date"
+) -> str:
+    """
+    Script do BigQuery que carrega o arquivo numa tabela de staging e, numa
+    transação, apaga da tabela final os dias (partition_date) que o arquivo
+    traz e insere as linhas dele. Reexecutar o mesmo intervalo substitui esses
+    dias em vez de duplicar linhas; os outros dias do mês ficam como estão.
+    """
+    if partition_field not in columns:
+        raise ValueError(f"Coluna de partição ausente: {partition_field}")
+
+    def q(name: str) -> str:
+        return f"`{name}`"
+
+    file_format = "PARQUET" if gcs_uri.endswith(".parquet") else "CSV"
+    file_options = f"format = '{file_format}', uris = ['{gcs_uri}']"
+    if file_format == "CSV":
+        file_options += ", skip_leading_rows = 1"
+    column_list = ", ".join(q(c) for c in columns)
+
+    return (
+        f"DECLARE days ARRAY<DATE>;\n"
+        f"LOAD DATA OVERWRITE {q(staging_ref)}\n"
+        f"OPTIONS (expiration_timestamp = TIMESTAMP_ADD(CURRENT_TIMESTAMP(), INTERVAL 1 DAY))\n"
+        f"FROM FILES ({file_options});\n"
+        f"SET days = (SELECT ARRAY_AGG(DISTINCT {q(partition_field)}) FROM {q(staging_ref)});\n"
+        f"BEGIN TRANSACTION;\n"
+        f"DELETE FROM {q(table_ref)} WHERE {q(partition_field)} IN UNNEST(days);\n"
+        f"INSERT INTO {q(table_ref)} ({column_list}) SELECT {column_list} FROM {q(staging_ref)};\n"
+        f"COMMIT TRANSACTION;\n"
+        f"DROP TABLE {q(staging_ref)};"
+    )
+
+
 class BigQueryService:
     def __init__(self, project_id: str = None, dataset_id: str = None):
         self.project_id = project_id or "graphite-byte-472516-n8"
         self.dataset_id = dataset_id or "SauterUniversity"
         self.table_name = "processed_reservatorios"
-        self.client = bigquery.Client(project=self.project_id)
+        self.client = get_bigquery_client(self.project_id)
         logger.info(f"BigQuery configurado: {self.project_id}.{self.dataset_id}.{self.table_name}")
-    
-    def load_pipeline_data(self, gcs_uri: str, sample_df: pd.DataFrame = None):
+
+    @property
+    def table_ref(self) -> str:
+        return f"{self.project_id}.{self.dataset_id}.{self.table_name}"
+
+    def ensure_dataset(self):
+        """Garante que o dataset existe (consultado uma vez por processo)"""
+        dataset_ref = f"{self.project_id}.{self.dataset_id}"
+        with _metadata_lock:
+            checked_at = _datasets.get(dataset_ref)
+        if checked_at is not None and _fresh(checked_at):
+            return
+
+        try:
+            self.client.get_dataset(dataset_ref)
+            logger.info(f"Dataset {dataset_ref} já existe")
+        except NotFound:
+            dataset = bigquery.Dataset(dataset_ref)
+            dataset.location = "US"  # ou "southamerica-east1" para Brasil
+            self.client.create_dataset(dataset, exists_ok=True)
+            logger.info(f"Dataset {dataset_ref} criado")
+        with _metadata_lock:
+            _datasets[dataset_ref] = time.monotonic()
+
+    def get_table_cached(self) -> Optional[bigquery.Table]:
+        """Tabela (com schema) em cache; None se ela não existe"""
+        with _metadata_lock:
+            cached = _tables.get(self.table_ref)
+        if cached is not None and _fresh(cached[0]):
+            return cached[1]
+
+        try:
+            table = self.client.get_table(self.table_ref)
+        except NotFound:
+            table = None
+        with _metadata_lock:
+            _tables[self.table_ref] = (time.monotonic(), table)
+        return table
+
+    def invalidate_metadata(self):
+        with _metadata_lock:
+            _tables.pop(self.table_ref, None)
+
+    def _remember_table(self, table: Optional[bigquery.Table]):
+        with _metadata_lock:
+            _tables[self.table_ref] = (time.monotonic(), table)
+
+    def ensure_table_schema(self, sample_df: pd.DataFrame) -> Tuple[bigquery.Table, bool]:
         """
-        Carrega dados do GCS para BigQuery de forma simples e robusta
+        Garante a tabela com o schema explícito derivado de sample_df: cria (particionada
+        por mês de partition_date, clusterizada por id_reservatorio) ou acrescenta as colunas
+        novas, subindo o label schema_version. Coluna existente com outro tipo nos dados
+        gera ValueError. Retorna (tabela, criada).
         """
-        try:
-            logger.info(f"Iniciando load para: {gcs_uri}")
-            
-            # Garantir que dataset existe
-            dataset_ref = f"{self.project_id}.{self.dataset_id}"
-            try:
-                self.client.get_dataset(dataset_ref)
-                logger.info(f"Dataset {dataset_ref} já existe")
-            except NotFound:
-                dataset = bigquery.Dataset(dataset_ref)
-                dataset.location = "US"  # ou "southamerica-east1" para Brasil
-                dataset = self.client.create_dataset(dataset)
-                logger.info(f"Dataset {dataset_ref} criado")
-            
-            table_ref = f"{self.project_id}.{self.dataset_id}.{self.table_name}"
-            
-            # Verificar se tabela existe
-            table_exists = False
+        schema = schema_from_dataframe(sample_df)
+        clustering = [c for c in CLUSTERING_FIELDS if c in sample_df.columns] or None
+        table = self.get_table_cached()
+
+        if table is None:
+            table = bigquery.Table(self.table_ref, schema=schema)
+            if "partition_date" in sample_df.columns:
+                table.time_partitioning = bigquery.TimePartitioning(
+                    type_=PARTITION_TYPE,
+                    field="partition_date"
+                )
+            table.clustering_fields = clustering
+            table.labels = {SCHEMA_VERSION_LABEL: "1"}
+            table = self.client.create_table(table, exists_ok=True)
+            self._remember_table(table)
+            logger.info(f"Tabela {self.table_ref} criada com {len(schema)} colunas (schema_version=1)")
+            return table, True
+
+        _check_partitioning(table)
+        existing = {field.name: field for field in table.schema}
+        mismatched = [
+            f"{field.name} ({existing[field.name].field_type} na tabela, {field.field_type} nos dados)"
+            for field in schema
+            if field.name in existing
+            and _TYPE_ALIASES.get(existing[field.name].field_type, existing[field.name].field_type) != field.field_type
+        ]
+        if mismatched:
+            # o load com o schema dos dados falharia depois com um erro pouco claro do BigQuery
+            raise ValueError(f"Colunas com tipo diferente do da tabela {self.table_ref}: {', '.join(mismatched)}")
+        new_fields = [field for field in schema if field.name not in existing]
+
+        changes = {}
+        if new_fields:
+            version = int((table.labels or {}).get(SCHEMA_VERSION_LABEL, "1")) + 1
+            changes["schema"] = list(table.schema) + new_fields
+            changes["labels"] = {**(table.labels or {}), SCHEMA_VERSION_LABEL: str(version)}
+            logger.info(f"Novas colunas {[f.name for f in new_fields]}; schema_version={version}")
+        if clustering and table.clustering_fields != clustering:
+            changes["clustering_fields"] = clustering
+
+        if changes:
+            for attribute, value in changes.items():
+                setattr(table, attribute, value)
             try:
-                table = self.client.get_table(table_ref)
-                table_exists = True
-                logger.info(f"Tabela existe com {table.num_rows} registros - usando schema existente")
-            except NotFound:
+                table = self.client.update_table(table, list(changes))
+            except Exception:
+                self.invalidate_metadata()
+                raise
+            self._remember_table(table)
+        return table, False
+
+    def _start_load(self, gcs_uri: str, sample_df: pd.DataFrame = None, write_mode: str = "append"):
+        if write_mode not in WRITE_MODES:
+            raise ValueError(f"write_mode inválido: {write_mode}. Use um de {WRITE_MODES}")
+        logger.info(f"Iniciando load para: {gcs_uri} (modo {write_mode})")
+        self.ensure_dataset()
+
+        schema = None
+        if sample_df is not None and "partition_date" in sample_df.columns:
+            _partitions(sample_df)
+        if sample_df is not None:
+            # schema explícito dos dtypes; a tabela é criada/evoluída antes do load
+            table, created = self.ensure_table_schema(sample_df)
+            schema = schema_from_dataframe(sample_df)
+        else:
+            table = self.get_table_cached()
+            _check_partitioning(table)
+            created = table is None
+            if created:
+                # sem tabela não há o que substituir: qualquer modo vira um load simples que a cria
                 logger.info("Tabela não existe - será criada automaticamente")
-            
-            # Configuração: autodetect apenas se tabela NÃO existir
+
+        if not created and write_mode == "merge":
+            return self._start_merge(gcs_uri, sample_df, table), created
+        if not created and write_mode == "partition":
+            # a partição é mensal: substituí-la inteira apagaria os dias do mês que o arquivo não traz
+            return self._start_partition_replace(gcs_uri, sample_df, table), created
+
+        destination = self.table_ref
+        write_disposition = bigquery.WriteDisposition.WRITE_APPEND
+
+        # só o caminho sem sample_df (schema desconhecido) ainda depende de autodetect/ignore_unknown_values
+        table_exists = table is not None
+        if gcs_uri.endswith(".parquet"):
+            # Parquet já traz os tipos; nada de re-parse de CSV
+            job_config = bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.PARQUET,
+                write_disposition=write_disposition,
+                schema=schema,
+                ignore_unknown_values=schema is None and table_exists
+            )
+        else:
             job_config = bigquery.LoadJobConfig(
                 source_format=bigquery.SourceFormat.CSV,
                 skip_leading_rows=1,
                 field_delimiter=",",
-                autodetect=not table_exists,
-                write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+                schema=schema,
+                autodetect=schema is None and not table_exists,
+                write_disposition=write_disposition,
                 allow_jagged_rows=True,
                 allow_quoted_newlines=True,
-                ignore_unknown_values=table_exists
+                ignore_unknown_values=schema is None and table_exists
             )
-            
-            logger.info(f"Job config: autodetect={not table_exists}, write_disposition=APPEND")
-            
-            # Se tabela não existe E temos sample_df, tentar adicionar particionamento
-            if not table_exists and sample_df is not None and 'partition_date' in sample_df.columns:
-                logger.info("Adicionando particionamento por partition_date")
-                job_config.time_partitioning = bigquery.TimePartitioning(
-                    type_=bigquery.TimePartitioningType.DAY,
-                    field="partition_date"
-                )
-            
-            # Executar load job
-            logger.info(f"Iniciando load job: {gcs_uri} -> {table_ref}")
-            load_job = self.client.load_table_from_uri(gcs_uri, table_ref, job_config=job_config)
-            
-            # Aguardar conclusão
+
+        logger.info(f"Job config: format={job_config.source_format}, write_disposition={write_disposition}")
+
+        logger.info(f"Iniciando load job: {gcs_uri} -> {destination}")
+        load_job = self.client.load_table_from_uri(gcs_uri, destination, job_config=job_config)
+        if not table_exists:
+            # o job vai criar a tabela; a próxima consulta busca os metadados de novo
+            self.invalidate_metadata()
+        return load_job, created
+
+    def _start_merge(self, gcs_uri: str, sample_df: Optional[pd.DataFrame], table: bigquery.Table):
+        table_columns = [field.name for field in table.schema]
+        if sample_df is not None:
+            columns = [c for c in sample_df.columns if c in table_columns]
+        else:
+            columns = table_columns
+        staging_ref = f"{self.table_ref}_staging_{uuid.uuid4().hex[:12]}"
+        script = build_merge_script(self.table_ref, staging_ref, gcs_uri, columns)
+        logger.info(f"Iniciando merge: {gcs_uri} -> {staging_ref} -> {self.table_ref}")
+        return self.client.query(script)
+
+    def _start_partition_replace(self, gcs_uri: str, sample_df: Optional[pd.DataFrame], table: bigquery.Table):
+        if sample_df is None or "partition_date" not in sample_df.columns:
+            raise ValueError("O modo partition exige sample_df com a coluna partition_date")
+        table_columns = [field.name for field in table.schema]
+        columns = [c for c in sample_df.columns if c in table_columns]
+        staging_ref = f"{self.table_ref}_staging_{uuid.uuid4().hex[:12]}"
+        script = build_partition_replace_script(self.table_ref, staging_ref, gcs_uri, columns)
+        logger.info(f"Iniciando substituição dos dias do arquivo: {gcs_uri} -> {staging_ref} -> {self.table_ref}")
+        return self.client.query(script)
+
+    def submit_pipeline_load(self, gcs_uri: str, sample_df: pd.DataFrame = None, write_mode: str = "append") -> Dict[str, Any]:
+        """
+        Dispara o load do GCS para o BigQuery e retorna na hora, sem esperar o job.
+        Arquivos .parquet são carregados como Parquet; os demais como CSV.
+        O andamento é consultado depois com get_job_status.
+        - write_mode="append": acrescenta as linhas (WRITE_APPEND)
+        - write_mode="merge": atualiza/insere por id_reservatorio + ano/mes/dia, sem duplicar reexecuções
+        - write_mode="partition": substitui os dias (partition_date = dia dos dados) que o arquivo traz
+        """
+        load_job, created = self._start_load(gcs_uri, sample_df, write_mode)
+        return {
+            "job_id": load_job.job_id,
+            "location": load_job.location,
+            "table_id": self.table_ref,
+            "state": load_job.state,
+            "created_table": created
+        }
+
+    def get_job_status(self, job_id: str, location: str = None) -> Dict[str, Any]:
+        job = self.client.get_job(job_id, location=location)
+        if job.state == "DONE":
+            # carga concluída (ou com erro): linhas e schema podem ter mudado
+            self.invalidate_metadata()
+        return {
+            "job_id": job.job_id,
+            "location": job.location,
+            "state": job.state,
+            "errors": job.errors,
+            "output_rows": getattr(job, "output_rows", None),
+            "affected_rows": getattr(job, "num_dml_affected_rows", None)
+        }
+
+    def load_pipeline_data(self, gcs_uri: str, sample_df: pd.DataFrame = None, write_mode: str = "append"):
+        """
+        Versão bloqueante de submit_pipeline_load: espera o job (até 300s) e
+        retorna as estatísticas da carga
+        """
+        try:
+            load_job, created = self._start_load(gcs_uri, sample_df, write_mode)
+
             logger.info("Aguardando conclusão do load job...")
             load_job.result(timeout=300)
-            
+            self.invalidate_metadata()
+
             # Verificar erros
             if load_job.errors:
                 logger.error(f"Erros no load job: {load_job.errors}")
                 raise Exception(f"Load job falhou: {load_job.errors}")
-            
-            # Obter estatísticas finais
-            table = self.client.get_table(table_ref)
-            
+
+            table = self.get_table_cached()
+
             result = {
-                "table_id": table_ref,
-                "rows_loaded": load_job.output_rows,
+                "table_id": self.table_ref,
+                "rows_loaded": getattr(load_job, "output_rows", None),
                 "total_rows": table.num_rows,
-                "created_table": not table_exists,
+                "created_table": created,
                 "job_id": load_job.job_id
             }
-            
-            logger.info(f"Load concluído: {load_job.output_rows} linhas carregadas, total: {table.num_rows}")
+
+            logger.info(f"Load concluído: {result['rows_loaded']} linhas carregadas, total: {table.num_rows}")
             return result
-            
+
         except Exception as e:
             logger.error(f"Erro no BigQuery load: {str(e)}")
             raise
@@ -118,11 +471,13 @@ class BigQueryService:
 
     def delete_table(self):
         """Deleta tabela (para casos de emergência)"""
-        table_ref = f"{self.project_id}.{self.dataset_id}.{self.table_name}"
+        table_ref = self.table_ref
         try:
             self.client.delete_table(table_ref)
             logger.info(f"Tabela {table_ref} deletada")
             return True
         except NotFound:
             logger.info(f"Tabela {table_ref} não existia")
-            return False
\ No newline at end of file
+            return False
+        finally:
+            self.invalidate_metadata()
\ No newline at end of file
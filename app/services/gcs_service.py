@@ -1,11 +1,161 @@
+import logging
+import math
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
 from google.cloud import storage
+from google.cloud.storage.retry import DEFAULT_RETRY
+
+from app.config import (
+    GCS_COMPOSITE_PART_SIZE,
+    GCS_COMPOSITE_THRESHOLD,
+    GCS_UPLOAD_CHUNK_SIZE,
+    GCS_UPLOAD_MAX_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+# O compose do GCS aceita no máximo 32 objetos de origem
+MAX_COMPOSE_SOURCES = 32
+_CHUNK_ALIGNMENT = 256 * 1024
+
+_clients: Dict[Optional[str], storage.Client] = {}
+_clients_lock = threading.Lock()
+
+
+def get_storage_client(credentials_path: str = None) -> storage.Client:
+    """
+    Cliente do GCS compartilhado pelo processo (um por arquivo de credenciais):
+    autentica uma vez e reaproveita as conexões HTTP entre uploads.
+    """
+    with _clients_lock:
+        client = _clients.get(credentials_path)
+        if client is None:
+            if credentials_path:
+                client = storage.Client.from_service_account_json(credentials_path)
+            else:
+                client = storage.Client()
+            _clients[credentials_path] = client
+        return client
+
+
+def reset_storage_clients() -> None:
+    """Descarta os clientes compartilhados (testes ou troca de credenciais)."""
+    with _clients_lock:
+        _clients.clear()
+
+
+def _aligned_chunk_size(chunk_size: int) -> int:
+    # uploads resumable exigem pedaços múltiplos de 256 KiB
+    return max(_CHUNK_ALIGNMENT, chunk_size - chunk_size % _CHUNK_ALIGNMENT)
+
+
+def _composite_upload(
+    bucket: storage.Bucket,
+    destination_blob_name: str,
+    size: int,
+    read_part: Callable[[int, int], bytes],
+    content_type: str,
+    chunk_size: int,
+    part_size: int,
+    max_workers: int
+) -> None:
+    """
+    Envia o conteúdo em partes paralelas e junta tudo com compose no destino.
+    As partes temporárias são apagadas mesmo se o upload falhar.
+    """
+    part_size = max(part_size, math.ceil(size / MAX_COMPOSE_SOURCES))
+    offsets = list(range(0, size, part_size))
+    prefix = f"{destination_blob_name}.parts/{uuid.uuid4().hex}"
+    parts = [bucket.blob(f"{prefix}/{i:02d}", chunk_size=chunk_size) for i in range(len(offsets))]
+    logger.info(f"Upload composto de {size} bytes em {len(parts)} partes para {bucket.name}/{destination_blob_name}")
+
+    def upload_part(index: int) -> None:
+        length = min(part_size, size - offsets[index])
+        parts[index].upload_from_string(read_part(offsets[index], length), content_type=content_type, retry=DEFAULT_RETRY)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(upload_part, range(len(parts))))
+        destination = bucket.blob(destination_blob_name)
+        destination.content_type = content_type
+        destination.compose(parts, retry=DEFAULT_RETRY)
+    finally:
+        for part in parts:
+            try:
+                part.delete(retry=DEFAULT_RETRY)
+            except Exception as e:
+                logger.warning(f"Não foi possível apagar a parte {part.name}: {e}")
+
+
+def _upload(
+    bucket_name: str,
+    destination_blob_name: str,
+    size: int,
+    upload_single: Callable[[storage.Blob], None],
+    read_part: Callable[[int, int], bytes],
+    content_type: str,
+    credentials_path: Optional[str],
+    chunk_size: int,
+    composite_threshold: int
+) -> None:
+    """
+    Até 8 MB o upload vai numa requisição só; acima disso é resumable em pedaços
+    de chunk_size, e cada pedaço é repetido em falhas transitórias (DEFAULT_RETRY).
+    A partir de composite_threshold as partes vão em paralelo e são juntadas com compose.
+    """
+    bucket = get_storage_client(credentials_path).bucket(bucket_name)
+    chunk_size = _aligned_chunk_size(chunk_size)
+    if composite_threshold and size >= composite_threshold:
+        _composite_upload(
+            bucket, destination_blob_name, size, read_part, content_type,
+            chunk_size, GCS_COMPOSITE_PART_SIZE, GCS_UPLOAD_MAX_WORKERS
+        )
+        return
+    upload_single(bucket.blob(destination_blob_name, chunk_size=chunk_size))
+
+
+def upload_to_gcs(
+    bucket_name: str,
+    source_file_path: str,
+    destination_blob_name: str,
+    credentials_path: str = None,
+    content_type: str = None,
+    chunk_size: int = GCS_UPLOAD_CHUNK_SIZE,
+    composite_threshold: int = GCS_COMPOSITE_THRESHOLD
+):
+    def read_part(offset: int, length: int) -> bytes:
+        with open(source_file_path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    _upload(
+        bucket_name, destination_blob_name, os.path.getsize(source_file_path),
+        lambda blob: blob.upload_from_filename(source_file_path, content_type=content_type, retry=DEFAULT_RETRY),
+        read_part,
+        content_type, credentials_path, chunk_size, composite_threshold
+    )
+    return f"File {source_file_path} uploaded to {bucket_name}/{destination_blob_name}."
+
 
-def upload_to_gcs(bucket_name: str, source_file_path: str, destination_blob_name: str, credentials_path: str = None):
-    if credentials_path:
-        client = storage.Client.from_service_account_json(credentials_path)
-    else:
-        client = storage.Client()
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(destination_blob_name)
-    blob.upload_from_filename(source_file_path)
-    return f"File {source_file_path} uploaded to {bucket_name}/{destination_blob_name}."
\ No newline at end of file
+def upload_bytes_to_gcs(
+    bucket_name: str,
+    data: bytes,
+    destination_blob_name: str,
+    content_type: str = "application/octet-stream",
+    credentials_path: str = None,
+    chunk_size: int = GCS_UPLOAD_CHUNK_SIZE,
+    composite_threshold: int = GCS_COMPOSITE_THRESHOLD
+):
+    """Envia bytes já em memória (ex: parquet serializado) sem passar por arquivo temporário."""
+    view = memoryview(data)
+    _upload(
+        bucket_name, destination_blob_name, len(data),
+        lambda blob: blob.upload_from_string(data, content_type=content_type, retry=DEFAULT_RETRY),
+        lambda offset, length: bytes(view[offset:offset + length]),
+        content_type, credentials_path, chunk_size, composite_threshold
+    )
+    return f"{len(data)} bytes uploaded to {bucket_name}/{destination_blob_name}."
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATES = ("succeeded", "failed")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def job_key(params: Dict[str, Any]) -> str:
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JobConflict(Exception):
+    """Outro job com a mesma chave exclusiva ainda está na fila ou rodando."""
+
+    def __init__(self, job: "Job"):
+        super().__init__(f"Job {job.id} em andamento com a mesma chave exclusiva")
+        self.job = job
+
+
+class Job:
+    """
+    Estado de uma execução em segundo plano: queued -> running -> succeeded/failed,
+    com início, fim, duração e linhas de cada etapa (ver stage).
+    """
+
+    def __init__(self, job_id: str, key: str, params: Dict[str, Any], exclusive: Optional[str] = None):
+        self.id = job_id
+        self.key = key
+        self.exclusive = exclusive
+        self.params = params
+        self.state = "queued"
+        self.created_at = _now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.stages: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.status_code: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.state in FINAL_STATES
+
+    @contextmanager
+    def stage(self, name: str):
+        """Registra uma etapa; quem executa pode preencher info["rows"] dentro do bloco."""
+        info = {"state": "running", "started_at": _now(), "finished_at": None, "seconds": None, "rows": None}
+        with self._lock:
+            self.stages[name] = info
+        started = time.monotonic()
+        state = "failed"
+        try:
+            yield info
+            state = "done"
+        finally:
+            with self._lock:
+                info.update(state=state, finished_at=_now(), seconds=round(time.monotonic() - started, 3))
+
+    def _set(self, **fields) -> None:
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "state": self.state,
+                "params": self.params,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "stages": {name: dict(info) for name, info in self.stages.items()},
+                "status_code": self.status_code,
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class JobRunner:
+    """
+    Fila de jobs executados por um pool de max_workers threads; o excedente
+    espera na fila (queued). Um job enviado com os mesmos parâmetros de outro
+    ainda na fila ou rodando não é criado de novo: quem envia recebe o existente.
+    Jobs com a mesma chave exclusiva (ex: o mesmo pacote numa execução
+    incremental) nunca rodam ao mesmo tempo, mesmo com parâmetros diferentes.
+    Os max_finished jobs terminados mais recentes continuam consultáveis.
+    """
+
+    def __init__(self, max_workers: int, max_finished: int = 100):
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._exclusive: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        params: Dict[str, Any],
+        fn: Callable[[Job], Tuple[int, Dict[str, Any]]],
+        exclusive: Optional[str] = None
+    ) -> Tuple[Job, bool]:
+        """
+        Enfileira fn(job), que devolve (status_code, resultado). Retorna
+        (job, criado); criado é False quando o job já existia (deduplicado).
+        Levanta JobConflict se outro job com a mesma chave exclusiva está ativo.
+        """
+        key = job_key(params)
+        with self._lock:
+            active = self._active.get(key)
+            if active is not None:
+                return active, False
+            if exclusive is not None and exclusive in self._exclusive:
+                raise JobConflict(self._exclusive[exclusive])
+            job = Job(uuid.uuid4().hex, key, params, exclusive)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            if exclusive is not None:
+                self._exclusive[exclusive] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn)
+        return job, True
+
+    def _run(self, job: Job, fn: Callable[[Job], Tuple[int, Dict[str, Any]]]) -> None:
+        job._set(state="running", started_at=_now())
+        try:
+            status_code, result = fn(job)
+            outcome = {"state": "succeeded" if status_code < 400 else "failed", "status_code": status_code, "result": result}
+        except Exception as e:
+            logger.exception(f"Job {job.id} falhou")
+            outcome = {"state": "failed", "status_code": 500, "error": str(e)}
+        # sai dos ativos antes de aparecer como terminado: um reenvio depois disso cria um job novo
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            if job.exclusive is not None and self._exclusive.get(job.exclusive) is job:
+                del self._exclusive[job.exclusive]
+        job._set(finished_at=_now(), **outcome)
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from app.services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_DIGIT_RUNS = re.compile(r"\d{4,}")
+
+
+def is_parquet_resource(resource: dict) -> bool:
+    return (resource.get("format") or "").upper() == "PARQUET" or (resource.get("url") or "").lower().endswith(".parquet")
+
+
+class ParquetIndex:
+    """
+    Ano -> URL do parquet de um pacote, montado uma vez a partir dos resources.
+    Mesma regra da busca linear: vale o primeiro parquet cujo nome ou URL contém
+    o ano; sem ano (ou sem recurso para o ano), o primeiro parquet do pacote.
+    """
+
+    def __init__(self, default: Optional[str], years: Dict[int, str]):
+        self.default = default
+        self.years = years
+
+    @classmethod
+    def build(cls, metadata: dict) -> "ParquetIndex":
+        candidates = [r for r in metadata.get("resources", []) or [] if is_parquet_resource(r)]
+        logger.info(f"{len(candidates)} parquet resources found.")
+        years: Dict[int, str] = {}
+        for r in candidates:
+            for text in (r.get("name") or "", r.get("url") or ""):
+                # todo trecho de 4 dígitos de cada sequência numérica (ex: 20230101 -> 2023, 2301, 3010)
+                for run in _DIGIT_RUNS.findall(text):
+                    for i in range(len(run) - 3):
+                        if run[i] != "0":
+                            years.setdefault(int(run[i:i + 4]), r["url"])
+        return cls(candidates[0]["url"] if candidates else None, years)
+
+    def url(self, ano: Optional[int] = None) -> Optional[str]:
+        if ano is None:
+            return self.default
+        return self.years.get(int(ano), self.default)
+
+
+class PackageMetadata(dict):
+    """Resultado do package_show (dict do CKAN) com o ParquetIndex já montado."""
+
+    def __init__(self, result: dict):
+        super().__init__(result)
+        self.parquet_index = ParquetIndex.build(self)
+
+
+class MetadataCache:
+    """
+    Cache dos metadados de pacotes do ONS com TTL e stale-while-revalidate:
+
+    - até ttl segundos, serve a cópia em cache;
+    - entre ttl e ttl + stale, serve a cópia antiga e atualiza em segundo plano;
+    - depois disso (ou sem cópia), busca na hora. Se a busca falhar, a cópia
+      antiga ainda é usada.
+
+    Cada pacote também fica em <directory>/<sha256(pacote)>.json (escrita
+    atômica), compartilhado pelos workers: uma entrada vencida na memória é
+    comparada com a do disco antes de qualquer busca. Buscas simultâneas do
+    mesmo pacote viram uma só (SingleFlight). ttl=0 desativa o cache.
+    """
+
+    def __init__(self, loader: Callable[[str], dict], directory: Optional[str], ttl: float, stale: float):
+        self.loader = loader
+        self.directory = directory
+        self.ttl = ttl
+        self.stale = stale
+        self._entries: Dict[str, Tuple[float, PackageMetadata]] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ons-metadata")
+        self.flights = SingleFlight()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _path(self, package_id: str) -> str:
+        key = hashlib.sha256(package_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read_disk(self, package_id: str) -> Optional[Tuple[float, PackageMetadata]]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(package_id), "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            return stored["fetched_at"], PackageMetadata(stored["metadata"])
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, package_id: str, fetched_at: float, metadata: dict) -> None:
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(package_id)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"package_id": package_id, "fetched_at": fetched_at, "metadata": metadata}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar os metadados de {package_id} em disco: {e}")
+
+    def _entry(self, package_id: str) -> Optional[Tuple[float, PackageMetadata]]:
+        with self._lock:
+            entry = self._entries.get(package_id)
+        if entry is None or time.time() - entry[0] >= self.ttl:
+            # outro worker pode já ter atualizado a cópia em disco
+            disk = self._read_disk(package_id)
+            if disk is not None and (entry is None or disk[0] > entry[0]):
+                entry = disk
+                with self._lock:
+                    self._entries[package_id] = entry
+        return entry
+
+    def put(self, package_id: str, metadata: dict) -> PackageMetadata:
+        if not self.enabled:
+            return PackageMetadata(metadata)
+        fetched_at = time.time()
+        entry = (fetched_at, PackageMetadata(metadata))
+        with self._lock:
+            self._entries[package_id] = entry
+        self._write_disk(package_id, fetched_at, metadata)
+        return entry[1]
+
+    def _load(self, package_id: str) -> PackageMetadata:
+        return self.flights.do(package_id, lambda: self.put(package_id, self.loader(package_id)))
+
+    def _refresh(self, package_id: str) -> None:
+        try:
+            self._load(package_id)
+            logger.info(f"Metadados de {package_id} atualizados em segundo plano")
+        except Exception as e:
+            logger.warning(f"Falha ao atualizar os metadados de {package_id}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(package_id)
+
+    def _refresh_in_background(self, package_id: str) -> None:
+        with self._lock:
+            if package_id in self._refreshing:
+                return
+            self._refreshing.add(package_id)
+        self._executor.submit(self._refresh, package_id)
+
+    def peek(self, package_id: str) -> Optional[PackageMetadata]:
+        """Cópia em cache ainda utilizável (atualizando se antiga), sem buscar na hora."""
+        if not self.enabled:
+            return None
+        entry = self._entry(package_id)
+        if entry is None:
+            return None
+        age = time.time() - entry[0]
+        if age >= self.ttl + self.stale:
+            return None
+        if age >= self.ttl:
+            self._refresh_in_background(package_id)
+        return entry[1]
+
+    def get(self, package_id: str) -> PackageMetadata:
+        if not self.enabled:
+            return self._load(package_id)
+        metadata = self.peek(package_id)
+        if metadata is not None:
+            return metadata
+        try:
+            return self._load(package_id)
+        except Exception as e:
+            entry = self._entry(package_id)
+            if entry is None:
+                raise
+            logger.warning(f"Falha ao buscar os metadados de {package_id} ({e}); usando cópia em cache")
+            return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except FileNotFoundError:
+                        pass
@@ -0,0 +1,73 @@
+import asyncio
+import hashlib
+import logging
+import os
+
+import httpx
+
+from app.config import BASE_URL, ONS_MAX_CONNECTIONS_PER_HOST
+from app.services.parquet_cache import DOWNLOAD_CHUNK_SIZE, ParquetCache
+
+logger = logging.getLogger(__name__)
+
+
+def make_async_client(max_connections: int = ONS_MAX_CONNECTIONS_PER_HOST, retries: int = 3) -> httpx.AsyncClient:
+    """Cliente HTTP assíncrono para a API do ONS (um por lote de requisições)."""
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(retries=retries),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+        follow_redirects=True,
+    )
+
+
+async def fetch_package_metadata(client: httpx.AsyncClient, package_id: str) -> dict:
+    logger.info(f"Fetching metadata (async) for package_id={package_id}")
+    resp = await client.get(f"{BASE_URL}{package_id}", timeout=httpx.Timeout(30.0, connect=5.0))
+    resp.raise_for_status()
+    data = resp.json()
+
+    if not data.get("success"):
+        raise ValueError("Resposta inválida da API do ONS")
+    return data["result"]
+
+
+def _write_chunk(f, hasher, chunk: bytes) -> None:
+    hasher.update(chunk)
+    f.write(chunk)
+
+
+async def download_to_cache(client: httpx.AsyncClient, url: str, cache: ParquetCache) -> str:
+    """
+    Versão assíncrona de ParquetCache.fetch: valida a cópia em cache com uma
+    requisição condicional e, se houver conteúdo novo, grava no cache em disco.
+    Todo acesso ao disco (índice, escrita e hash de cada pedaço) roda em
+    threads, fora do event loop.
+    """
+    entry = await asyncio.to_thread(cache.lookup, url)
+    async with client.stream("GET", url, headers=cache.conditional_headers(entry)) as resp:
+        if resp.status_code == 304 and entry:
+            logger.info(f"Cache parquet: hit para {url}")
+            return await asyncio.to_thread(cache.touch, entry)
+        resp.raise_for_status()
+
+        logger.info(f"Cache parquet: baixando (async) {url}")
+        hasher = hashlib.sha256()
+        f, tmp_path = await asyncio.to_thread(cache.open_temp)
+        try:
+            async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(_write_chunk, f, hasher, chunk)
+            await asyncio.to_thread(f.close)
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+
+    return await asyncio.to_thread(
+        cache.commit,
+        url,
+        tmp_path,
+        hasher.hexdigest(),
+        resp.headers.get("ETag"),
+        resp.headers.get("Last-Modified"),
+    )
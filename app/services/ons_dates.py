@@ -0,0 +1,103 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+logger = logging.getLogger(__name__)
+
+# Formatos testados, na ordem; os de dia primeiro vêm antes (padrão dos CSVs do ONS)
+DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%d/%m/%Y",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d-%m-%Y",
+    "%Y/%m/%d",
+    "%Y%m%d",
+)
+_SAMPLE_SIZE = 100
+_MAX_FORMATS = 256
+
+# Formato detectado por (recurso, coluna): os arquivos de um pacote usam o mesmo
+_formats: "OrderedDict[Tuple[str, str], Optional[str]]" = OrderedDict()
+_formats_lock = threading.Lock()
+
+
+def detect_date_format(values: pd.Index) -> Optional[str]:
+    """Primeiro formato de DATE_FORMATS que lê toda a amostra, ou None."""
+    sample = values[:_SAMPLE_SIZE]
+    for fmt in DATE_FORMATS:
+        if pd.to_datetime(sample, format=fmt, errors="coerce").notna().all():
+            return fmt
+    return None
+
+
+def _resource_format(resource: Optional[str], column, uniques: pd.Index) -> Optional[str]:
+    if resource is None:
+        return detect_date_format(uniques)
+    key = (resource, str(column))
+    with _formats_lock:
+        if key in _formats:
+            _formats.move_to_end(key)
+            return _formats[key]
+    fmt = detect_date_format(uniques)
+    logger.info(f"Formato de data de {column} em {resource}: {fmt or 'misto'}")
+    with _formats_lock:
+        _formats[key] = fmt
+        while len(_formats) > _MAX_FORMATS:
+            _formats.popitem(last=False)
+    return fmt
+
+
+def clear_date_formats() -> None:
+    with _formats_lock:
+        _formats.clear()
+
+
+def _parse_uniques(uniques: pd.Index, fmt: Optional[str]) -> pd.DatetimeIndex:
+    """
+    Tenta o formato do recurso primeiro e os demais só nos valores que sobraram
+    (ex: outro arquivo do pacote); o que não casar com nenhum é lido valor a valor.
+    """
+    formats = (fmt,) + tuple(f for f in DATE_FORMATS if f != fmt) if fmt else DATE_FORMATS
+    remaining = np.arange(len(uniques))
+    result = None
+    for candidate in formats:
+        if not len(remaining):
+            break
+        parsed = pd.DatetimeIndex(pd.to_datetime(uniques[remaining], format=candidate, errors="coerce"))
+        if result is None:
+            result = np.full(len(uniques), np.datetime64("NaT"), dtype=parsed.dtype)
+        matched = np.asarray(parsed.notna())
+        result[remaining[matched]] = parsed[matched].to_numpy().astype(result.dtype)
+        remaining = remaining[~matched]
+    if len(remaining):
+        parsed = pd.DatetimeIndex(pd.to_datetime(uniques[remaining], errors="coerce", dayfirst=True, format="mixed"))
+        result[remaining] = parsed.to_numpy().astype(result.dtype)
+    return pd.DatetimeIndex(result)
+
+
+def parse_dates(values: pd.Series, resource: Optional[str] = None) -> pd.Series:
+    """
+    Converte uma coluna de datas para datetime64 uma única vez: colunas já tipadas
+    (timestamp nativo do parquet) voltam como estão; texto tem o formato detectado
+    uma vez por recurso e só os valores distintos são convertidos.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), pd.Index(values.cat.categories)
+    else:
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Index(uniques)
+    if pd.api.types.infer_dtype(uniques, skipna=True) == "string":
+        parsed = _parse_uniques(uniques, _resource_format(resource, values.name, uniques))
+    else:
+        parsed = pd.DatetimeIndex(pd.to_datetime(uniques, errors="coerce", dayfirst=True))
+    return pd.Series(take(parsed.array, codes, allow_fill=True), index=values.index, name=values.name)
@@ -0,0 +1,141 @@
+import logging
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Plano de dtypes dos DataFrames do ONS, aplicado na leitura dos parquets:
+# - textos de baixa cardinalidade (nomes, tipos, ids) viram categorical;
+# - colunas de calendário viram inteiros pequenos;
+# - float64 vira float32 quando todos os valores voltam exatamente (ver restore_float64);
+# - demais textos ficam como str (Arrow).
+CATEGORICAL_COLUMNS = {
+    "nom_reservatorio",
+    "nom_bacia",
+    "tip_reservatorio",
+    "id_reservatorio",
+    "nom_ree",
+    "nom_subsistema",
+    "id_subsistema",
+    "nom_rio",
+}
+CALENDAR_COLUMNS = {"dia": np.int8, "mes": np.int8, "ano": np.int16}
+
+# Casas decimais testadas ao voltar um float32 para o decimal original
+FLOAT32_MAX_DECIMALS = 7
+_SAMPLE_ROWS = 1024
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def restore_float64(values: np.ndarray) -> np.ndarray:
+    """
+    Volta cada float32 para o decimal mais curto que o representa (12.34, e não
+    12.340000152587891): é o float64 que estava no parquet quando a coluna foi
+    compactada por compact_frame.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    wide = values.astype(np.float64)
+    pending = np.flatnonzero(np.isfinite(wide) & (wide != np.round(wide)))
+    for decimals in range(1, FLOAT32_MAX_DECIMALS + 1):
+        if not len(pending):
+            break
+        candidate = np.round(wide[pending], decimals)
+        matched = candidate.astype(np.float32) == values[pending]
+        wide[pending[matched]] = candidate[matched]
+        pending = pending[~matched]
+    return wide
+
+
+def _fits_float32(values: np.ndarray) -> bool:
+    with np.errstate(over="ignore", invalid="ignore"):
+        for sample in (values[:_SAMPLE_ROWS], values):
+            if not np.array_equal(restore_float64(sample.astype(np.float32)), sample, equal_nan=True):
+                return False
+    return True
+
+
+def compact_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, int, int]:
+    """
+    Aplica o plano de dtypes. Retorna (df, bytes antes, bytes depois); os valores
+    não mudam, só a representação em memória.
+    """
+    before = frame_nbytes(df)
+    df = df.copy(deep=False)
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if col in CATEGORICAL_COLUMNS and pd.api.types.is_string_dtype(dtype):
+            df[col] = df[col].astype("category")
+        elif col in CALENDAR_COLUMNS and pd.api.types.is_integer_dtype(dtype) and isinstance(dtype, np.dtype):
+            target = np.iinfo(CALENDAR_COLUMNS[col])
+            if len(df) == 0 or (df[col].min() >= target.min and df[col].max() <= target.max):
+                df[col] = df[col].astype(CALENDAR_COLUMNS[col])
+        elif dtype == np.float64 and _fits_float32(df[col].to_numpy()):
+            df[col] = df[col].astype(np.float32)
+        elif dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) == "string":
+            df[col] = df[col].astype("str")
+    return df, before, frame_nbytes(df)
+
+
+def log_compaction(label: str, before: int, after: int) -> None:
+    if before:
+        logger.info(
+            f"{label}: {before / 2**20:.1f} MB -> {after / 2**20:.1f} MB em memória "
+            f"({100 * (before - after) / before:.0f}% a menos)"
+        )
+
+
+def widen_floats(df: pd.DataFrame) -> pd.DataFrame:
+    """float32 compactados de volta para float64, com os valores originais"""
+    columns = [col for col in df.columns if df[col].dtype == np.float32]
+    if not columns:
+        return df
+    return df.assign(**{col: restore_float64(df[col].to_numpy()) for col in columns})
+
+
+def expand_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Desfaz compact_frame (float64, int64 e texto), para saídas que precisam dos
+    tipos de antes, como o stream Arrow.
+    """
+    df = widen_floats(df)
+    expanded = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            expanded[col] = df[col].astype(dtype.categories.dtype)
+        elif col in CALENDAR_COLUMNS and dtype == CALENDAR_COLUMNS[col]:
+            expanded[col] = df[col].astype(np.int64)
+    return df.assign(**expanded) if expanded else df
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat que preserva os dtypes compactos: categorias unificadas entre os
+    DataFrames (senão o pandas cai para texto) e float32 só se todos forem float32.
+    """
+    if len(frames) > 1:
+        frames = [df.copy(deep=False) for df in frames]
+        for col in dict.fromkeys(col for df in frames for col in df.columns):
+            series = [df[col] for df in frames if col in df.columns]
+            dtypes = [s.dtype for s in series]
+            if any(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+                if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+                    categories = pd.Index(dtypes[0].categories).append([dtype.categories for dtype in dtypes[1:]]).unique()
+                    target = pd.CategoricalDtype(categories)
+                else:
+                    target = next(dtype for dtype in dtypes if not isinstance(dtype, pd.CategoricalDtype))
+                for df in frames:
+                    if col in df.columns:
+                        df[col] = df[col].astype(target)
+            elif np.float32 in dtypes and any(dtype != np.float32 for dtype in dtypes):
+                for df in frames:
+                    if col in df.columns and df[col].dtype == np.float32:
+                        df[col] = restore_float64(df[col].to_numpy())
+    return pd.concat(frames, ignore_index=True)
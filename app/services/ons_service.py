@@ -1,29 +1,75 @@
+import asyncio
 import logging
-from functools import lru_cache
-from io import BytesIO
-from typing import Any, Dict, List, Optional
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from fastapi.responses import JSONResponse
 
-from app.config import BASE_URL
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele as respostas usam o json padrão
+    orjson = None
+
+from app.config import (
+    BASE_URL,
+    ONS_COMPACT_DTYPES,
+    ONS_LAZY_PAGES,
+    ONS_MAX_CONNECTIONS_PER_HOST,
+    ONS_MAX_PARALLEL_DOWNLOADS,
+    ONS_METADATA_CACHE_DIR,
+    ONS_METADATA_STALE_SECONDS,
+    ONS_METADATA_TTL_SECONDS,
+    ONS_RANGED_CHUNK_BYTES,
+    ONS_RANGED_DOWNLOAD_MIN_BYTES,
+    PARQUET_CACHE_DIR,
+    PARQUET_CACHE_MAX_BYTES,
+    QUERY_CACHE_MAX_BYTES,
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_TTL_SECONDS,
+)
+from app.services import ons_async_client
+from app.services.ons_dates import parse_dates
+from app.services.ons_dtypes import compact_frame, concat_frames, log_compaction, restore_float64
+from app.services.metadata_cache import MetadataCache, PackageMetadata, ParquetIndex
+from app.services.parquet_cache import ParquetCache
+from app.services.query_cache import QueryCache, decode_cursor, encode_cursor, query_key
+from app.services.row_group_pages import ParquetSource, RowGroup, RowGroupPages, open_parquet, statistics_cover
+from app.services.single_flight import SingleFlight
+from app.services.ranged_download import RangedDownloader, RangeNotSupported
+from app.services.reservoir_index import IndexedFrame, filter_by_names, parse_reservoir_names
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def make_session(retries: int = 3, backoff: float = 0.3) -> requests.Session:
+def make_session(retries: int = 3, backoff: float = 0.3, pool_maxsize: int = ONS_MAX_CONNECTIONS_PER_HOST) -> requests.Session:
     s = requests.Session()
     retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(500, 502, 503, 504))
-    s.mount("https://", HTTPAdapter(max_retries=retry))
-    s.mount("http://", HTTPAdapter(max_retries=retry))
+    # pool_block limita as conexões simultâneas por host, mesmo com vários downloads em paralelo
+    s.mount("https://", HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize, pool_block=True))
+    s.mount("http://", HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize, pool_block=True))
     return s
 
 _session = make_session()
+_query_cache = QueryCache(QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_MAX_BYTES)
+_download_executor = ThreadPoolExecutor(max_workers=ONS_MAX_PARALLEL_DOWNLOADS, thread_name_prefix="ons-download")
+_ranged_downloader = RangedDownloader(
+    _session, ONS_RANGED_CHUNK_BYTES, ONS_MAX_CONNECTIONS_PER_HOST, ONS_RANGED_DOWNLOAD_MIN_BYTES
+)
+_parquet_cache = ParquetCache(PARQUET_CACHE_DIR, PARQUET_CACHE_MAX_BYTES, downloader=_ranged_downloader)
+_parquet_flights = SingleFlight()
+# planos de paginação por row group têm o próprio SingleFlight: as métricas de
+# "parquet" contam só leituras de parquet
+_page_plan_flights = SingleFlight()
 
-@lru_cache(maxsize=128)
-def fetch_package_metadata(package_id: str) -> dict:
+def _fetch_package_metadata(package_id: str) -> dict:
     url = f"{BASE_URL}{package_id}"
     logging.info(f"Fetching metadata for package_id={package_id}")
     resp = _session.get(url, timeout=(5, 30))
@@ -34,65 +80,561 @@ def fetch_package_metadata(package_id: str) -> dict:
         raise ValueError("Resposta inválida da API do ONS")
     return data["result"]
 
+_metadata_cache = MetadataCache(
+    _fetch_package_metadata, ONS_METADATA_CACHE_DIR, ONS_METADATA_TTL_SECONDS, ONS_METADATA_STALE_SECONDS
+)
+
+def fetch_package_metadata(package_id: str) -> dict:
+    """Metadados do pacote, com TTL e atualização em segundo plano (ver MetadataCache)."""
+    return _metadata_cache.get(package_id)
+
+def clear_metadata_cache() -> None:
+    """Descarta os metadados em memória e em disco (testes ou troca de pacote)."""
+    _metadata_cache.clear()
+
 def find_parquet_url(metadata: dict, ano: Optional[int] = None) -> Optional[str]:
-    resources = metadata.get("resources", []) or []
-
-    parquet_candidates = [
-        r for r in resources
-        if (r.get("format") or "").upper() == "PARQUET" or (r.get("url") or "").lower().endswith(".parquet")
-    ]
-    logging.info(f"{len(parquet_candidates)} parquet resources found.")
-    if not parquet_candidates:
+    """URL do parquet do ano (ou o primeiro parquet), consultando o índice ano -> URL do pacote."""
+    index = metadata.parquet_index if isinstance(metadata, PackageMetadata) else ParquetIndex.build(metadata)
+    return index.url(ano)
+
+DATE_COLUMNS = ["ear_data", "data", "dt_medicao", "dt", "din_instante"]
+
+def find_date_column(columns) -> Optional[str]:
+    for col in DATE_COLUMNS:
+        if col in columns:
+            return col
+    return None
+
+def resolve_date_range(
+    ano: Optional[int],
+    mes: Optional[int],
+    start_date: Optional[str],
+    end_date: Optional[str]
+) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """Converte start_date/end_date ou ano/mes num intervalo fechado [início, fim]."""
+    if start_date and end_date:
+        return pd.to_datetime(start_date), pd.to_datetime(end_date)
+    if ano:
+        if mes:
+            start_ts = pd.Timestamp(year=ano, month=mes, day=1)
+            end_ts = start_ts + pd.offsets.MonthBegin(1)
+        else:
+            start_ts = pd.Timestamp(year=ano, month=1, day=1)
+            end_ts = pd.Timestamp(year=ano + 1, month=1, day=1)
+        return start_ts, end_ts - pd.Timedelta(1, "ns")
+    return None
+
+def build_parquet_filter(
+    schema: pa.Schema,
+    start_ts: Optional[pd.Timestamp] = None,
+    end_ts: Optional[pd.Timestamp] = None
+) -> Optional[ds.Expression]:
+    """
+    Monta o filtro empurrado para o pyarrow (row groups são descartados pelas
+    estatísticas min/max). Só gera predicados que não mudam o resultado do
+    filtro em pandas: datas com tipo nativo do parquet. O nome do reservatório
+    não vai para o pyarrow: é filtrado sem acento/maiúsculas por reservoir_index.
+    """
+    exprs = []
+
+    date_col = find_date_column(schema.names)
+    if date_col and (start_ts is not None or end_ts is not None):
+        field_type = schema.field(date_col).type
+        if pa.types.is_date(field_type):
+            if start_ts is not None:
+                exprs.append(ds.field(date_col) >= pa.scalar(start_ts.ceil("D").date(), field_type))
+            if end_ts is not None:
+                exprs.append(ds.field(date_col) <= pa.scalar(end_ts.floor("D").date(), field_type))
+        elif pa.types.is_timestamp(field_type) and field_type.tz is None:
+            if start_ts is not None:
+                exprs.append(ds.field(date_col) >= pa.scalar(start_ts.to_pydatetime(), field_type))
+            if end_ts is not None:
+                exprs.append(ds.field(date_col) <= pa.scalar(end_ts.floor(field_type.unit).to_pydatetime(), field_type))
+
+    if not exprs:
         return None
+    expr = exprs[0]
+    for e in exprs[1:]:
+        expr = expr & e
+    return expr
 
-    if ano is None:
-        return parquet_candidates[0]["url"]
+def _fetch_parquet_source(url: str) -> ParquetSource:
+    """
+    Caminho do parquet no cache em disco ou, sem o cache, os bytes do arquivo
+    (em pedaços paralelos quando o servidor aceita Range e o arquivo é grande).
+    """
+    if _parquet_cache.enabled:
+        return _parquet_cache.fetch(url, _session)
+    remote = _ranged_downloader.probe(url)
+    if remote is not None:
+        try:
+            return pa.py_buffer(_ranged_downloader.download(remote))
+        except RangeNotSupported as e:
+            logging.warning(f"{e}; baixando {url} numa única conexão")
+    resp = _session.get(url, timeout=(5, 60))
+    resp.raise_for_status()
+    return pa.py_buffer(resp.content)
 
-    for r in parquet_candidates:
-        if str(ano) in (r.get("name") or "") or str(ano) in (r.get("url") or ""):
-            return r["url"]
+def _scan_options(
+    schema: pa.Schema,
+    columns: Optional[List[str]],
+    start_ts: Optional[pd.Timestamp],
+    end_ts: Optional[pd.Timestamp]
+) -> Tuple[Optional[List[str]], Optional[ds.Expression]]:
+    if columns is not None:
+        # colunas usadas pelo filtro em pandas continuam sendo lidas
+        wanted = list(columns)
+        date_col = find_date_column(schema.names)
+        if date_col and (start_ts is not None or end_ts is not None):
+            wanted.append(date_col)
+        columns = [c for c in dict.fromkeys(wanted) if c in schema.names]
 
-    return parquet_candidates[0]["url"]
+    return columns, build_parquet_filter(schema, start_ts, end_ts)
 
-def read_parquet_from_url(url: str) -> pd.DataFrame:
-    logging.info(f"Reading parquet from {url}")
-    try:
-        df = pd.read_parquet(url, engine="pyarrow")
-        logging.info("read_parquet(url) succeeded")
+def _read_parquet_source(
+    source,
+    columns: Optional[List[str]],
+    start_ts: Optional[pd.Timestamp],
+    end_ts: Optional[pd.Timestamp]
+) -> pd.DataFrame:
+    schema = open_parquet(source).schema_arrow
+    columns, filters = _scan_options(schema, columns, start_ts, end_ts)
+    table = pq.read_table(
+        pa.BufferReader(source) if isinstance(source, pa.Buffer) else source, columns=columns, filters=filters
+    )
+    return table.to_pandas(date_as_object=False)
+
+def iter_parquet_chunks(
+    url: str,
+    chunk_rows: int,
+    columns: Optional[List[str]] = None,
+    start_ts: Optional[pd.Timestamp] = None,
+    end_ts: Optional[pd.Timestamp] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Mesma leitura de read_parquet_from_url, mas entregue em pedaços de no
+    máximo chunk_rows linhas: só um pedaço decodificado fica em memória.
+    """
+    logging.info(f"Reading parquet in chunks of {chunk_rows} rows from {url}")
+    source = _fetch_parquet_source(url)
+    if isinstance(source, pa.Buffer):
+        fragment = ds.ParquetFileFormat().make_fragment(source)
+    else:
+        fragment = ds.ParquetFileFormat().make_fragment(source, filesystem=pafs.LocalFileSystem())
+
+    columns, filters = _scan_options(fragment.physical_schema, columns, start_ts, end_ts)
+    before = after = 0
+    for batch in fragment.to_batches(columns=columns, filter=filters, batch_size=chunk_rows):
+        if batch.num_rows:
+            df = batch.to_pandas(date_as_object=False)
+            if ONS_COMPACT_DTYPES:
+                df, chunk_before, chunk_after = compact_frame(df)
+                before, after = before + chunk_before, after + chunk_after
+            yield df
+    log_compaction(url, before, after)
+
+def read_parquet_from_url(
+    url: str,
+    columns: Optional[List[str]] = None,
+    start_ts: Optional[pd.Timestamp] = None,
+    end_ts: Optional[pd.Timestamp] = None
+) -> pd.DataFrame:
+    """
+    Lê o parquet da URL decodificando só as colunas pedidas e os row groups que
+    podem conter linhas do intervalo de datas informado, já com
+    o plano de dtypes compactos aplicado (ons_dtypes).
+
+    Leituras simultâneas da mesma URL com os mesmos filtros (ex: vários gráficos
+    de um dashboard) esperam um único download/decodificação e dividem o resultado.
+    """
+    key = (url, tuple(columns) if columns is not None else None, start_ts, end_ts)
+    df = _parquet_flights.do(key, _read_compact_frame, url, columns, start_ts, end_ts)
+    # cópia rasa (copy-on-write): quem recebe pode atribuir colunas sem afetar os demais
+    return df.copy(deep=False)
+
+def _read_compact_frame(
+    url: str,
+    columns: Optional[List[str]],
+    start_ts: Optional[pd.Timestamp],
+    end_ts: Optional[pd.Timestamp]
+) -> pd.DataFrame:
+    df = _read_parquet_frame(url, columns, start_ts, end_ts)
+    if not ONS_COMPACT_DTYPES:
         return df
-    except Exception as e:
-        logging.info(f"pd.read_parquet(url) failed: {e}; will stream bytes and read from buffer")
-    resp = _session.get(url, stream=True, timeout=(5, 60))
-    resp.raise_for_status()
-    buf = BytesIO(resp.content)
-    df = pd.read_parquet(buf, engine="pyarrow")
+    df, before, after = compact_frame(df)
+    log_compaction(url, before, after)
     return df
 
+def download_metrics() -> Dict[str, Dict[str, int]]:
+    """Leituras de parquet, planos de paginação e metadados feitos de fato (fresh) e coalescidos."""
+    return {
+        "parquet": _parquet_flights.stats(),
+        "page_plans": _page_plan_flights.stats(),
+        "metadata": _metadata_cache.flights.stats()
+    }
+
+def _read_parquet_frame(
+    url: str,
+    columns: Optional[List[str]],
+    start_ts: Optional[pd.Timestamp],
+    end_ts: Optional[pd.Timestamp]
+) -> pd.DataFrame:
+    logging.info(f"Reading parquet from {url}")
+    try:
+        return _read_parquet_source(_fetch_parquet_source(url), columns, start_ts, end_ts)
+    except FileNotFoundError:
+        if not _parquet_cache.enabled:
+            raise
+        # blob removido pelo LRU de outro worker entre o fetch e a leitura
+        return _read_parquet_source(_fetch_parquet_source(url), columns, start_ts, end_ts)
+
+def read_parquet_from_urls(urls: List[str], **read_kwargs) -> List[pd.DataFrame]:
+    """
+    Lê vários parquets em paralelo (limitado por ONS_MAX_PARALLEL_DOWNLOADS),
+    devolvendo os DataFrames na mesma ordem das URLs.
+    """
+    if len(urls) <= 1:
+        return [read_parquet_from_url(url, **read_kwargs) for url in urls]
+    return list(_download_executor.map(lambda url: read_parquet_from_url(url, **read_kwargs), urls))
+
+async def warm_parquet_cache_async(
+    package_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> List[str]:
+    """
+    Baixa para o cache em disco, sem bloquear o event loop, os parquets que
+    get_reservoir_data / get_registry_data vão ler em seguida. Sem datas,
+    aquece o parquet padrão do pacote (caso do registry).
+    """
+    if not _parquet_cache.enabled:
+        return []
+
+    async with ons_async_client.make_async_client() as client:
+        metadata = _metadata_cache.peek(package_id)
+        if metadata is None:
+            metadata = _metadata_cache.put(package_id, await ons_async_client.fetch_package_metadata(client, package_id))
+
+        date_range = resolve_date_range(None, None, start_date, end_date)
+        if date_range is None:
+            urls = [find_parquet_url(metadata)]
+        else:
+            start_ts, end_ts = date_range
+            urls = [find_parquet_url(metadata, y) for y in range(start_ts.year, end_ts.year + 1)]
+        urls = [url for url in dict.fromkeys(urls) if url]
+
+        semaphore = asyncio.Semaphore(ONS_MAX_PARALLEL_DOWNLOADS)
+
+        async def download(url: str) -> str:
+            async with semaphore:
+                return await ons_async_client.download_to_cache(client, url, _parquet_cache)
+
+        return list(await asyncio.gather(*(download(url) for url in urls)))
+
+def _clean_value(v: Any) -> Any:
+    """Conversão célula a célula, usada só em colunas object com tipos misturados."""
+    if v is None or v is pd.NA or v is pd.NaT:
+        return None
+    if isinstance(v, (np.integer,)):
+        return int(v)
+    if isinstance(v, (np.floating, float)):
+        fv = float(v)
+        return fv if np.isfinite(fv) else None
+    if hasattr(v, "to_pydatetime"):
+        try:
+            dt = v.to_pydatetime()
+            return dt.strftime("%Y-%m-%d")
+        except Exception:
+            return None
+    if isinstance(v, str):
+        s = v.strip()
+        return s if s != "" else None
+    return v
+
+def _float_values(col: pd.Series) -> np.ndarray:
+    # float32 compactado volta para o decimal original, não para 12.340000152587891
+    if col.dtype == np.float32:
+        return restore_float64(col.to_numpy())
+    return col.to_numpy(dtype=np.float64, na_value=np.nan)
+
+def _column_values(col: pd.Series) -> List[Any]:
+    """
+    Converte uma coluna inteira para valores JSON: NaN/inf -> None,
+    datas -> 'YYYY-MM-DD', strings sem espaços nas pontas e vazias -> None.
+    """
+    dtype = col.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        lookup = _column_values(pd.Series(dtype.categories)) + [None]
+        # código -1 (nulo) aponta para o None no fim da tabela
+        return np.array(lookup, dtype=object)[col.cat.codes.to_numpy()].tolist()
+
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        if col.hasnans:
+            return col.to_numpy(dtype=object, na_value=None).tolist()
+        return col.to_numpy().tolist()
+
+    if pd.api.types.is_float_dtype(dtype):
+        arr = _float_values(col)
+        values = arr.tolist()
+        for i in np.flatnonzero(~np.isfinite(arr)):
+            values[i] = None
+        return values
+
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        if getattr(dtype, "tz", None) is not None:
+            col = col.dt.tz_localize(None)
+        arr = col.to_numpy(dtype="datetime64[ns]")
+        values = arr.astype("datetime64[D]").astype(str).astype(object)
+        values[np.isnat(arr)] = None
+        return values.tolist()
+
+    inferred = pd.api.types.infer_dtype(col, skipna=True) if pd.api.types.is_string_dtype(dtype) else None
+    if inferred == "empty":
+        return [None] * len(col)
+    if inferred == "string":
+        stripped = col.str.strip()
+        values = stripped.to_numpy(dtype=object, na_value=None)
+        values[(stripped == "").to_numpy(dtype=bool, na_value=False)] = None
+        return values.tolist()
+
+    return [_clean_value(v) for v in col.to_numpy(dtype=object)]
+
 def records_from_dataframe(df: pd.DataFrame) -> List[Dict[str, Any]]:
-    df = df.where(pd.notnull(df), None)
-    recs = df.to_dict(orient="records")
-    cleaned: List[Dict[str, Any]] = []
-    for r in recs:
-        nr: Dict[str, Any] = {}
-        for k, v in r.items():
-            if isinstance(v, (np.integer,)):
-                nr[k] = int(v)
-            elif isinstance(v, (np.floating, float)):
-                fv = float(v)
-                nr[k] = fv if np.isfinite(fv) else None
-            elif hasattr(v, "to_pydatetime"):
-                try:
-                    dt = v.to_pydatetime()
-                    nr[k] = dt.strftime("%Y-%m-%d")
-                except Exception:
-                    nr[k] = None
-            elif isinstance(v, str):
-                s = v.strip()
-                nr[k] = s if s != "" else None
-            else:
-                nr[k] = v
-        cleaned.append(nr)
-    return cleaned
+    """Serializa o DataFrame coluna a coluna (sem loop Python por célula)."""
+    if len(df.columns) == 0:
+        return [{} for _ in range(len(df))]
+    keys = list(df.columns)
+    columns = [_column_values(df.iloc[:, i]) for i in range(len(keys))]
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+# Faixa em que orjson e json.dumps formatam floats da mesma forma (sem expoente)
+_ORJSON_FLOAT_MIN, _ORJSON_FLOAT_MAX = 1e-4, 1e16
+
+def orjson_compatible(df: pd.DataFrame) -> bool:
+    """Verifica, coluna a coluna, se orjson gera exatamente o mesmo JSON que json.dumps."""
+    if not all(isinstance(c, str) for c in df.columns):
+        return False
+    for i in range(len(df.columns)):
+        col = df.iloc[:, i]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            col = pd.Series(col.dtype.categories)
+        dtype = col.dtype
+        if (
+            pd.api.types.is_bool_dtype(dtype)
+            or pd.api.types.is_integer_dtype(dtype)
+            or pd.api.types.is_datetime64_any_dtype(dtype)
+        ):
+            continue
+        if pd.api.types.is_float_dtype(dtype):
+            arr = np.abs(_float_values(col))
+            arr = arr[np.isfinite(arr) & (arr != 0)]
+            if ((arr < _ORJSON_FLOAT_MIN) | (arr >= _ORJSON_FLOAT_MAX)).any():
+                return False
+            continue
+        if pd.api.types.is_string_dtype(dtype) and pd.api.types.infer_dtype(col, skipna=True) in ("string", "empty"):
+            continue
+        return False
+    return True
+
+class RecordsJSONResponse(JSONResponse):
+    """
+    JSONResponse para registros vindos de um DataFrame. Codifica com orjson
+    quando o resultado é byte a byte igual ao do JSONResponse padrão.
+    """
+
+    def __init__(self, content: Any, frame: Optional[pd.DataFrame] = None, **kwargs):
+        self._use_orjson = orjson is not None and frame is not None and orjson_compatible(frame)
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        if self._use_orjson:
+            try:
+                return orjson.dumps(content)
+            except orjson.JSONEncodeError:
+                pass
+        return super().render(content)
+
+def resolve_reservoir_urls(package_id: str, start_ts: pd.Timestamp, end_ts: pd.Timestamp) -> List[str]:
+    """URLs dos parquets anuais que cobrem [start_ts, end_ts], sem repetições."""
+    metadata = fetch_package_metadata(package_id)
+    years = list(range(start_ts.year, end_ts.year + 1))
+
+    urls_to_read = []
+    for y in years:
+        url = find_parquet_url(metadata, y)
+        if url and url not in urls_to_read:
+            urls_to_read.append(url)
+    return urls_to_read
+
+def _reservoir_read_columns(columns: Optional[List[str]], with_name: bool) -> Optional[List[str]]:
+    # o nome é filtrado em pandas (sem acento/maiúsculas), não empurrado para o pyarrow:
+    # with_name garante nom_reservatorio entre as colunas lidas
+    if columns is None or not with_name:
+        return columns
+    return list(dict.fromkeys([*columns, "nom_reservatorio"]))
+
+def filter_reservoir_frame(
+    df: pd.DataFrame,
+    start_ts: pd.Timestamp,
+    end_ts: pd.Timestamp,
+    nome_reservatorio: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    resource: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Filtro final em pandas: datas em texto que não foram para o pyarrow e nomes
+    (vírgula separa vários; sem acento e sem diferença de maiúsculas). resource
+    identifica o pacote, para o formato das datas em texto ser detectado uma vez.
+    """
+    date_col = find_date_column(df.columns)
+    if date_col:
+        df[date_col] = parse_dates(df[date_col], resource)
+        df = df[(df[date_col] >= start_ts) & (df[date_col] <= end_ts)]
+
+    df = filter_by_names(df, parse_reservoir_names(nome_reservatorio))
+
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+
+    return df.reset_index(drop=True)
+
+def iter_reservoir_chunks(
+    package_id: str,
+    start_ts: pd.Timestamp,
+    end_ts: pd.Timestamp,
+    chunk_rows: int,
+    nome_reservatorio: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    urls: Optional[List[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Percorre todo o resultado filtrado de [start_ts, end_ts], ano a ano e em
+    pedaços de até chunk_rows linhas (antes do filtro final em pandas).
+    urls: parquets já resolvidos com resolve_reservoir_urls, se houver.
+    """
+    read_columns = _reservoir_read_columns(columns, with_name=bool(nome_reservatorio))
+    if urls is None:
+        urls = resolve_reservoir_urls(package_id, start_ts, end_ts)
+    for url in urls:
+        for chunk in iter_parquet_chunks(url, chunk_rows, columns=read_columns, start_ts=start_ts, end_ts=end_ts):
+            chunk = filter_reservoir_frame(chunk, start_ts, end_ts, nome_reservatorio, columns, package_id)
+            if len(chunk):
+                yield chunk
+
+def load_reservoir_frame(
+    package_id: str,
+    start_ts: pd.Timestamp,
+    end_ts: pd.Timestamp,
+    nome_reservatorio: Optional[str] = None,
+    columns: Optional[List[str]] = None
+) -> Optional[pd.DataFrame]:
+    """
+    Lê e filtra os parquets anuais do pacote no intervalo [start_ts, end_ts].
+    Retorna None se nenhum parquet for encontrado para os anos pedidos.
+    """
+    urls_to_read = resolve_reservoir_urls(package_id, start_ts, end_ts)
+
+    df_list = read_parquet_from_urls(
+        urls_to_read, columns=_reservoir_read_columns(columns, with_name=bool(nome_reservatorio)), start_ts=start_ts, end_ts=end_ts
+    )
+    if not df_list:
+        return None
+
+    df = concat_frames(df_list)
+    return filter_reservoir_frame(df, start_ts, end_ts, nome_reservatorio, columns, package_id)
+
+def _plan_row_groups(source: ParquetSource, start_ts: pd.Timestamp, end_ts: pd.Timestamp, resource: str) -> List[RowGroup]:
+    """Linhas de cada row group em [start_ts, end_ts]; a coluna de data só é lida nos de borda."""
+    pf = open_parquet(source)
+    date_col = find_date_column(pf.schema_arrow.names)
+    if date_col is None:
+        return [RowGroup(source, i, pf.metadata.row_group(i).num_rows) for i in range(pf.num_row_groups)]
+
+    field_type = pf.schema_arrow.field(date_col).type
+    typed = pa.types.is_date(field_type) or pa.types.is_timestamp(field_type)
+    column = pf.schema.names.index(date_col)
+    groups = []
+    for i in range(pf.num_row_groups):
+        cover = statistics_cover(pf.metadata.row_group(i), column, start_ts, end_ts) if typed else None
+        if cover is None:
+            dates = pf.read_row_group(i, columns=[date_col]).to_pandas(date_as_object=False)[date_col]
+            dates = parse_dates(dates, resource)
+            rows = int(((dates >= start_ts) & (dates <= end_ts)).sum())
+        else:
+            rows = pf.metadata.row_group(i).num_rows if cover else 0
+        groups.append(RowGroup(source, i, rows))
+    return groups
+
+def load_reservoir_pages(
+    package_id: str,
+    start_ts: pd.Timestamp,
+    end_ts: pd.Timestamp,
+    columns: Optional[List[str]] = None
+) -> Optional[RowGroupPages]:
+    """
+    Plano de paginação por row group para a consulta sem filtro de nome: os
+    parquets não são decodificados por inteiro, cada página lê só os row groups
+    que a cobrem. Retorna None se nenhum parquet for encontrado.
+    """
+    urls = resolve_reservoir_urls(package_id, start_ts, end_ts)
+    if not urls:
+        return None
+    sources = [_fetch_parquet_source(urls[0])] if len(urls) == 1 else list(_download_executor.map(_fetch_parquet_source, urls))
+    groups = [group for source in sources for group in _plan_row_groups(source, start_ts, end_ts, package_id)]
+
+    def read_group(group: RowGroup) -> pd.DataFrame:
+        pf = open_parquet(group.source)
+        read_columns, _ = _scan_options(pf.schema_arrow, columns, start_ts, end_ts)
+        table = pf.read_row_group(group.index, columns=read_columns, use_pandas_metadata=True)
+        df = table.to_pandas(date_as_object=False)
+        if ONS_COMPACT_DTYPES:
+            df, _, _ = compact_frame(df)
+        return filter_reservoir_frame(df, start_ts, end_ts, None, columns, package_id)
+
+    return RowGroupPages(groups, read_group)
+
+def _load_page_plan(
+    query: Dict[str, Any],
+    start_ts: pd.Timestamp,
+    end_ts: pd.Timestamp,
+    refresh: bool = False
+) -> Optional[RowGroupPages]:
+    key = "pages:" + query_key({**query, "nome_reservatorio": None})
+    pages = None if refresh else _query_cache.get(key)
+    if pages is None:
+        pages = _page_plan_flights.do(
+            key, load_reservoir_pages, query["package_id"], start_ts, end_ts, query["columns"]
+        )
+        if pages is None:
+            return None
+        _query_cache.put(key, pages, size=pages.nbytes)
+    return pages
+
+def _load_indexed_frame(query: Dict[str, Any], start_ts: pd.Timestamp, end_ts: pd.Timestamp) -> Optional[IndexedFrame]:
+    base_query = {**query, "nome_reservatorio": None}
+    key = query_key(base_query)
+    base = _query_cache.get(key)
+    if base is None:
+        # o índice de nomes precisa de nom_reservatorio mesmo que a consulta não peça a coluna
+        columns = _reservoir_read_columns(query["columns"], with_name=True)
+        df = load_reservoir_frame(query["package_id"], start_ts, end_ts, columns=columns)
+        if df is None:
+            return None
+        base = IndexedFrame(df)
+        _query_cache.put(key, base, size=base.nbytes)
+    return base
+
+# Campos da consulta guardada nos cursores de get_reservoir_data e os tipos aceitos
+RESERVOIR_QUERY_FIELDS = {
+    "package_id": (str,),
+    "ano": (int, type(None)),
+    "mes": (int, type(None)),
+    "nome_reservatorio": (str, type(None)),
+    "start_date": (str, type(None)),
+    "end_date": (str, type(None)),
+    "columns": (list, type(None)),
+}
 
 def get_reservoir_data(
     package_id: str,
@@ -102,60 +644,83 @@ def get_reservoir_data(
     start_date: Optional[str],
     end_date: Optional[str],
     page: int,
-    page_size: int
+    page_size: int,
+    columns: Optional[List[str]] = None,
+    cursor: Optional[str] = None
 ) -> JSONResponse:
     try:
-        metadata = fetch_package_metadata(package_id)
-
-        if start_date and end_date:
-            start_ts, end_ts = pd.to_datetime(start_date), pd.to_datetime(end_date)
-            years = list(range(start_ts.year, end_ts.year + 1))
-        elif ano:
-            years = [ano]
-            start_ts = end_ts = None
+        if cursor:
+            try:
+                query, offset, page_size = decode_cursor(cursor, RESERVOIR_QUERY_FIELDS)
+            except ValueError as e:
+                return JSONResponse({"error": str(e)}, status_code=400)
+            if query["package_id"] != package_id:
+                return JSONResponse({"error": "Cursor de outro package_id."}, status_code=400)
         else:
-            return JSONResponse({"error": "Informe 'ano' ou 'start_date'/'end_date'."}, status_code=400)
-
-        urls_to_read = []
-        for y in years:
-            url = find_parquet_url(metadata, y)
-            if url:
-                urls_to_read.append(url)
-
-        df_list = [read_parquet_from_url(url) for url in urls_to_read]
-        if not df_list:
-            return JSONResponse({"error": "Nenhum parquet encontrado para os anos requisitados."}, status_code=404)
+            query = {
+                "package_id": package_id,
+                "ano": ano,
+                "mes": mes,
+                "nome_reservatorio": nome_reservatorio,
+                "start_date": start_date,
+                "end_date": end_date,
+                "columns": columns,
+            }
+            offset = (page - 1) * page_size
 
-        df = pd.concat(df_list, ignore_index=True)
-
-        date_col = None
-        for col in ["ear_data", "data", "dt_medicao", "dt"]:
-            if col in df.columns:
-                date_col = col
-                break
-
-        if date_col:
-            df[date_col] = pd.to_datetime(df[date_col], errors="coerce", dayfirst=True)
-
-            if start_date and end_date:
-                df = df[(df[date_col] >= start_ts) & (df[date_col] <= end_ts)]
-            else:
-                if mes:
-                    df = df[(df[date_col].dt.year == ano) & (df[date_col].dt.month == mes)]
-                else:
-                    df = df[df[date_col].dt.year == ano]
+        date_range = resolve_date_range(query["ano"], query["mes"], query["start_date"], query["end_date"])
+        if date_range is None:
+            return JSONResponse({"error": "Informe 'ano' ou 'start_date'/'end_date'."}, status_code=400)
+        start_ts, end_ts = date_range
 
-        if nome_reservatorio and "nom_reservatorio" in df.columns:
-            df = df[df["nom_reservatorio"].astype(str).str.contains(nome_reservatorio, case=False, na=False)]
+        names = parse_reservoir_names(query["nome_reservatorio"])
+        base_key = query_key({**query, "nome_reservatorio": None})
+        if not names and ONS_LAZY_PAGES and _query_cache.get(base_key) is None:
+            # Sem nome e sem o dataset em memória: só os row groups da página são decodificados
+            pages = _load_page_plan(query, start_ts, end_ts)
+            if pages is None:
+                return JSONResponse({"error": "Nenhum parquet encontrado para os anos requisitados."}, status_code=404)
+            try:
+                page_df = pages.page(offset, page_size)
+            except FileNotFoundError:
+                # blob removido pelo LRU do cache em disco depois que o plano foi montado
+                pages = _load_page_plan(query, start_ts, end_ts, refresh=True)
+                if pages is None:
+                    return JSONResponse({"error": "Nenhum parquet encontrado para os anos requisitados."}, status_code=404)
+                page_df = pages.page(offset, page_size)
+            total_rows = pages.total_rows
+        else:
+            # O dataset do intervalo (sem o filtro de nome) é materializado uma vez, com o
+            # índice de nomes; o resultado de cada filtro de nome também fica em cache e
+            # as páginas seguintes só fatiam
+            key = query_key(query)
+            df = _query_cache.get(key) if names else None
+            if df is None:
+                base = _load_indexed_frame(query, start_ts, end_ts)
+                if base is None:
+                    return JSONResponse({"error": "Nenhum parquet encontrado para os anos requisitados."}, status_code=404)
+                df = base.select(names, query["columns"])
+                if names:
+                    _query_cache.put(key, df)
+            page_df = df.iloc[offset:offset + page_size]
+            total_rows = len(df)
 
-        # Paginação
-        start_idx = (page - 1) * page_size
-        page_df = df.iloc[start_idx:start_idx + page_size]
-        has_more = len(df) > start_idx + page_size
+        has_more = total_rows > offset + page_size
 
         records = records_from_dataframe(page_df)
-        return JSONResponse({"page": page, "page_size": page_size, "has_more": has_more, "data": records})
+        return RecordsJSONResponse(
+            {
+                "page": offset // page_size + 1,
+                "page_size": page_size,
+                "has_more": has_more,
+                "total_rows": total_rows,
+                "total_pages": math.ceil(total_rows / page_size),
+                "next_cursor": encode_cursor(query, offset + page_size, page_size) if has_more else None,
+                "data": records,
+            },
+            frame=page_df
+        )
 
     except Exception as e:
         logging.exception("Erro processando requisição")
-        return JSONResponse({"error": str(e)}, status_code=500)
\ No newline at end of file
+        return JSONResponse({"error": str(e)}, status_code=500)
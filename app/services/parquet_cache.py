@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+import requests
+
+from app.services.ranged_download import RangedDownloader, RangeNotSupported, RemoteFile
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class ParquetCache:
+    """
+    Cache local em disco, endereçado por conteúdo, dos arquivos parquet do ONS.
+
+    - index/<sha256(url)>.json guarda ETag/Last-Modified e o digest do conteúdo
+    - blobs/<sha256(conteúdo)>.parquet guarda os bytes do arquivo
+
+    O mtime dos blobs serve de relógio do LRU. Todas as escritas são atômicas
+    (os.replace) e a evicção roda sob lock de arquivo, então o mesmo diretório
+    pode ser compartilhado por vários workers. Com um downloader, arquivos
+    grandes são baixados em pedaços paralelos (RangedDownloader).
+    """
+
+    def __init__(self, directory: str, max_bytes: int, downloader: Optional[RangedDownloader] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.downloader = downloader
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _ensure_dirs(self) -> None:
+        for sub in ("index", "blobs", "tmp"):
+            os.makedirs(os.path.join(self.directory, sub), exist_ok=True)
+
+    def _index_path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "index", f"{key}.json")
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", f"{digest}.parquet")
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Retorna a entrada do índice para a URL, se o blob ainda estiver em disco."""
+        try:
+            with open(self._index_path(url), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not os.path.exists(self.blob_path(entry["digest"])):
+            return None
+        return entry
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if not entry:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def touch(self, entry: Dict) -> str:
+        path = self.blob_path(entry["digest"])
+        os.utime(path, None)
+        return path
+
+    def open_temp(self):
+        self._ensure_dirs()
+        fd, path = tempfile.mkstemp(dir=os.path.join(self.directory, "tmp"), suffix=".part")
+        return os.fdopen(fd, "wb"), path
+
+    def commit(self, url: str, tmp_path: str, digest: str, etag: Optional[str] = None,
+               last_modified: Optional[str] = None) -> str:
+        """Move o arquivo temporário para blobs/, atualiza o índice e aplica o LRU."""
+        blob = self.blob_path(digest)
+        if os.path.exists(blob):
+            os.remove(tmp_path)
+            os.utime(blob, None)
+        else:
+            os.replace(tmp_path, blob)
+
+        entry = {
+            "url": url,
+            "digest": digest,
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": os.path.getsize(blob),
+            "stored_at": time.time(),
+        }
+        index_path = self._index_path(url)
+        tmp_index = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_index, index_path)
+
+        self.evict(keep=blob)
+        return blob
+
+    def store_stream(self, url: str, chunks: Iterable[bytes], etag: Optional[str] = None,
+                     last_modified: Optional[str] = None) -> str:
+        hasher = hashlib.sha256()
+        f, tmp_path = self.open_temp()
+        try:
+            with f:
+                for chunk in chunks:
+                    if chunk:
+                        hasher.update(chunk)
+                        f.write(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return self.commit(url, tmp_path, hasher.hexdigest(), etag, last_modified)
+
+    def store_ranged(self, url: str, remote: RemoteFile) -> str:
+        f, tmp_path = self.open_temp()
+        try:
+            with f:
+                self.downloader.download_to_file(remote, f)
+            hasher = hashlib.sha256()
+            with open(tmp_path, "rb") as downloaded:
+                for chunk in iter(lambda: downloaded.read(DOWNLOAD_CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return self.commit(url, tmp_path, hasher.hexdigest(), remote.etag, remote.last_modified)
+
+    @contextmanager
+    def _lock(self):
+        self._ensure_dirs()
+        with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Remove os blobs menos usados até o cache caber em max_bytes."""
+        blobs_dir = os.path.join(self.directory, "blobs")
+        with self._lock():
+            blobs = []
+            for name in os.listdir(blobs_dir):
+                path = os.path.join(blobs_dir, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                blobs.append((st.st_mtime, st.st_size, path))
+
+            total = sum(size for _, size, _ in blobs)
+            for _, size, path in sorted(blobs):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.info(f"Cache parquet: removido {os.path.basename(path)} ({size} bytes)")
+                except FileNotFoundError:
+                    pass
+
+    def fetch(self, url: str, session: requests.Session, timeout=(5, 60)) -> str:
+        """
+        Retorna o caminho local do parquet da URL, validando a cópia em cache
+        com uma requisição condicional (If-None-Match / If-Modified-Since).
+        """
+        entry = self.lookup(url)
+        try:
+            resp = session.get(url, headers=self.conditional_headers(entry), stream=True, timeout=timeout)
+        except requests.RequestException as e:
+            if entry:
+                logger.warning(f"Falha ao validar {url} ({e}); usando cópia em cache")
+                return self.touch(entry)
+            raise
+
+        with resp:
+            if resp.status_code == 304 and entry:
+                logger.info(f"Cache parquet: hit para {url}")
+                return self.touch(entry)
+            resp.raise_for_status()
+            remote = self.downloader.remote_file(url, resp.headers) if self.downloader else None
+            if remote is None:
+                logger.info(f"Cache parquet: baixando {url}")
+                return self._store_response(url, resp)
+
+        # arquivo grande: o corpo desta resposta não é lido, o conteúdo vem em pedaços paralelos
+        logger.info(f"Cache parquet: baixando {url} em pedaços ({remote.size} bytes)")
+        try:
+            return self.store_ranged(url, remote)
+        except RangeNotSupported as e:
+            logger.warning(f"{e}; baixando {url} numa única conexão")
+        with session.get(url, stream=True, timeout=timeout) as resp:
+            resp.raise_for_status()
+            return self._store_response(url, resp)
+
+    def _store_response(self, url: str, resp: requests.Response) -> str:
+        return self.store_stream(
+            url,
+            resp.iter_content(DOWNLOAD_CHUNK_SIZE),
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+        )
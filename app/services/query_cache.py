@@ -0,0 +1,118 @@
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCache:
+    """
+    Cache em memória dos resultados já filtrados das consultas de
+    /data/ear e /data/hydro, limitado por TTL, número de entradas e bytes
+    (o menos usado sai primeiro). Os DataFrames guardados não devem ser
+    alterados por quem os lê.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_bytes: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            stored_at, size, value = item
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any, size: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        if size is None:
+            size = int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) else 0
+        if size > self.max_bytes:
+            logger.info(f"Resultado com {size} bytes não cabe no cache de consultas")
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (time.monotonic(), size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def query_key(query: Dict[str, Any]) -> str:
+    payload = json.dumps(query, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def encode_cursor(query: Dict[str, Any], offset: int, page_size: int) -> str:
+    """
+    Cursor opaco com a consulta e a posição da próxima página. Carrega a
+    consulta inteira para continuar funcionando mesmo depois que a entrada
+    do cache expirar.
+    """
+    payload = json.dumps({"q": query, "o": offset, "n": page_size}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _valid_value(value: Any, expected: tuple) -> bool:
+    # bool é int em Python, mas nunca é um valor válido para os campos numéricos
+    if isinstance(value, bool):
+        return bool in expected
+    if isinstance(value, list):
+        return list in expected and all(isinstance(item, str) for item in value)
+    return isinstance(value, expected)
+
+
+def decode_cursor(
+    cursor: str,
+    fields: Optional[Dict[str, tuple]] = None
+) -> Tuple[Dict[str, Any], int, int]:
+    """
+    Inverso de encode_cursor. fields ({campo: tipos aceitos}) exige que a
+    consulta tenha exatamente esses campos, com esses tipos (listas só de
+    texto); qualquer divergência é um cursor inválido (ValueError).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        query, offset, page_size = payload["q"], int(payload["o"]), int(payload["n"])
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError) as e:
+        raise ValueError("Cursor inválido.") from e
+    if not isinstance(query, dict) or offset < 0 or page_size < 1:
+        raise ValueError("Cursor inválido.")
+    if fields is not None and (
+        set(query) != set(fields) or not all(_valid_value(query[name], fields[name]) for name in fields)
+    ):
+        raise ValueError("Cursor inválido.")
+    return query, offset, page_size
@@ -0,0 +1,158 @@
+import logging
+import mmap
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import BinaryIO, Callable, List, NamedTuple, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class RangeNotSupported(Exception):
+    """O servidor ignorou o Range (respondeu 200) ou o arquivo mudou durante o download."""
+
+
+class RemoteFile(NamedTuple):
+    url: str
+    size: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class RangedDownloader:
+    """
+    Baixa um arquivo em pedaços de chunk_size bytes (HTTP Range) por várias
+    conexões ao mesmo tempo. Cada pedaço é escrito direto na sua posição do
+    destino (buffer pré-alocado ou arquivo mapeado em memória), sem juntar
+    cópias intermediárias. Um pedaço que falha é baixado de novo sozinho, e o
+    If-Range garante que todos os pedaços são da mesma versão do arquivo.
+
+    Só vale para arquivos a partir de min_size bytes (min_size=0 desativa).
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        chunk_size: int,
+        max_workers: int,
+        min_size: int,
+        retries: int = 3,
+        backoff: float = 0.5,
+        timeout=(5, 60)
+    ):
+        self.session = session
+        self.chunk_size = chunk_size
+        self.min_size = min_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ons-range")
+
+    @property
+    def enabled(self) -> bool:
+        return self.min_size > 0
+
+    def remote_file(self, url: str, headers) -> Optional[RemoteFile]:
+        """RemoteFile se os headers indicam suporte a Range e tamanho suficiente."""
+        if not self.enabled or (headers.get("Accept-Ranges") or "").lower() != "bytes":
+            return None
+        try:
+            size = int(headers["Content-Length"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if size < self.min_size:
+            return None
+        return RemoteFile(url, size, headers.get("ETag"), headers.get("Last-Modified"))
+
+    def probe(self, url: str) -> Optional[RemoteFile]:
+        """HEAD na URL; None quando o download em pedaços não se aplica."""
+        if not self.enabled:
+            return None
+        try:
+            resp = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.info(f"HEAD em {url} falhou ({e}); baixando sem Range")
+            return None
+        if resp.status_code != 200:
+            return None
+        return self.remote_file(resp.url or url, resp.headers)
+
+    def ranges(self, size: int) -> List[Tuple[int, int]]:
+        return [(start, min(start + self.chunk_size, size)) for start in range(0, size, self.chunk_size)]
+
+    def _fetch_range(self, remote: RemoteFile, start: int, end: int, write: Callable[[int, bytes], None]) -> None:
+        headers = {"Range": f"bytes={start}-{end - 1}"}
+        if remote.etag or remote.last_modified:
+            headers["If-Range"] = remote.etag or remote.last_modified
+        for attempt in range(self.retries + 1):
+            position = start
+            try:
+                with self.session.get(remote.url, headers=headers, stream=True, timeout=self.timeout) as resp:
+                    if resp.status_code == 200:
+                        raise RangeNotSupported(f"{remote.url} respondeu 200 a um pedido de Range")
+                    resp.raise_for_status()
+                    content_range = resp.headers.get("Content-Range") or ""
+                    if not content_range.startswith(f"bytes {start}-{end - 1}/"):
+                        raise RangeNotSupported(f"Content-Range inesperado para {remote.url}: {content_range!r}")
+                    for chunk in resp.iter_content(READ_CHUNK_SIZE):
+                        if position + len(chunk) > end:
+                            raise RangeNotSupported(f"{remote.url} enviou mais bytes que o pedaço {start}-{end - 1}")
+                        write(position, chunk)
+                        position += len(chunk)
+                if position != end:
+                    raise requests.ConnectionError(f"pedaço {start}-{end - 1} incompleto ({position - start} bytes)")
+                return
+            except RangeNotSupported:
+                raise
+            except requests.RequestException as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logger.warning(f"Pedaço {start}-{end - 1} de {remote.url} falhou ({e}); nova tentativa em {delay:.1f}s")
+                time.sleep(delay)
+
+    def _download(self, remote: RemoteFile, write: Callable[[int, bytes], None]) -> None:
+        started = time.monotonic()
+        futures = [self._executor.submit(self._fetch_range, remote, start, end, write)
+                   for start, end in self.ranges(remote.size)]
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+        for future in done:
+            if future.exception() is not None:
+                wait(pending)
+                raise future.exception()
+        logger.info(
+            f"{remote.url}: {remote.size} bytes em {len(futures)} pedaços "
+            f"({time.monotonic() - started:.2f}s)"
+        )
+
+    def download(self, remote: RemoteFile) -> bytearray:
+        """Conteúdo inteiro num único buffer pré-alocado."""
+        buffer = bytearray(remote.size)
+        view = memoryview(buffer)
+
+        def write(position: int, data: bytes) -> None:
+            view[position:position + len(data)] = data
+
+        self._download(remote, write)
+        return buffer
+
+    def download_to_file(self, remote: RemoteFile, f: BinaryIO) -> None:
+        """Grava no arquivo aberto (truncado para o tamanho final), via mmap."""
+        f.truncate(remote.size)
+        f.flush()
+        with mmap.mmap(f.fileno(), remote.size) as mapped:
+            view = memoryview(mapped)
+
+            def write(position: int, data: bytes) -> None:
+                view[position:position + len(data)] = data
+
+            try:
+                self._download(remote, write)
+                mapped.flush()
+            finally:
+                view.release()
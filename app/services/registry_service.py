@@ -1,4 +1,6 @@
-from app.services.ons_service import fetch_package_metadata, find_parquet_url, read_parquet_from_url, records_from_dataframe
+from app.services.ons_service import (
+    fetch_package_metadata, find_parquet_url, read_parquet_from_url, records_from_dataframe, RecordsJSONResponse
+)
 from fastapi.responses import JSONResponse
 
 def get_registry_data(package_id: str):
@@ -9,6 +11,6 @@ def get_registry_data(package_id: str):
             return JSONResponse({"error": "No parquet file found for this package_id."}, status_code=404)
         df = read_parquet_from_url(url)
         records = records_from_dataframe(df)
-        return JSONResponse({"data": records})
+        return RecordsJSONResponse({"data": records}, frame=df)
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
\ No newline at end of file
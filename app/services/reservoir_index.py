@@ -0,0 +1,92 @@
+import threading
+import unicodedata
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_name(value: str) -> str:
+    """Nome sem acentos, sem diferença de maiúsculas e sem espaços nas pontas."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+def parse_reservoir_names(value: Optional[str]) -> List[str]:
+    """'Furnas, Três Marias' -> ['furnas', 'tres marias'] (normalizados, sem vazios)."""
+    if not value:
+        return []
+    names = (normalize_name(part) for part in value.split(","))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+class ReservoirNameIndex:
+    """
+    Posições das linhas de cada nom_reservatorio distinto (~150 por dataset). A
+    busca compara os nomes normalizados, não as linhas.
+    """
+
+    def __init__(self, names: pd.Series):
+        if isinstance(names.dtype, pd.CategoricalDtype):
+            codes, uniques = names.cat.codes.to_numpy(), names.cat.categories
+        else:
+            codes, uniques = pd.factorize(names)
+        self.names = [normalize_name(str(name)) for name in uniques]
+        # linhas agrupadas por nome (na ordem original dentro de cada grupo); nulos ficam de fora
+        order = np.argsort(codes, kind="stable")
+        order = order[codes[order] >= 0]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.names))
+        self._rows = order
+        self._starts = np.concatenate([[0], np.cumsum(counts)])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._rows.nbytes + self._starts.nbytes)
+
+    def positions(self, names: List[str]) -> np.ndarray:
+        """Linhas (em ordem) cujo nome contém algum dos nomes normalizados pedidos."""
+        matched = [i for i, name in enumerate(self.names) if any(needle in name for needle in names)]
+        if not matched:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate([self._rows[self._starts[i]:self._starts[i + 1]] for i in matched])
+        rows.sort()
+        return rows
+
+
+class IndexedFrame:
+    """
+    DataFrame em cache junto com o índice de nomes, montado na primeira consulta
+    com nome_reservatorio e reaproveitado pelas seguintes.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._index: Optional[ReservoirNameIndex] = None
+        self._lock = threading.Lock()
+
+    @property
+    def name_index(self) -> ReservoirNameIndex:
+        with self._lock:
+            if self._index is None:
+                self._index = ReservoirNameIndex(self.df["nom_reservatorio"])
+            return self._index
+
+    @property
+    def nbytes(self) -> int:
+        # o índice guarda uma posição (int64) por linha
+        return int(self.df.memory_usage(deep=True).sum()) + 8 * len(self.df)
+
+    def select(self, names: List[str], columns: Optional[List[str]] = None) -> pd.DataFrame:
+        df = self.df
+        if names and "nom_reservatorio" in df.columns:
+            df = df.take(self.name_index.positions(names)).reset_index(drop=True)
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df
+
+
+def filter_by_names(df: pd.DataFrame, names: List[str]) -> pd.DataFrame:
+    """Mesmo filtro de IndexedFrame.select para um DataFrame avulso (ex: streaming)."""
+    if not names or "nom_reservatorio" not in df.columns:
+        return df
+    return df.take(ReservoirNameIndex(df["nom_reservatorio"]).positions(names))
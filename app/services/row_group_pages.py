@@ -0,0 +1,80 @@
+from typing import Callable, List, NamedTuple, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services.ons_dtypes import concat_frames
+
+# Caminho do parquet no cache em disco ou os bytes do arquivo (sem o cache)
+ParquetSource = Union[str, pa.Buffer]
+
+
+def open_parquet(source: ParquetSource) -> pq.ParquetFile:
+    # um leitor novo por chamada: o mesmo buffer pode ser lido por várias requisições ao mesmo tempo
+    return pq.ParquetFile(pa.BufferReader(source) if isinstance(source, pa.Buffer) else source)
+
+
+class RowGroup(NamedTuple):
+    source: ParquetSource
+    index: int
+    rows: int  # linhas do row group que passam no filtro da consulta
+
+
+def statistics_cover(
+    metadata: pq.RowGroupMetaData,
+    column: int,
+    start_ts: pd.Timestamp,
+    end_ts: pd.Timestamp
+) -> Optional[bool]:
+    """
+    Pelas estatísticas min/max de uma coluna de data nativa: True se todas as
+    linhas do row group estão em [start_ts, end_ts], False se nenhuma está e
+    None se só lendo a coluna para saber.
+    """
+    stats = metadata.column(column).statistics
+    if stats is None or not stats.has_min_max:
+        return None
+    low, high = pd.Timestamp(stats.min), pd.Timestamp(stats.max)
+    if low.tz is not None or high.tz is not None:
+        return None
+    if high < start_ts or low > end_ts:
+        return False
+    if low >= start_ts and high <= end_ts and stats.has_null_count and stats.null_count == 0:
+        return True
+    return None
+
+
+class RowGroupPages:
+    """
+    Paginação sobre os row groups dos parquets de uma consulta, sem decodificar
+    os arquivos inteiros: o plano guarda quantas linhas de cada row group passam
+    no filtro, e cada página decodifica só os row groups que a cobrem
+    (read_group devolve as linhas já filtradas de um row group).
+    """
+
+    def __init__(self, groups: List[RowGroup], read_group: Callable[[RowGroup], pd.DataFrame]):
+        self.groups = [group for group in groups if group.rows]
+        self._offsets = np.cumsum([0] + [group.rows for group in self.groups])
+        self._read_group = read_group
+
+    @property
+    def total_rows(self) -> int:
+        return int(self._offsets[-1])
+
+    @property
+    def nbytes(self) -> int:
+        buffers = {id(g.source): g.source.size for g in self.groups if isinstance(g.source, pa.Buffer)}
+        return sum(buffers.values()) + 64 * len(self.groups)
+
+    def page(self, offset: int, size: int) -> pd.DataFrame:
+        end = min(offset + size, self.total_rows)
+        if offset >= end:
+            return pd.DataFrame()
+        first = int(np.searchsorted(self._offsets, offset, side="right")) - 1
+        last = int(np.searchsorted(self._offsets, end, side="left"))
+        frames = [self._read_group(group) for group in self.groups[first:last]]
+        df = concat_frames(frames) if len(frames) > 1 else frames[0]
+        local = offset - int(self._offsets[first])
+        return df.iloc[local:local + (end - offset)].reset_index(drop=True)
@@ -0,0 +1,49 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Chamadas simultâneas com a mesma chave esperam uma única execução e recebem
+    o mesmo resultado (ou a mesma exceção). Nada fica guardado depois que a
+    execução termina: é coalescência de requisições, não cache.
+
+    fresh conta as execuções de fato; coalesced, as chamadas que pegaram carona
+    numa execução em andamento.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.fresh = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.fresh += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"fresh": self.fresh, "coalesced": self.coalesced, "in_flight": len(self._calls)}
@@ -0,0 +1,182 @@
+import json
+import logging
+from typing import Iterable, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.ons_dtypes import expand_frame
+from app.services.ons_service import (
+    fetch_package_metadata,
+    find_parquet_url,
+    iter_parquet_chunks,
+    iter_reservoir_chunks,
+    orjson,
+    orjson_compatible,
+    records_from_dataframe,
+    resolve_date_range,
+    resolve_reservoir_urls,
+)
+
+logger = logging.getLogger(__name__)
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+STREAM_BATCH_ROWS = 10_000
+
+
+class _ChunkSink:
+    """Destino de escrita do pyarrow que entrega os bytes já escritos em pedaços."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _iter_batches(frames: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    for df in frames:
+        for start in range(0, len(df), STREAM_BATCH_ROWS):
+            yield df.iloc[start:start + STREAM_BATCH_ROWS]
+
+
+def iter_ndjson(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Um registro JSON por linha, com a mesma conversão de valores do formato json."""
+    for batch in _iter_batches(frames):
+        records = records_from_dataframe(batch)
+        if orjson is not None and orjson_compatible(batch):
+            lines = [orjson.dumps(r) for r in records]
+        else:
+            lines = [
+                json.dumps(r, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+                for r in records
+            ]
+        lines.append(b"")
+        yield b"\n".join(lines)
+
+
+def _stream_schema(table: pa.Table) -> pa.Schema:
+    """
+    Schema do stream, tirado do primeiro lote e alargado para os lotes seguintes
+    caberem nele depois que os headers já foram enviados:
+    - coluna só com nulos (tipo null: texto vazio num pedaço ou coluna nula no
+      parquet daquele ano) vira large_string;
+    - inteiros viram float64: a mesma coluna chega como float64 num pedaço ou ano
+      com NaN (e aí com valores fracionários que não voltam para int64).
+    """
+    schema = table.schema.remove_metadata()
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.large_string()))
+        elif pa.types.is_integer(field.type):
+            schema = schema.set(i, field.with_type(pa.float64()))
+    return schema
+
+
+def _conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    # colunas ausentes num lote seguinte vão como nulas; as que não estão no schema ficam de fora
+    for field in schema:
+        if field.name not in table.column_names:
+            table = table.append_column(field, pa.nulls(len(table), field.type))
+    return table.select(schema.names).cast(schema)
+
+
+def iter_arrow(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Stream Arrow IPC; o schema vem do primeiro DataFrame (ver _stream_schema) e os seguintes são convertidos para ele."""
+    sink = _ChunkSink()
+    writer: Optional[pa.ipc.RecordBatchStreamWriter] = None
+    schema: Optional[pa.Schema] = None
+    try:
+        for df in frames:
+            # o schema do stream segue o de antes dos dtypes compactos (float64, int64 e texto)
+            table = pa.Table.from_pandas(expand_frame(df), preserve_index=False)
+            if writer is None:
+                schema = _stream_schema(table)
+                writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+            table = _conform(table, schema)
+            for batch in table.to_batches(max_chunksize=STREAM_BATCH_ROWS):
+                writer.write_batch(batch)
+                yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        # nenhuma linha no intervalo: ainda um stream Arrow válido, vazio
+        pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), pa.schema([])).close()
+    yield sink.drain()
+
+
+def streaming_response(frames: Iterable[pd.DataFrame], output_format: str) -> StreamingResponse:
+    if output_format == "arrow":
+        body = iter_arrow(frames)
+    else:
+        body = iter_ndjson(frames)
+    return StreamingResponse(body, media_type=STREAM_MEDIA_TYPES[output_format])
+
+
+def stream_reservoir_data(
+    package_id: str,
+    ano: Optional[int],
+    mes: Optional[int],
+    nome_reservatorio: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    output_format: str
+):
+    """
+    Versão em streaming (ndjson/arrow) de get_reservoir_data: cada parquet
+    anual é lido em lotes de STREAM_BATCH_ROWS linhas (sem decodificar o
+    arquivo inteiro), filtrado e enviado, sem montar a lista de registros.
+    """
+    try:
+        date_range = resolve_date_range(ano, mes, start_date, end_date)
+        if date_range is None:
+            return JSONResponse({"error": "Informe 'ano' ou 'start_date'/'end_date'."}, status_code=400)
+        start_ts, end_ts = date_range
+
+        urls_to_read = resolve_reservoir_urls(package_id, start_ts, end_ts)
+        if not urls_to_read:
+            return JSONResponse({"error": "Nenhum parquet encontrado para os anos requisitados."}, status_code=404)
+
+        frames = iter_reservoir_chunks(
+            package_id, start_ts, end_ts, STREAM_BATCH_ROWS, nome_reservatorio, urls=urls_to_read
+        )
+        return streaming_response(frames, output_format)
+
+    except Exception as e:
+        logger.exception("Erro processando requisição")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+def stream_registry_data(package_id: str, output_format: str):
+    try:
+        metadata = fetch_package_metadata(package_id)
+        url = find_parquet_url(metadata)
+        if not url:
+            return JSONResponse({"error": "No parquet file found for this package_id."}, status_code=404)
+        return streaming_response(iter_parquet_chunks(url, STREAM_BATCH_ROWS), output_format)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
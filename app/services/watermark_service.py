@@ -0,0 +1,50 @@
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from google.cloud.exceptions import NotFound
+
+from app.services.gcs_service import get_storage_client
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_PREFIX = "Data_Engineering/watermarks"
+
+
+def _watermark_blob(bucket_name: str, package_id: str, credentials_path: str = None):
+    return get_storage_client(credentials_path).bucket(bucket_name).blob(f"{WATERMARK_PREFIX}/{package_id}.json")
+
+
+def read_watermark(bucket_name: str, package_id: str, credentials_path: str = None) -> Optional[Dict[str, Any]]:
+    """
+    Lê a marca d'água do pacote: {"last_date": "YYYY-MM-DD", "scale": {coluna: [min, max]}, ...}.
+    Retorna None se o pacote ainda não teve execução incremental.
+    """
+    blob = _watermark_blob(bucket_name, package_id, credentials_path)
+    try:
+        return json.loads(blob.download_as_text())
+    except NotFound:
+        logger.info(f"Sem marca d'água para {package_id}")
+        return None
+
+
+def write_watermark(
+    bucket_name: str,
+    package_id: str,
+    last_date: str,
+    scale: Dict[str, Any],
+    metadata: Optional[Dict[str, Any]] = None,
+    credentials_path: str = None
+) -> Dict[str, Any]:
+    watermark = {
+        **(metadata or {}),
+        "package_id": package_id,
+        "last_date": last_date,
+        "scale": scale,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    blob = _watermark_blob(bucket_name, package_id, credentials_path)
+    blob.upload_from_string(json.dumps(watermark), content_type="application/json")
+    logger.info(f"Marca d'água de {package_id} atualizada para {last_date}")
+    return watermark
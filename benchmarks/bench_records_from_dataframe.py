@@ -0,0 +1,89 @@
+"""
+Benchmark: serialização linha a linha (implementação antiga) x coluna a coluna
++ RecordsJSONResponse (records_from_dataframe atual) num DataFrame de 1M de
+linhas com os tipos que aparecem nos parquets do ONS. Confere também que o
+JSON gerado é idêntico.
+
+Uso: python -m benchmarks.bench_records_from_dataframe [n_linhas]
+"""
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+
+from app.services.ons_service import RecordsJSONResponse, records_from_dataframe
+
+
+def records_from_dataframe_rowwise(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Implementação anterior, mantida aqui como referência."""
+    df = df.where(pd.notnull(df), None)
+    recs = df.to_dict(orient="records")
+    cleaned: List[Dict[str, Any]] = []
+    for r in recs:
+        nr: Dict[str, Any] = {}
+        for k, v in r.items():
+            if isinstance(v, (np.integer,)):
+                nr[k] = int(v)
+            elif isinstance(v, (np.floating, float)):
+                fv = float(v)
+                nr[k] = fv if np.isfinite(fv) else None
+            elif hasattr(v, "to_pydatetime"):
+                try:
+                    dt = v.to_pydatetime()
+                    nr[k] = dt.strftime("%Y-%m-%d")
+                except Exception:
+                    nr[k] = None
+            elif isinstance(v, str):
+                s = v.strip()
+                nr[k] = s if s != "" else None
+            else:
+                nr[k] = v
+        cleaned.append(nr)
+    return cleaned
+
+
+def make_frame(n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    names = np.array([f" Reservatório {i} " for i in range(150)] + [""], dtype=object)
+    volumes = rng.random(n) * 1000
+    volumes[rng.random(n) < 0.05] = np.nan
+    volumes[rng.random(n) < 0.001] = np.inf
+    dates = pd.Timestamp("2000-01-01") + pd.to_timedelta(rng.integers(0, 9000, n), unit="D")
+    return pd.DataFrame({
+        "id_reservatorio": rng.integers(0, 150, n),
+        "nom_reservatorio": names[rng.integers(0, len(names), n)],
+        "ear_data": dates,
+        "ear_reservatorio_percentual": volumes,
+        "ear_total_mwmes": rng.random(n) * 1e5,
+    })
+
+
+def render_rowwise(df: pd.DataFrame) -> bytes:
+    return JSONResponse({"data": records_from_dataframe_rowwise(df)}).body
+
+
+def render_columnar(df: pd.DataFrame) -> bytes:
+    return RecordsJSONResponse({"data": records_from_dataframe(df)}, frame=df).body
+
+
+def timed(fn, df):
+    started = time.perf_counter()
+    body = fn(df)
+    return time.perf_counter() - started, body
+
+
+def main(n: int = 1_000_000):
+    df = make_frame(n)
+    old_s, old_body = timed(render_rowwise, df)
+    new_s, new_body = timed(render_columnar, df)
+    print(f"linhas: {n}")
+    print(f"linha a linha:  {old_s:.2f}s")
+    print(f"coluna a coluna: {new_s:.2f}s ({old_s / new_s:.1f}x)")
+    print(f"JSON idêntico: {old_body == new_body}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,190 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, unquote, urlparse
+
+import google_crc32c
+import pytest
+
+from app.services import gcs_service
+from app.services.gcs_service import get_storage_client, reset_storage_clients, upload_bytes_to_gcs, upload_to_gcs
+
+
+class FakeGCS:
+    """Servidor local com o pedaço da API JSON do GCS usado nos uploads (multipart, resumable, compose e delete)."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.requests = []
+        self.fail_puts = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body=None, headers=None):
+                data = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def _object(self, bucket, name):
+                data = fake.objects[(bucket, name)]
+                return {
+                    "kind": "storage#object", "bucket": bucket, "name": name, "size": str(len(data)), "generation": "1",
+                    "crc32c": base64.b64encode(google_crc32c.value(data).to_bytes(4, "big")).decode(),
+                    "md5Hash": base64.b64encode(hashlib.md5(data).digest()).decode(),
+                }
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                body = self._body()
+                with fake.lock:
+                    fake.requests.append(("POST", url.path, query.get("uploadType", [None])[0]))
+
+                match = re.match(r"/upload/storage/v1/b/([^/]+)/o$", url.path)
+                if match and query.get("uploadType") == ["multipart"]:
+                    boundary = self.headers["Content-Type"].split("boundary=")[1].strip('"').encode()
+                    parts = body.split(b"--" + boundary)
+                    metadata = json.loads(parts[1].split(b"\r\n\r\n", 1)[1])
+                    with fake.lock:
+                        fake.objects[(match.group(1), metadata["name"])] = parts[2].split(b"\r\n\r\n", 1)[1][:-2]
+                    return self._reply(200, self._object(match.group(1), metadata["name"]))
+                if match and query.get("uploadType") == ["resumable"]:
+                    name = query.get("name", [json.loads(body or b"{}").get("name")])[0]
+                    upload_id = uuid.uuid4().hex
+                    fake.uploads[upload_id] = (match.group(1), name, bytearray())
+                    location = f"{fake.url}{url.path}?uploadType=resumable&upload_id={upload_id}"
+                    return self._reply(200, {}, {"Location": location})
+
+                match = re.match(r"/storage/v1/b/([^/]+)/o/(.+)/compose$", url.path)
+                if match:
+                    bucket, name = match.group(1), unquote(match.group(2))
+                    sources = [s["name"] for s in json.loads(body)["sourceObjects"]]
+                    with fake.lock:
+                        fake.objects[(bucket, name)] = b"".join(fake.objects[(bucket, s)] for s in sources)
+                    return self._reply(200, self._object(bucket, name))
+                self._reply(404, {"error": {"code": 404, "message": "not found"}})
+
+            def do_PUT(self):
+                url = urlparse(self.path)
+                body = self._body()
+                with fake.lock:
+                    fake.requests.append(("PUT", url.path, "resumable"))
+                    if fake.fail_puts:
+                        fake.fail_puts -= 1
+                        return self._reply(503, {"error": {"code": 503, "message": "unavailable"}})
+                bucket, name, buffer = fake.uploads[parse_qs(url.query)["upload_id"][0]]
+                content_range = self.headers.get("Content-Range", "")
+                match = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", content_range)
+                if match:
+                    del buffer[int(match.group(1)):]
+                    buffer.extend(body)
+                total = content_range.rsplit("/", 1)[-1]
+                if total != "*" and len(buffer) == int(total):
+                    with fake.lock:
+                        fake.objects[(bucket, name)] = bytes(buffer)
+                    return self._reply(200, self._object(bucket, name))
+                self._reply(308, None, {"Range": f"bytes=0-{len(buffer) - 1}"})
+
+            def do_DELETE(self):
+                url = urlparse(self.path)
+                match = re.match(r"/storage/v1/b/([^/]+)/o/(.+)$", url.path)
+                with fake.lock:
+                    fake.requests.append(("DELETE", url.path, None))
+                    fake.objects.pop((match.group(1), unquote(match.group(2))), None)
+                self._reply(204)
+
+        return Handler
+
+
+@pytest.fixture
+def fake_gcs():
+    fake = FakeGCS()
+    reset_storage_clients()
+    with patch.dict(os.environ, {"STORAGE_EMULATOR_HOST": fake.url}):
+        yield fake
+    reset_storage_clients()
+    fake.close()
+
+
+def test_large_upload_is_chunked_and_survives_transient_failure(fake_gcs):
+    # Arrange
+    data = os.urandom(9 * 1024 * 1024)
+    fake_gcs.fail_puts = 1
+
+    # Act
+    upload_bytes_to_gcs("bucket", data, "processed/out.parquet", chunk_size=1024 * 1024, composite_threshold=0)
+
+    # Assert
+    assert fake_gcs.objects[("bucket", "processed/out.parquet")] == data
+    puts = [r for r in fake_gcs.requests if r[0] == "PUT"]
+    # 9 pedaços de 1 MiB + a repetição do que falhou
+    assert len(puts) == 10
+
+
+def test_small_upload_uses_single_request(fake_gcs):
+    # Act
+    upload_bytes_to_gcs("bucket", b"PAR1data", "small.parquet")
+
+    # Assert
+    assert fake_gcs.objects[("bucket", "small.parquet")] == b"PAR1data"
+    assert fake_gcs.requests == [("POST", "/upload/storage/v1/b/bucket/o", "multipart")]
+
+
+def test_parallel_composite_upload_from_file(fake_gcs):
+    # Arrange
+    data = os.urandom(3 * 1024 * 1024 + 123)
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        f.write(data)
+
+    # Act
+    try:
+        with patch.object(gcs_service, "GCS_COMPOSITE_PART_SIZE", 512 * 1024):
+            upload_to_gcs("bucket", f.name, "processed/big.csv", composite_threshold=1024 * 1024)
+    finally:
+        os.remove(f.name)
+
+    # Assert
+    assert fake_gcs.objects[("bucket", "processed/big.csv")] == data
+    assert list(fake_gcs.objects) == [("bucket", "processed/big.csv")]
+    assert sum(1 for r in fake_gcs.requests if r[1].endswith("/compose")) == 1
+    assert sum(1 for r in fake_gcs.requests if r[0] == "DELETE") == 7
+
+
+def test_storage_client_is_reused_between_uploads(fake_gcs):
+    # Act
+    upload_bytes_to_gcs("bucket", b"a", "a.bin")
+    client = get_storage_client()
+    upload_bytes_to_gcs("bucket", b"b", "b.bin")
+
+    # Assert
+    assert get_storage_client() is client
+    assert fake_gcs.objects[("bucket", "b.bin")] == b"b"
@@ -28,7 +28,7 @@ def test_get_hydro_data_endpoint_success(mock_ons_service):
     assert len(json_response["data"]) == 1
     assert json_response["data"][0]["value"] == 100
     mock_ons_service.assert_called_once_with(
-        "some-valid-package-id", 2023, None, None, None, None, 1, 100
+        "some-valid-package-id", 2023, None, None, None, None, 1, 100, cursor=None
     )
 
 def test_get_hydro_data_endpoint_missing_package_id():
@@ -0,0 +1,311 @@
+import datetime
+import io
+import threading
+import time
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from app.controllers import pipeline_controller
+from app.main import app
+from app.pipeline.transformers.data_cleaner import normalize_and_clean
+
+client = TestClient(app)
+
+PIPELINE_PARAMS = {
+    "registry_package_id": "registry",
+    "ear_package_id": "ear",
+    "hydro_package_id": "hydro",
+    "start_date": "2023-01-01",
+    "end_date": "2023-03-01",
+    "load_to_bigquery": "false",
+    "incremental": "true",
+}
+
+DATES = pd.date_range("2023-01-01", "2023-03-01")
+
+
+def extract_ear(package_id, start_date, end_date):
+    df = pd.DataFrame({
+        "nom_reservatorio": "Furnas",
+        "ear_data": DATES,
+        "ear_reservatorio_percentual": range(len(DATES)),
+    })
+    return df[(df["ear_data"] >= start_date) & (df["ear_data"] <= end_date)]
+
+
+def extract_hydro(package_id, start_date, end_date):
+    df = pd.DataFrame({
+        "id_reservatorio": "FUR",
+        "nom_bacia": "Grande",
+        "din_instante": DATES,
+        "val_volumeutilcon": [float(i) for i in range(len(DATES))],
+    })
+    return df[(df["din_instante"] >= start_date) & (df["din_instante"] <= end_date)]
+
+
+def wait_for_job(job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/pipeline/jobs/{job_id}").json()
+        if job["state"] in ("succeeded", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.01)
+
+
+def run_with_watermark(watermark, params=None, job_state="DONE", job_errors=None):
+    uploaded = {}
+
+    def upload(bucket_name, data, blob_name):
+        uploaded["df"] = pd.read_parquet(io.BytesIO(data))
+        return "uploaded"
+
+    registry = pd.DataFrame({"nom_reservatorio": ["Furnas"], "id_reservatorio": ["FUR"], "nom_bacia": ["Grande"]})
+    bigquery = MagicMock()
+    bigquery.return_value.get_job_status.return_value = {"state": job_state, "errors": job_errors}
+    bigquery.return_value.submit_pipeline_load.return_value = {"job_id": "job2", "location": "US", "state": "RUNNING"}
+    with patch("app.controllers.pipeline_controller.warm_parquet_cache_async", new=AsyncMock(return_value=[])), \
+         patch("app.controllers.pipeline_controller.BigQueryService", bigquery), \
+         patch("app.controllers.pipeline_controller.read_watermark", return_value=watermark), \
+         patch("app.controllers.pipeline_controller.write_watermark", side_effect=lambda b, p, d, s, m: {"last_date": d}) as mock_write, \
+         patch("app.controllers.pipeline_controller.extract_registry_df", return_value=registry), \
+         patch("app.controllers.pipeline_controller.extract_ear_df", side_effect=extract_ear) as mock_ear, \
+         patch("app.controllers.pipeline_controller.extract_hydro_df", side_effect=extract_hydro), \
+         patch("app.controllers.pipeline_controller.upload_bytes_to_gcs", side_effect=upload):
+        response = client.post("/api/pipeline/run", params={**PIPELINE_PARAMS, **(params or {})})
+        assert response.status_code == 202
+        job = wait_for_job(response.json()["job_id"])
+    return job, uploaded.get("df"), mock_ear, mock_write
+
+
+def test_incremental_run_extracts_warmup_and_writes_only_new_dates():
+    # Arrange
+    watermark = {"last_date": "2023-02-20", "hydro_package_id": "hydro", "scale": {}}
+
+    # Act
+    job, df, mock_ear, mock_write = run_with_watermark(watermark)
+
+    # Assert
+    assert job["status_code"] == 200
+    assert job["result"]["watermark"] == "2023-03-01"
+    mock_ear.assert_called_once_with("ear", "2023-01-22", "2023-03-01")
+    assert len(df) == 9
+    assert (df["mes"].iloc[0], df["dia"].iloc[0]) == (2, 21)
+    # lag de 30 dias calculado com o aquecimento, não vazio
+    assert df["val_volumeutilcon_lag30"].notnull().all()
+    assert isinstance(df["partition_date"].iloc[0], datetime.date)
+    assert mock_write.call_args.args[2] == "2023-03-01"
+    assert set(mock_write.call_args.args[3]) >= {"val_volumeutilcon", "val_volumeutilcon_lag30"}
+
+
+def test_incremental_run_without_new_dates_does_nothing():
+    # Act
+    job, df, mock_ear, mock_write = run_with_watermark(
+        {"last_date": "2023-03-01", "hydro_package_id": "hydro", "scale": {}}
+    )
+
+    # Assert
+    assert job["status_code"] == 200
+    assert job["result"]["rows"] == 0
+    mock_ear.assert_not_called()
+    mock_write.assert_not_called()
+
+
+def test_incremental_run_without_watermark_processes_whole_window():
+    # Act
+    job, df, mock_ear, mock_write = run_with_watermark(None)
+
+    # Assert
+    assert job["status_code"] == 200
+    mock_ear.assert_called_once_with("ear", "2023-01-01", "2023-03-01")
+    assert len(df) == len(DATES)
+    assert mock_write.call_args.args[2] == "2023-03-01"
+
+
+def test_incremental_run_with_load_keeps_watermark_pending_until_job_finishes():
+    # Arrange
+    watermark = {"last_date": "2023-02-20", "hydro_package_id": "hydro", "scale": {}}
+
+    # Act
+    job, df, mock_ear, mock_write = run_with_watermark(watermark, params={"load_to_bigquery": "true"})
+
+    # Assert
+    assert job["status_code"] == 200
+    body = job["result"]
+    assert body["bigquery_result"]["status_url"] == "/api/pipeline/bigquery/jobs/job2?location=US"
+    bucket, package_id, committed_date, committed_scale, metadata = mock_write.call_args.args
+    assert committed_date == "2023-02-20"
+    assert committed_scale == {}
+    assert metadata["pending"]["job_id"] == "job2"
+    assert metadata["pending"]["last_date"] == "2023-03-01"
+
+
+def test_incremental_run_commits_finished_pending_load():
+    # Arrange
+    watermark = {
+        "last_date": "2023-02-10", "hydro_package_id": "hydro", "scale": {},
+        "pending": {"job_id": "job1", "location": "US", "last_date": "2023-02-20", "scale": {}},
+    }
+
+    # Act
+    job, df, mock_ear, mock_write = run_with_watermark(watermark)
+
+    # Assert
+    assert job["status_code"] == 200
+    mock_ear.assert_called_once_with("ear", "2023-01-22", "2023-03-01")
+
+
+def test_incremental_run_redoes_dates_of_failed_pending_load():
+    # Arrange
+    watermark = {
+        "last_date": "2023-02-10", "hydro_package_id": "hydro", "scale": {},
+        "pending": {"job_id": "job1", "location": "US", "last_date": "2023-02-20", "scale": {}},
+    }
+
+    # Act
+    job, df, mock_ear, mock_write = run_with_watermark(watermark, job_errors=[{"message": "falhou"}])
+
+    # Assert
+    assert job["status_code"] == 200
+    mock_ear.assert_called_once_with("ear", "2023-01-12", "2023-03-01")
+
+
+def test_incremental_run_refuses_while_pending_load_is_running():
+    # Arrange
+    watermark = {
+        "last_date": "2023-02-10", "hydro_package_id": "hydro", "scale": {},
+        "pending": {"job_id": "job1", "location": "US", "last_date": "2023-02-20", "scale": {}},
+    }
+
+    # Act
+    job, df, mock_ear, mock_write = run_with_watermark(watermark, job_state="RUNNING")
+
+    # Assert
+    assert job["status_code"] == 409
+    assert job["state"] == "failed"
+    assert job["result"]["job_id"] == "job1"
+    mock_ear.assert_not_called()
+    mock_write.assert_not_called()
+
+
+def test_second_incremental_run_for_same_package_is_refused_while_first_runs():
+    # Arrange
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_ear(package_id, start_date, end_date):
+        started.set()
+        release.wait(5)
+        return extract_ear(package_id, start_date, end_date)
+
+    bigquery = MagicMock()
+    registry = pd.DataFrame({"nom_reservatorio": ["Furnas"], "id_reservatorio": ["FUR"], "nom_bacia": ["Grande"]})
+    with patch("app.controllers.pipeline_controller.warm_parquet_cache_async", new=AsyncMock(return_value=[])), \
+         patch("app.controllers.pipeline_controller.BigQueryService", bigquery), \
+         patch("app.controllers.pipeline_controller.read_watermark", return_value=None), \
+         patch("app.controllers.pipeline_controller.write_watermark") as mock_write, \
+         patch("app.controllers.pipeline_controller.extract_registry_df", return_value=registry), \
+         patch("app.controllers.pipeline_controller.extract_ear_df", side_effect=blocking_ear), \
+         patch("app.controllers.pipeline_controller.extract_hydro_df", side_effect=extract_hydro), \
+         patch("app.controllers.pipeline_controller.upload_bytes_to_gcs", return_value="uploaded"):
+        # Act
+        first = client.post("/api/pipeline/run", params={**PIPELINE_PARAMS, "end_date": "2023-02-15"})
+        assert started.wait(5)
+        second = client.post("/api/pipeline/run", params={**PIPELINE_PARAMS, "write_mode": "append"})
+        full_run = client.post("/api/pipeline/run", params={**PIPELINE_PARAMS, "incremental": "false"})
+        release.set()
+        first_job = wait_for_job(first.json()["job_id"])
+        full_job = wait_for_job(full_run.json()["job_id"])
+
+    # Assert
+    assert first.status_code == 202
+    assert second.status_code == 409
+    assert second.json()["job_id"] == first.json()["job_id"]
+    # execução completa não usa a marca d'água e pode rodar junto
+    assert full_run.status_code == 202
+    assert first_job["state"] == "succeeded" and full_job["state"] == "succeeded"
+    mock_write.assert_called_once()
+
+
+def test_two_partition_runs_on_same_day_write_disjoint_data_days():
+    # Arrange
+    params = {"load_to_bigquery": "true", "write_mode": "partition"}
+    first_watermark = {"last_date": "2023-02-10", "hydro_package_id": "hydro", "scale": {}}
+
+    # Act
+    first, first_df, _, first_write = run_with_watermark(first_watermark, params={**params, "end_date": "2023-02-20"})
+    _, _, committed_date, committed_scale, metadata = first_write.call_args.args
+    # o load da primeira execução terminou sem erros: a segunda parte da data pendente
+    second_watermark = {"last_date": committed_date, "scale": committed_scale, **metadata}
+    second, second_df, second_ear, _ = run_with_watermark(second_watermark, params=params)
+
+    # Assert
+    assert first["status_code"] == 200 and second["status_code"] == 200
+    second_ear.assert_called_once_with("ear", "2023-01-22", "2023-03-01")
+    first_partitions = set(first_df["partition_date"].astype(str))
+    second_partitions = set(second_df["partition_date"].astype(str))
+    assert first_partitions == {str(d.date()) for d in pd.date_range("2023-02-11", "2023-02-20")}
+    assert second_partitions == {str(d.date()) for d in pd.date_range("2023-02-21", "2023-03-01")}
+    # mesmo dia de processamento, dias de dados diferentes: a segunda (que só apaga os dias dela) não apaga a primeira
+    assert first_df["processed_date"].nunique() == 1
+    assert first_df["processed_date"].iloc[0] == second_df["processed_date"].iloc[0]
+    assert second["result"]["partitions"] == {"min": "2023-02-21", "max": "2023-03-01"}
+
+
+def test_transform_by_year_matches_whole_range_in_one_pass():
+    # Arrange
+    rng = np.random.default_rng(7)
+    dates = pd.date_range("2020-11-15", "2023-02-10")
+    ear = pd.concat([
+        pd.DataFrame({"nom_reservatorio": "Furnas", "ear_data": dates, "ear_reservatorio_percentual": rng.random(len(dates))}),
+        # Emborcação tem um buraco de 40 dias na virada de 2021 para 2022
+        pd.DataFrame({"nom_reservatorio": "Emborcação", "ear_data": dates[(dates < "2021-12-10") | (dates > "2022-01-19")]}),
+    ], ignore_index=True)
+    ear.loc[ear["ear_reservatorio_percentual"].isna(), "ear_reservatorio_percentual"] = 0.5
+    hydro = pd.DataFrame({
+        "id_reservatorio": np.repeat(["FUR", "EMB"], len(dates)),
+        "nom_bacia": "Grande",
+        "din_instante": np.tile(dates, 2),
+        "val_volumeutilcon": rng.random(2 * len(dates)) * 100,
+    })
+    registry = pd.DataFrame({
+        "nom_reservatorio": ["Furnas", "Emborcação"], "id_reservatorio": ["FUR", "EMB"], "nom_bacia": ["Grande", "Paranaíba"]
+    })
+
+    def in_window(df, column, start_date, end_date):
+        return df[(df[column] >= start_date) & (df[column] <= end_date)].reset_index(drop=True)
+
+    expected = pipeline_controller._aggregate(ear, hydro, registry)
+    expected = pipeline_controller.create_features(expected, pipeline_controller.FEATURE_SPECS, groupby="id_reservatorio")
+    expected = normalize_and_clean(expected)
+
+    # Act
+    with patch("app.controllers.pipeline_controller.extract_ear_df",
+               side_effect=lambda p, s, e: in_window(ear, "ear_data", s, e)) as mock_ear, \
+         patch("app.controllers.pipeline_controller.extract_hydro_df",
+               side_effect=lambda p, s, e: in_window(hydro, "din_instante", s, e)):
+        result = pipeline_controller._transform(registry, "ear", "hydro", "2020-11-15", "2023-02-10", "2024-01-01")
+
+    # Assert
+    assert [call.args[1:] for call in mock_ear.call_args_list] == [
+        ("2020-11-15", "2020-12-31"), ("2021-01-01", "2021-12-31"), ("2022-01-01", "2022-12-31"), ("2023-01-01", "2023-02-10")
+    ]
+    assert result["val_volumeutilcon_lag30"].notnull().sum() > 0
+    pd.testing.assert_frame_equal(
+        result.drop(columns=["processed_date", "partition_date"]), expected, check_dtype=False, check_categorical=False
+    )
+
+
+def test_get_bigquery_job_status():
+    # Arrange
+    with patch("app.controllers.pipeline_controller.BigQueryService") as bigquery:
+        bigquery.return_value.get_job_status.return_value = {"job_id": "job1", "state": "DONE", "errors": None}
+
+        # Act
+        response = client.get("/api/pipeline/bigquery/jobs/job1", params={"location": "US"})
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json()["state"] == "DONE"
+    bigquery.return_value.get_job_status.assert_called_once_with("job1", "US")
@@ -0,0 +1,183 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import requests
+
+from app.services.parquet_cache import ParquetCache
+from app.services.ranged_download import RangedDownloader
+
+CHUNK = 64 * 1024
+
+
+class RangeServer(ThreadingHTTPServer):
+    """Servidor HTTP local com suporte a Range (um intervalo por pedido), ETag e If-Range."""
+
+    daemon_threads = True
+
+    def __init__(self, content: bytes):
+        super().__init__(("127.0.0.1", 0), RangeHandler)
+        self.content = content
+        self.etag = '"v1"'
+        self.accept_ranges = True
+        self.truncate_once = set()  # inícios de intervalo que falham (corpo pela metade) na 1ª vez
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/hydro-2023.parquet"
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def _send_full(self, body: bool):
+        content = self.server.content
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", self.server.etag)
+        if self.server.accept_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if body:
+            self.wfile.write(content)
+
+    def do_HEAD(self):
+        self._send_full(body=False)
+
+    def do_GET(self):
+        server = self.server
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range") or "")
+        if_range = self.headers.get("If-Range")
+        if not match or not server.accept_ranges or (if_range and if_range != server.etag):
+            with server.lock:
+                server.requests["full"] += 1
+            return self._send_full(body=True)
+
+        start, end = int(match.group(1)), int(match.group(2))
+        with server.lock:
+            server.requests[start] += 1
+            truncate = start in server.truncate_once
+            server.truncate_once.discard(start)
+        part = server.content[start:end + 1]
+        self.send_response(206)
+        self.send_header("Content-Length", str(len(part)))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{len(server.content)}")
+        self.send_header("ETag", server.etag)
+        self.end_headers()
+        self.wfile.write(part[:len(part) // 2] if truncate else part)
+        if truncate:
+            self.close_connection = True
+
+
+def parquet_bytes(rows: int = 40000) -> bytes:
+    rng = np.random.default_rng(1)
+    buf = io.BytesIO()
+    pd.DataFrame({"val": rng.random(rows), "id": np.arange(rows)}).to_parquet(buf)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def server():
+    srv = RangeServer(parquet_bytes())
+    thread = threading.Thread(target=srv.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def downloader():
+    session = requests.Session()
+    yield RangedDownloader(session, chunk_size=CHUNK, max_workers=4, min_size=1, backoff=0)
+    session.close()
+
+
+def test_download_reassembles_ranges_into_one_buffer(server, downloader):
+    # Arrange
+    remote = downloader.probe(server.url)
+
+    # Act
+    content = downloader.download(remote)
+
+    # Assert
+    assert remote.size == len(server.content)
+    assert remote.etag == '"v1"'
+    assert bytes(content) == server.content
+    assert sorted(server.requests) == list(range(0, len(server.content), CHUNK))
+    assert set(server.requests.values()) == {1}
+
+
+def test_failed_chunk_is_retried_alone(server, downloader):
+    # Arrange
+    server.truncate_once = {CHUNK, 3 * CHUNK}
+    remote = downloader.probe(server.url)
+
+    # Act
+    content = downloader.download(remote)
+
+    # Assert
+    assert bytes(content) == server.content
+    assert server.requests[CHUNK] == 2
+    assert server.requests[3 * CHUNK] == 2
+    assert server.requests[0] == 1
+    assert "full" not in server.requests
+
+
+def test_parquet_cache_stores_ranged_download(server, downloader):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Arrange
+        cache = ParquetCache(tmpdir, max_bytes=10 * len(server.content), downloader=downloader)
+
+        # Act
+        path = cache.fetch(server.url, downloader.session)
+
+        # Assert
+        with open(path, "rb") as f:
+            assert f.read() == server.content
+        assert os.path.basename(path) == f"{hashlib.sha256(server.content).hexdigest()}.parquet"
+        assert cache.lookup(server.url)["etag"] == '"v1"'
+        assert pq.read_table(path).num_rows == 40000
+        assert server.requests["full"] == 1  # a validação condicional; o corpo dela não é lido
+        assert len([key for key in server.requests if key != "full"]) > 1
+
+
+def test_probe_skips_servers_without_range_support(server, downloader):
+    # Arrange
+    server.accept_ranges = False
+
+    # Act
+    remote = downloader.probe(server.url)
+
+    # Assert
+    assert remote is None
+
+
+def test_file_changed_midway_falls_back_to_single_download(server, downloader):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Arrange
+        cache = ParquetCache(tmpdir, max_bytes=10 * len(server.content), downloader=downloader)
+        original_remote_file = downloader.remote_file
+        # o arquivo muda entre a validação e os pedaços: If-Range não casa e o servidor responde 200
+        downloader.remote_file = lambda url, headers: original_remote_file(url, {**headers, "ETag": '"v0"'})
+
+        # Act
+        path = cache.fetch(server.url, downloader.session)
+
+        # Assert
+        with open(path, "rb") as f:
+            assert f.read() == server.content
+        assert server.requests["full"] >= 2
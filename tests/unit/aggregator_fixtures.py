@@ -0,0 +1,59 @@
+"""
+Dados sintéticos e a implementação anterior do aggregator (dois pd.merge),
+usados pelos testes e pelo benchmark para comparar os resultados.
+"""
+import numpy as np
+import pandas as pd
+
+from app.pipeline.transformers.aggregator import FINAL_COLUMNS
+
+
+def reference_aggregate(df_ear: pd.DataFrame, df_hydro: pd.DataFrame, df_registry: pd.DataFrame) -> pd.DataFrame:
+    """Implementação anterior (dois pd.merge), usada como referência do resultado."""
+    df_hydro = df_hydro.copy()
+    df_merged = pd.merge(df_ear, df_registry, on='nom_reservatorio', how='left')
+    if 'nom_bacia_x' in df_merged.columns:
+        df_merged['nom_bacia'] = df_merged['nom_bacia_x']
+    if 'tip_reservatorio_x' in df_merged.columns:
+        df_merged['tip_reservatorio'] = df_merged['tip_reservatorio_x']
+
+    join_columns_left = ['id_reservatorio', 'nom_bacia', 'ear_data']
+    join_columns_right = ['id_reservatorio', 'nom_bacia', 'din_instante']
+    if all(col in df_merged.columns for col in join_columns_left) and all(col in df_hydro.columns for col in join_columns_right[:2]):
+        df_merged['ear_data'] = pd.to_datetime(df_merged['ear_data'], errors='coerce')
+        df_hydro['din_instante'] = pd.to_datetime(df_hydro['din_instante'], errors='coerce')
+        df_final = pd.merge(df_merged, df_hydro, left_on=join_columns_left, right_on=join_columns_right, how='left')
+    else:
+        df_final = df_merged
+
+    existing_cols = [col for col in FINAL_COLUMNS if col in df_final.columns]
+    return df_final[existing_cols].copy().reset_index(drop=True)
+
+
+def make_sources(n_reservoirs: int = 6, n_days: int = 40, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2023-01-01", periods=n_days, freq="D")
+    names = [f"Reservatorio {i}" for i in range(n_reservoirs)]
+    ear = pd.DataFrame({
+        "nom_reservatorio": np.repeat(names + ["Sem cadastro"], n_days),
+        "ear_data": np.tile(dates, n_reservoirs + 1),
+        "ear_reservatorio_percentual": rng.random((n_reservoirs + 1) * n_days) * 100,
+        "ear_total_mwmes": rng.integers(0, 5000, (n_reservoirs + 1) * n_days),
+    }).sample(frac=1, random_state=seed).reset_index(drop=True)
+    ear.loc[3, "nom_reservatorio"] = None
+    registry = pd.DataFrame({
+        "nom_reservatorio": names,
+        "id_reservatorio": [f"R{i:02d}" for i in range(n_reservoirs)],
+        "nom_bacia": ["Grande", "Paranaiba"] * (n_reservoirs // 2),
+        "tip_reservatorio": "Usina",
+        "val_volmax": rng.random(n_reservoirs) * 1e4,
+    })
+    hydro = pd.DataFrame({
+        "id_reservatorio": np.repeat(registry["id_reservatorio"], n_days).to_numpy(),
+        "nom_bacia": np.repeat(registry["nom_bacia"], n_days).to_numpy(),
+        "din_instante": np.tile(dates, n_reservoirs),
+        "val_volumeutilcon": rng.random(n_reservoirs * n_days) * 100,
+    })
+    # dias sem dado hidráulico
+    hydro = hydro.drop(index=rng.choice(len(hydro), 15, replace=False)).reset_index(drop=True)
+    return ear, hydro, registry
@@ -0,0 +1,91 @@
+import unittest
+
+import pandas as pd
+
+from app.pipeline.transformers.aggregator import FINAL_COLUMNS, aggregate_ear_hydro_registry
+from app.services.ons_dtypes import compact_frame, expand_frame
+from tests.unit.aggregator_fixtures import make_sources, reference_aggregate
+
+
+class TestAggregator(unittest.TestCase):
+
+    def assert_same_as_reference(self, ear, hydro, registry):
+        expected = reference_aggregate(ear, hydro, registry)
+        result = aggregate_ear_hydro_registry(ear, hydro, registry)
+        pd.testing.assert_frame_equal(result, expected)
+        return result
+
+    def test_matches_previous_merges(self):
+        # Arrange
+        ear, hydro, registry = make_sources()
+
+        # Act
+        result = self.assert_same_as_reference(ear, hydro, registry)
+
+        # Assert
+        self.assertEqual(list(result.columns), FINAL_COLUMNS)
+        self.assertTrue(result["val_volumeutilcon"].isna().any())
+        self.assertTrue(result["id_reservatorio"].isna().any())
+
+    def test_matches_previous_merges_with_overlapping_columns_and_duplicate_keys(self):
+        # Arrange
+        ear, hydro, registry = make_sources()
+        ear["nom_bacia"] = "Bacia do EAR"
+        ear["tip_reservatorio"] = "Tipo do EAR"
+        registry = pd.concat([registry, registry.iloc[[0]]], ignore_index=True)
+        hydro["nom_reservatorio"] = "nome do hidráulico"
+        hydro = pd.concat([hydro, hydro.iloc[[5]]], ignore_index=True)
+
+        # Act & Assert
+        self.assert_same_as_reference(ear, hydro, registry)
+
+    def test_matches_previous_merges_with_null_and_intraday_dates(self):
+        # Arrange
+        ear, hydro, registry = make_sources()
+        ear.loc[[4, 9], "ear_data"] = pd.NaT
+        hydro.loc[[2, 8], "din_instante"] = pd.NaT
+        intraday = hydro.copy()
+        intraday.loc[0, "din_instante"] += pd.Timedelta(hours=6)
+
+        # Act & Assert
+        self.assert_same_as_reference(ear, hydro, registry)
+        self.assert_same_as_reference(ear, intraday, registry)
+
+    def test_matches_previous_merges_with_text_dates(self):
+        # Arrange
+        ear, hydro, registry = make_sources()
+        ear["ear_data"] = ear["ear_data"].dt.strftime("%Y-%m-%d")
+        hydro["din_instante"] = hydro["din_instante"].dt.strftime("%Y-%m-%d")
+
+        # Act
+        result = self.assert_same_as_reference(ear, hydro, registry)
+
+        # Assert
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(result["ear_data"]))
+
+    def test_matches_previous_merges_with_compact_dtypes(self):
+        # Arrange
+        ear, hydro, registry = make_sources()
+        compact = [compact_frame(df)[0] for df in (ear, hydro, registry)]
+
+        # Act
+        result = aggregate_ear_hydro_registry(*compact)
+
+        # Assert
+        self.assertIsInstance(result["id_reservatorio"].dtype, pd.CategoricalDtype)
+        pd.testing.assert_frame_equal(expand_frame(result), reference_aggregate(ear, hydro, registry))
+
+    def test_keeps_first_join_when_hydro_keys_are_missing(self):
+        # Arrange
+        ear, hydro, registry = make_sources()
+        registry = registry.drop(columns=["id_reservatorio"])
+
+        # Act
+        result = self.assert_same_as_reference(ear, hydro, registry)
+
+        # Assert
+        self.assertNotIn("val_volumeutilcon", result.columns)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,297 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+from google.cloud.exceptions import NotFound
+
+import pandas as pd
+from google.cloud import bigquery
+
+from datetime import date
+
+from app.services.bigquery_service import (
+    MAX_PARTITIONS_PER_JOB,
+    BigQueryService,
+    _partitions,
+    build_merge_script,
+    reset_bigquery_clients,
+    schema_from_dataframe,
+)
+
+
+class TestBigQueryService(unittest.TestCase):
+
+    def setUp(self):
+        reset_bigquery_clients()
+
+    def tearDown(self):
+        reset_bigquery_clients()
+
+    @patch('google.cloud.bigquery.Client')
+    def test_submit_reuses_client_and_cached_metadata(self, mock_bigquery_client):
+        # Arrange
+        mock_client = mock_bigquery_client.return_value
+        mock_client.load_table_from_uri.return_value = MagicMock(job_id="job1", location="US", state="RUNNING")
+
+        # Act
+        first = BigQueryService().submit_pipeline_load("gs://bucket/a.parquet")
+        second = BigQueryService().submit_pipeline_load("gs://bucket/b.parquet")
+
+        # Assert
+        mock_bigquery_client.assert_called_once_with(project="graphite-byte-472516-n8")
+        mock_client.get_dataset.assert_called_once()
+        mock_client.get_table.assert_called_once()
+        self.assertEqual(mock_client.load_table_from_uri.call_count, 2)
+        self.assertEqual(first, {
+            "job_id": "job1", "location": "US", "table_id": "graphite-byte-472516-n8.SauterUniversity.processed_reservatorios",
+            "state": "RUNNING", "created_table": False
+        })
+        self.assertFalse(second["created_table"])
+        mock_client.get_job.assert_not_called()
+
+    @patch('google.cloud.bigquery.Client')
+    def test_missing_table_is_looked_up_again_after_load(self, mock_bigquery_client):
+        # Arrange
+        mock_client = mock_bigquery_client.return_value
+        mock_client.get_table.side_effect = [NotFound("missing"), MagicMock()]
+        mock_client.load_table_from_uri.return_value = MagicMock(job_id="job1", location="US", state="RUNNING")
+
+        # Act
+        first = BigQueryService().submit_pipeline_load("gs://bucket/a.parquet")
+        second = BigQueryService().submit_pipeline_load("gs://bucket/b.parquet")
+
+        # Assert
+        self.assertTrue(first["created_table"])
+        self.assertFalse(second["created_table"])
+        self.assertEqual(mock_client.get_table.call_count, 2)
+        job_config = mock_client.load_table_from_uri.call_args_list[0].kwargs["job_config"]
+        self.assertEqual(job_config.source_format, "PARQUET")
+
+    @patch('google.cloud.bigquery.Client')
+    def test_get_job_status_invalidates_table_when_done(self, mock_bigquery_client):
+        # Arrange
+        mock_client = mock_bigquery_client.return_value
+        mock_client.get_job.return_value = MagicMock(
+            job_id="job1", location="US", state="DONE", errors=None, output_rows=10, num_dml_affected_rows=None
+        )
+        service = BigQueryService()
+        service.get_table_cached()
+
+        # Act
+        status = service.get_job_status("job1", "US")
+        service.get_table_cached()
+
+        # Assert
+        mock_client.get_job.assert_called_once_with("job1", location="US")
+        self.assertEqual(status, {
+            "job_id": "job1", "location": "US", "state": "DONE", "errors": None, "output_rows": 10, "affected_rows": None
+        })
+        self.assertEqual(mock_client.get_table.call_count, 2)
+
+
+    @patch('google.cloud.bigquery.Client')
+    def test_merge_mode_runs_staged_merge_script(self, mock_bigquery_client):
+        # Arrange
+        mock_client = mock_bigquery_client.return_value
+        table = MagicMock(schema=[
+            bigquery.SchemaField(name, "INTEGER") for name in ["id_reservatorio", "dia", "mes", "ano", "val"]
+        ], labels={}, clustering_fields=["id_reservatorio"])
+        mock_client.get_table.return_value = table
+        mock_client.update_table.return_value = table
+        mock_client.query.return_value = MagicMock(job_id="job9", location="US", state="RUNNING")
+        sample_df = pd.DataFrame(columns=["id_reservatorio", "dia", "mes", "ano", "val", "nova_coluna"]).astype("int64")
+
+        # Act
+        result = BigQueryService().submit_pipeline_load("gs://bucket/a.parquet", sample_df, write_mode="merge")
+
+        # Assert
+        self.assertEqual(result["job_id"], "job9")
+        mock_client.load_table_from_uri.assert_not_called()
+        script = mock_client.query.call_args.args[0]
+        self.assertIn("LOAD DATA OVERWRITE `graphite-byte-472516-n8.SauterUniversity.processed_reservatorios_staging_", script)
+        self.assertIn("MERGE `graphite-byte-472516-n8.SauterUniversity.processed_reservatorios` T", script)
+        self.assertIn("WHEN MATCHED THEN UPDATE SET `val` = S.`val`", script)
+        self.assertIn("`nova_coluna` = S.`nova_coluna`", script)
+        self.assertEqual(mock_client.update_table.call_args.args[1], ["schema", "labels"])
+        self.assertTrue(script.rstrip().startswith("LOAD DATA") and "DROP TABLE" in script)
+
+    @patch('google.cloud.bigquery.Client')
+    def test_merge_mode_without_table_creates_it_with_plain_load(self, mock_bigquery_client):
+        # Arrange
+        mock_client = mock_bigquery_client.return_value
+        mock_client.get_table.side_effect = NotFound("missing")
+        mock_client.load_table_from_uri.return_value = MagicMock(job_id="job1", location="US", state="RUNNING")
+
+        # Act
+        result = BigQueryService().submit_pipeline_load("gs://bucket/a.parquet", write_mode="merge")
+
+        # Assert
+        self.assertTrue(result["created_table"])
+        mock_client.query.assert_not_called()
+
+    @patch('google.cloud.bigquery.Client')
+    def test_multi_year_frame_uses_monthly_partitions(self, mock_bigquery_client):
+        # Arrange
+        mock_client = mock_bigquery_client.return_value
+        mock_client.get_table.side_effect = NotFound("missing")
+        mock_client.create_table.side_effect = lambda table, exists_ok: table
+        mock_client.load_table_from_uri.return_value = MagicMock(job_id="job1", location="US", state="RUNNING")
+        days = pd.date_range("2000-01-01", "2024-12-31", freq="D")
+        sample_df = pd.DataFrame({"id_reservatorio": 1, "val": 0.5, "partition_date": days.date})
+
+        # Act
+        BigQueryService().submit_pipeline_load("gs://bucket/a.parquet", sample_df, write_mode="partition")
+
+        # Assert
+        table = mock_client.create_table.call_args.args[0]
+        self.assertEqual(table.time_partitioning.type_, "MONTH")
+        self.assertEqual(table.time_partitioning.field, "partition_date")
+        self.assertEqual(len(_partitions(sample_df)), 25 * 12)
+        self.assertLess(len(_partitions(sample_df)), MAX_PARTITIONS_PER_JOB)
+        self.assertEqual(mock_client.load_table_from_uri.call_args.args[1],
+                         "graphite-byte-472516-n8.SauterUniversity.processed_reservatorios")
+
+    @patch('google.cloud.bigquery.Client')
+    def test_day_partitioned_table_is_refused(self, mock_bigquery_client):
+        # Arrange
+        mock_client = mock_bigquery_client.return_value
+        mock_client.get_table.return_value = MagicMock(
+            schema=[bigquery.SchemaField("partition_date", "DATE")], labels={}, clustering_fields=None,
+            time_partitioning=bigquery.TimePartitioning(type_="DAY", field="partition_date")
+        )
+        sample_df = pd.DataFrame({"partition_date": [date(2024, 5, 2)]})
+
+        # Act & Assert
+        for write_mode in ("append", "merge", "partition"):
+            with self.subTest(write_mode=write_mode), self.assertRaises(ValueError):
+                BigQueryService().submit_pipeline_load("gs://bucket/a.parquet", sample_df, write_mode=write_mode)
+        mock_client.load_table_from_uri.assert_not_called()
+        mock_client.query.assert_not_called()
+
+    @patch('google.cloud.bigquery.Client')
+    def test_partition_mode_replaces_every_partition_of_the_file(self, mock_bigquery_client):
+        # Arrange
+        mock_client = mock_bigquery_client.return_value
+        table = MagicMock(schema=[
+            bigquery.SchemaField(name, "INTEGER") for name in ["id_reservatorio", "val"]
+        ] + [bigquery.SchemaField("partition_date", "DATE")], labels={}, clustering_fields=["id_reservatorio"])
+        mock_client.get_table.return_value = table
+        mock_client.update_table.return_value = table
+        mock_client.query.return_value = MagicMock(job_id="job3", location="US", state="RUNNING")
+        sample_df = pd.DataFrame({
+            "id_reservatorio": [1, 1], "val": [1, 2], "partition_date": [date(2024, 5, 1), date(2024, 5, 2)]
+        })
+
+        # Act
+        result = BigQueryService().submit_pipeline_load("gs://bucket/a.parquet", sample_df, write_mode="partition")
+
+        # Assert
+        self.assertEqual(result["job_id"], "job3")
+        mock_client.load_table_from_uri.assert_not_called()
+        script = mock_client.query.call_args.args[0]
+        self.assertIn("SET days = (SELECT ARRAY_AGG(DISTINCT `partition_date`)", script)
+        self.assertIn(
+            "DELETE FROM `graphite-byte-472516-n8.SauterUniversity.processed_reservatorios` "
+            "WHERE `partition_date` IN UNNEST(days);", script
+        )
+        self.assertIn("INSERT INTO `graphite-byte-472516-n8.SauterUniversity.processed_reservatorios` "
+                      "(`id_reservatorio`, `val`, `partition_date`)", script)
+        self.assertLess(script.index("BEGIN TRANSACTION"), script.index("DELETE FROM"))
+        self.assertLess(script.index("INSERT INTO"), script.index("COMMIT TRANSACTION"))
+
+    def test_build_merge_script_requires_key_columns(self):
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            build_merge_script("p.d.t", "p.d.t_staging", "gs://b/x.parquet", ["id_reservatorio", "val"])
+
+    def test_schema_from_dataframe_maps_dtypes(self):
+        # Arrange
+        df = pd.DataFrame({
+            "id_reservatorio": pd.Series([1, 2], dtype="int64"),
+            "val": [0.5, 1.0],
+            "nome": pd.Categorical(["a", "b"]),
+            "ativo": [True, False],
+            "ear_data": pd.to_datetime(["2024-01-01", "2024-01-02"]),
+            "partition_date": [date(2024, 1, 1), date(2024, 1, 1)],
+        })
+
+        # Act
+        schema = schema_from_dataframe(df)
+
+        # Assert
+        self.assertEqual(
+            [(field.name, field.field_type, field.mode) for field in schema],
+            [("id_reservatorio", "INTEGER", "NULLABLE"), ("val", "FLOAT", "NULLABLE"), ("nome", "STRING", "NULLABLE"),
+             ("ativo", "BOOLEAN", "NULLABLE"), ("ear_data", "DATETIME", "NULLABLE"), ("partition_date", "DATE", "NULLABLE")]
+        )
+
+    @patch('google.cloud.bigquery.Client')
+    def test_missing_table_is_created_with_explicit_schema(self, mock_bigquery_client):
+        # Arrange
+        mock_client = mock_bigquery_client.return_value
+        mock_client.get_table.side_effect = NotFound("missing")
+        mock_client.create_table.side_effect = lambda table, exists_ok: table
+        mock_client.load_table_from_uri.return_value = MagicMock(job_id="job1", location="US", state="RUNNING")
+        sample_df = pd.DataFrame({"id_reservatorio": [1], "val": [0.5], "partition_date": [date(2024, 5, 2)]})
+
+        # Act
+        result = BigQueryService().submit_pipeline_load("gs://bucket/a.parquet", sample_df, write_mode="merge")
+
+        # Assert
+        self.assertTrue(result["created_table"])
+        table = mock_client.create_table.call_args.args[0]
+        self.assertEqual([field.field_type for field in table.schema], ["INTEGER", "FLOAT", "DATE"])
+        self.assertEqual(table.time_partitioning.field, "partition_date")
+        self.assertEqual(table.clustering_fields, ["id_reservatorio"])
+        self.assertEqual(table.labels, {"schema_version": "1"})
+        job_config = mock_client.load_table_from_uri.call_args.kwargs["job_config"]
+        self.assertEqual(len(job_config.schema), 3)
+        self.assertIsNone(job_config.autodetect)
+        mock_client.query.assert_not_called()
+
+    @patch('google.cloud.bigquery.Client')
+    def test_new_columns_are_added_and_schema_version_bumped(self, mock_bigquery_client):
+        # Arrange
+        mock_client = mock_bigquery_client.return_value
+        table = MagicMock(
+            schema=[bigquery.SchemaField("id_reservatorio", "INTEGER")],
+            labels={"schema_version": "2"}, clustering_fields=None
+        )
+        mock_client.get_table.return_value = table
+        mock_client.update_table.side_effect = lambda table, fields: table
+        sample_df = pd.DataFrame({"id_reservatorio": [1], "val_lag1": [0.5]})
+
+        # Act
+        _, created = BigQueryService().ensure_table_schema(sample_df)
+
+        # Assert
+        self.assertFalse(created)
+        updated, fields = mock_client.update_table.call_args.args
+        self.assertEqual(sorted(fields), ["clustering_fields", "labels", "schema"])
+        self.assertEqual([field.name for field in updated.schema], ["id_reservatorio", "val_lag1"])
+        self.assertEqual(updated.labels, {"schema_version": "3"})
+        self.assertEqual(updated.clustering_fields, ["id_reservatorio"])
+
+
+    @patch('google.cloud.bigquery.Client')
+    def test_column_type_different_from_table_is_refused_before_load(self, mock_bigquery_client):
+        # Arrange
+        mock_client = mock_bigquery_client.return_value
+        mock_client.get_table.return_value = MagicMock(
+            schema=[bigquery.SchemaField("id_reservatorio", "INT64"), bigquery.SchemaField("val", "INTEGER")],
+            labels={}, clustering_fields=["id_reservatorio"]
+        )
+        sample_df = pd.DataFrame({"id_reservatorio": [1], "val": [0.5]})
+
+        # Act
+        with self.assertRaises(ValueError) as error:
+            BigQueryService().submit_pipeline_load("gs://bucket/a.parquet", sample_df, write_mode="append")
+
+        # Assert
+        self.assertIn("val (INTEGER na tabela, FLOAT nos dados)", str(error.exception))
+        self.assertNotIn("id_reservatorio", str(error.exception))
+        mock_client.update_table.assert_not_called()
+        mock_client.load_table_from_uri.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
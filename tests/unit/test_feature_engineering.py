@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.pipeline.transformers.feature_engineering import (
+    create_diffs,
+    create_features,
+    create_lags,
+    create_rolling_mean,
+    diff,
+    ewm_mean,
+    lag,
+    rolling_mean,
+)
+
+
+class TestFeatureEngineering(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 500
+        self.df = pd.DataFrame({
+            'id_reservatorio': rng.choice(['FUR', 'TMA', 'SOB', None], n),
+            'val': rng.random(n) * 100,
+        })
+        self.df.loc[rng.choice(n, 40), 'val'] = np.nan
+
+    def test_create_features_matches_per_feature_functions(self):
+        # Arrange
+        specs = [lag('val', 1), lag('val', 7), diff('val', 1), diff('val', 7), rolling_mean('val', 7)]
+        expected = create_lags(self.df, 'val', lag=1, groupby='id_reservatorio')
+        expected = create_lags(expected, 'val', lag=7, groupby='id_reservatorio')
+        expected = create_diffs(expected, 'val', periods=1, groupby='id_reservatorio')
+        expected = create_diffs(expected, 'val', periods=7, groupby='id_reservatorio')
+        expected = create_rolling_mean(expected, 'val', window=7, groupby='id_reservatorio')
+
+        # Act
+        result = create_features(self.df, specs, groupby='id_reservatorio')
+
+        # Assert
+        pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-9)
+
+    def test_create_features_ewm_and_order_by(self):
+        # Arrange
+        df = self.df.assign(t=np.random.default_rng(1).permutation(len(self.df)))
+        ordered = df.sort_values('t')
+        expected = ordered.groupby('id_reservatorio')['val'].transform(lambda x: x.ewm(span=5).mean())
+
+        # Act
+        result = create_features(df, [ewm_mean('val', 5)], groupby='id_reservatorio', order_by='t')
+
+        # Assert
+        pd.testing.assert_series_equal(
+            result['val_ewm5'], expected.sort_index(), check_names=False, check_exact=False, rtol=1e-9
+        )
+
+    def test_create_features_without_groupby(self):
+        # Act
+        result = create_features(self.df, [lag('val', 2), lag('val', -1)])
+
+        # Assert
+        pd.testing.assert_series_equal(result['val_lag2'], self.df['val'].shift(2), check_names=False)
+        pd.testing.assert_series_equal(result['val_lag-1'], self.df['val'].shift(-1), check_names=False)
+        self.assertNotIn('val_lag2', self.df.columns)
+
+
+if __name__ == '__main__':
+    unittest.main()
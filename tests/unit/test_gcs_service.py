@@ -1,9 +1,23 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
-from app.services.gcs_service import upload_to_gcs
+
+from google.cloud.storage.retry import DEFAULT_RETRY
+
+from app.services.gcs_service import upload_to_gcs, upload_bytes_to_gcs, reset_storage_clients, get_storage_client
 
 class TestGcsService(unittest.TestCase):
 
+    def setUp(self):
+        reset_storage_clients()
+        with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as f:
+            f.write(b"conteudo")
+            self.source_file_path = f.name
+
+    def tearDown(self):
+        os.remove(self.source_file_path)
+
     @patch('google.cloud.storage.Client')
     def test_upload_to_gcs_with_credentials(self, mock_storage_client):
         # Arrange
@@ -17,7 +31,7 @@ class TestGcsService(unittest.TestCase):
         mock_bucket.blob.return_value = mock_blob
 
         bucket_name = "test-bucket"
-        source_file_path = "/tmp/test-file.txt"
+        source_file_path = self.source_file_path
         destination_blob_name = "test-blob"
         credentials_path = "/path/to/creds.json"
 
@@ -27,8 +41,8 @@ class TestGcsService(unittest.TestCase):
         # Assert
         mock_storage_client.from_service_account_json.assert_called_once_with(credentials_path)
         mock_client_instance.bucket.assert_called_once_with(bucket_name)
-        mock_bucket.blob.assert_called_once_with(destination_blob_name)
-        mock_blob.upload_from_filename.assert_called_once_with(source_file_path)
+        mock_bucket.blob.assert_called_once_with(destination_blob_name, chunk_size=8 * 1024 * 1024)
+        mock_blob.upload_from_filename.assert_called_once_with(source_file_path, content_type=None, retry=DEFAULT_RETRY)
         self.assertEqual(result, f"File {source_file_path} uploaded to {bucket_name}/{destination_blob_name}.")
 
     @patch('google.cloud.storage.Client')
@@ -44,7 +58,7 @@ class TestGcsService(unittest.TestCase):
         mock_bucket.blob.return_value = mock_blob
 
         bucket_name = "test-bucket"
-        source_file_path = "/tmp/test-file.txt"
+        source_file_path = self.source_file_path
         destination_blob_name = "test-blob"
 
         # Act
@@ -53,9 +67,38 @@ class TestGcsService(unittest.TestCase):
         # Assert
         mock_storage_client.assert_called_once()
         mock_client_instance.bucket.assert_called_once_with(bucket_name)
-        mock_bucket.blob.assert_called_once_with(destination_blob_name)
-        mock_blob.upload_from_filename.assert_called_once_with(source_file_path)
+        mock_bucket.blob.assert_called_once_with(destination_blob_name, chunk_size=8 * 1024 * 1024)
+        mock_blob.upload_from_filename.assert_called_once_with(source_file_path, content_type=None, retry=DEFAULT_RETRY)
         self.assertEqual(result, f"File {source_file_path} uploaded to {bucket_name}/{destination_blob_name}.")
 
+    @patch('google.cloud.storage.Client')
+    def test_upload_bytes_to_gcs(self, mock_storage_client):
+        # Arrange
+        mock_blob = MagicMock()
+        mock_storage_client.return_value.bucket.return_value.blob.return_value = mock_blob
+
+        # Act
+        result = upload_bytes_to_gcs("test-bucket", b"PAR1data", "test-blob.parquet")
+
+        # Assert
+        mock_storage_client.return_value.bucket.assert_called_once_with("test-bucket")
+        mock_blob.upload_from_string.assert_called_once_with(
+            b"PAR1data", content_type="application/octet-stream", retry=DEFAULT_RETRY
+        )
+        self.assertEqual(result, "8 bytes uploaded to test-bucket/test-blob.parquet.")
+
+    @patch('google.cloud.storage.Client')
+    def test_storage_client_is_shared_per_credentials(self, mock_storage_client):
+        # Act
+        first = get_storage_client()
+        second = get_storage_client()
+        with_credentials = get_storage_client("/path/to/creds.json")
+
+        # Assert
+        self.assertIs(first, second)
+        mock_storage_client.assert_called_once_with()
+        mock_storage_client.from_service_account_json.assert_called_once_with("/path/to/creds.json")
+        self.assertIs(with_credentials, mock_storage_client.from_service_account_json.return_value)
+
 if __name__ == '__main__':
     unittest.main()
@@ -30,7 +30,7 @@ class TestHydroController(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), {"data": "mocked_data"})
         mock_get_reservoir_data.assert_called_once_with(
-            "test_package_id", 2023, 10, "test_reservoir", "2023-10-01", "2023-10-31", 1, 10
+            "test_package_id", 2023, 10, "test_reservoir", "2023-10-01", "2023-10-31", 1, 10, cursor=None
         )
 
 if __name__ == '__main__':
@@ -0,0 +1,157 @@
+import threading
+import time
+import unittest
+
+from app.services.job_runner import JobConflict, JobRunner
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condição não atingida")
+        time.sleep(0.005)
+
+
+class TestJobRunner(unittest.TestCase):
+
+    def test_same_params_while_running_returns_existing_job(self):
+        # Arrange
+        runner = JobRunner(max_workers=2)
+        release = threading.Event()
+        calls = []
+
+        def work(job):
+            calls.append(job.id)
+            release.wait(5)
+            return 200, {"ok": True}
+
+        # Act
+        first, first_created = runner.submit({"start_date": "2023-01-01"}, work)
+        second, second_created = runner.submit({"start_date": "2023-01-01"}, work)
+        other, other_created = runner.submit({"start_date": "2023-02-01"}, work)
+        release.set()
+        wait_for(lambda: first.done and other.done)
+        again, again_created = runner.submit({"start_date": "2023-01-01"}, work)
+        wait_for(lambda: again.done)
+
+        # Assert
+        self.assertTrue(first_created)
+        self.assertIs(second, first)
+        self.assertFalse(second_created)
+        self.assertTrue(other_created)
+        self.assertTrue(again_created)
+        self.assertIsNot(again, first)
+        self.assertEqual(len(calls), 3)
+
+    def test_jobs_beyond_max_workers_wait_in_queue(self):
+        # Arrange
+        runner = JobRunner(max_workers=1)
+        release = threading.Event()
+
+        def work(job):
+            release.wait(5)
+            return 200, {}
+
+        # Act
+        first, _ = runner.submit({"n": 1}, work)
+        second, _ = runner.submit({"n": 2}, work)
+        wait_for(lambda: first.state == "running")
+        queued_state = second.state
+        release.set()
+        wait_for(lambda: second.done)
+
+        # Assert
+        self.assertEqual(queued_state, "queued")
+        self.assertEqual(first.state, "succeeded")
+        self.assertEqual(second.state, "succeeded")
+
+    def test_exclusive_key_refuses_second_job_until_first_finishes(self):
+        # Arrange
+        runner = JobRunner(max_workers=2)
+        release = threading.Event()
+
+        def work(job):
+            release.wait(5)
+            return 200, {}
+
+        # Act
+        first, _ = runner.submit({"end_date": "2023-01-31"}, work, exclusive="incremental:ear")
+        with self.assertRaises(JobConflict) as conflict:
+            runner.submit({"end_date": "2023-02-28"}, work, exclusive="incremental:ear")
+        other, other_created = runner.submit({"end_date": "2023-02-28"}, work, exclusive="incremental:outro")
+        release.set()
+        wait_for(lambda: first.done and other.done)
+        again, again_created = runner.submit({"end_date": "2023-02-28"}, work, exclusive="incremental:ear")
+        wait_for(lambda: again.done)
+
+        # Assert
+        self.assertIs(conflict.exception.job, first)
+        self.assertTrue(other_created)
+        self.assertTrue(again_created)
+        self.assertEqual(again.state, "succeeded")
+
+    def test_stages_record_rows_and_timing(self):
+        # Arrange
+        runner = JobRunner(max_workers=1)
+
+        def work(job):
+            with job.stage("extract") as info:
+                info["rows"] = 42
+            return 200, {"rows": 42}
+
+        # Act
+        job, _ = runner.submit({}, work)
+        wait_for(lambda: job.done)
+        body = runner.get(job.id).to_dict()
+
+        # Assert
+        self.assertEqual(body["state"], "succeeded")
+        self.assertEqual(body["result"], {"rows": 42})
+        self.assertEqual(body["stages"]["extract"]["state"], "done")
+        self.assertEqual(body["stages"]["extract"]["rows"], 42)
+        self.assertIsNotNone(body["stages"]["extract"]["seconds"])
+        self.assertIsNotNone(body["finished_at"])
+
+    def test_error_status_and_exception_mark_job_failed(self):
+        # Arrange
+        runner = JobRunner(max_workers=2)
+
+        def conflict(job):
+            return 409, {"detail": "em andamento"}
+
+        def broken(job):
+            with job.stage("upload"):
+                raise RuntimeError("bucket indisponível")
+
+        # Act
+        refused, _ = runner.submit({"n": 1}, conflict)
+        crashed, _ = runner.submit({"n": 2}, broken)
+        wait_for(lambda: refused.done and crashed.done)
+
+        # Assert
+        self.assertEqual((refused.state, refused.status_code), ("failed", 409))
+        self.assertEqual((crashed.state, crashed.status_code), ("failed", 500))
+        self.assertEqual(crashed.error, "bucket indisponível")
+        self.assertEqual(crashed.stages["upload"]["state"], "failed")
+
+    def test_only_recent_finished_jobs_are_kept(self):
+        # Arrange
+        runner = JobRunner(max_workers=1, max_finished=2)
+        jobs = []
+
+        # Act
+        for n in range(4):
+            job, _ = runner.submit({"n": n}, lambda job: (200, {}))
+            wait_for(lambda: job.done)
+            jobs.append(job)
+        runner.submit({"n": 4}, lambda job: (200, {}))
+
+        # Assert
+        self.assertIsNone(runner.get(jobs[0].id))
+        self.assertIsNone(runner.get(jobs[1].id))
+        self.assertIs(runner.get(jobs[3].id), jobs[3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.services.metadata_cache import MetadataCache, PackageMetadata, ParquetIndex
+
+
+def linear_find_parquet_url(metadata, ano=None):
+    """Busca linear de antes do índice, usada como referência."""
+    candidates = [
+        r for r in metadata.get("resources", []) or []
+        if (r.get("format") or "").upper() == "PARQUET" or (r.get("url") or "").lower().endswith(".parquet")
+    ]
+    if not candidates:
+        return None
+    if ano is None:
+        return candidates[0]["url"]
+    for r in candidates:
+        if str(ano) in (r.get("name") or "") or str(ano) in (r.get("url") or ""):
+            return r["url"]
+    return candidates[0]["url"]
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.now = 1000.0
+        clock = patch('app.services.metadata_cache.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def make_cache(self, loader, ttl=60, stale=600):
+        return MetadataCache(loader, self.tmp.name, ttl, stale)
+
+    def test_parquet_index_matches_linear_search(self):
+        # Arrange
+        metadata = {"resources": [
+            {"name": "ear-2000.csv", "format": "CSV", "url": "http://x/ear-2000.csv"},
+            {"name": "EAR 2001", "format": "PARQUET", "url": "http://x/ear_2001.parquet"},
+            {"name": "EAR diário", "format": "", "url": "http://x/ear_20020101.PARQUET"},
+            {"name": "EAR 2001 (revisado)", "format": "parquet", "url": "http://x/ear_2001_v2.parquet"},
+            {"name": "sem ano", "format": "PARQUET", "url": "http://x/ear.parquet"},
+        ]}
+
+        # Act
+        index = PackageMetadata(metadata).parquet_index
+
+        # Assert
+        for ano in [None, 1999, 2000, 2001, 2002, 2010, 2301]:
+            self.assertEqual(index.url(ano), linear_find_parquet_url(metadata, ano), ano)
+        self.assertIsNone(ParquetIndex.build({"resources": []}).url(2020))
+
+    def test_fresh_entry_is_served_without_loading_again(self):
+        # Arrange
+        loader = MagicMock(return_value={"id": "pkg", "resources": []})
+        cache = self.make_cache(loader)
+
+        # Act
+        first = cache.get("pkg")
+        self.now += 59
+        second = cache.get("pkg")
+
+        # Assert
+        loader.assert_called_once_with("pkg")
+        self.assertIs(first, second)
+
+    def test_stale_entry_is_served_while_refreshing_in_background(self):
+        # Arrange
+        release = threading.Event()
+        versions = iter([{"v": 1}, {"v": 2}])
+
+        def loader(package_id):
+            value = next(versions)
+            if value["v"] == 2:
+                release.wait(5)
+            return value
+
+        cache = self.make_cache(loader)
+        cache.get("pkg")
+        self.now += 120
+
+        # Act
+        stale = [cache.get("pkg"), cache.get("pkg")]
+        release.set()
+        cache._executor.shutdown(wait=True)
+
+        # Assert
+        self.assertEqual(stale, [{"v": 1}, {"v": 1}])
+        self.assertEqual(cache.get("pkg"), {"v": 2})
+
+    def test_expired_entry_is_loaded_again_and_kept_on_failure(self):
+        # Arrange
+        loader = MagicMock(side_effect=[{"v": 1}, {"v": 2}, ConnectionError("fora do ar")])
+        cache = self.make_cache(loader)
+        cache.get("pkg")
+
+        # Act
+        self.now += 1000
+        reloaded = cache.get("pkg")
+        self.now += 1000
+        fallback = cache.get("pkg")
+
+        # Assert
+        self.assertEqual(reloaded, {"v": 2})
+        self.assertEqual(fallback, {"v": 2})
+        self.assertEqual(loader.call_count, 3)
+
+    def test_workers_share_entries_through_disk(self):
+        # Arrange
+        first_worker = self.make_cache(MagicMock(return_value={"id": "pkg", "resources": []}))
+        second_loader = MagicMock()
+        second_worker = self.make_cache(second_loader)
+        first_worker.get("pkg")
+
+        # Act
+        metadata = second_worker.get("pkg")
+
+        # Assert
+        second_loader.assert_not_called()
+        self.assertEqual(metadata, {"id": "pkg", "resources": []})
+        self.assertIsInstance(metadata, PackageMetadata)
+
+
+if __name__ == '__main__':
+    unittest.main()
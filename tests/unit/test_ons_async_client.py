@@ -0,0 +1,115 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+
+import httpx
+
+from app.services import ons_async_client
+from app.services.parquet_cache import DOWNLOAD_CHUNK_SIZE, ParquetCache
+
+
+class TestOnsAsyncClient(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ParquetCache(self.tmpdir.name, max_bytes=1024 * 1024)
+        self.requests = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_client(self, handler):
+        def recording_handler(request):
+            self.requests.append(request)
+            return handler(request)
+        return httpx.AsyncClient(transport=httpx.MockTransport(recording_handler))
+
+    def test_fetch_package_metadata(self):
+        # Arrange
+        client = self.make_client(lambda request: httpx.Response(200, json={"success": True, "result": {"id": "123"}}))
+
+        # Act
+        result = asyncio.run(ons_async_client.fetch_package_metadata(client, "test_id"))
+
+        # Assert
+        self.assertEqual(result, {"id": "123"})
+        self.assertTrue(str(self.requests[0].url).endswith("package_show?id=test_id"))
+
+    def test_fetch_package_metadata_api_error(self):
+        # Arrange
+        client = self.make_client(lambda request: httpx.Response(200, json={"success": False}))
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            asyncio.run(ons_async_client.fetch_package_metadata(client, "test_id"))
+
+    def test_download_to_cache_then_revalidate(self):
+        # Arrange
+        def handler(request):
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, content=b"PAR1data", headers={"ETag": '"v1"'})
+
+        async def download_twice():
+            async with self.make_client(handler) as client:
+                first = await ons_async_client.download_to_cache(client, "http://fake.url/2023.parquet", self.cache)
+                second = await ons_async_client.download_to_cache(client, "http://fake.url/2023.parquet", self.cache)
+                return first, second
+
+        # Act
+        first, second = asyncio.run(download_twice())
+
+        # Assert
+        self.assertEqual(first, second)
+        with open(first, "rb") as f:
+            self.assertEqual(f.read(), b"PAR1data")
+        self.assertEqual(self.requests[1].headers["If-None-Match"], '"v1"')
+
+    def test_download_to_cache_keeps_disk_io_off_the_event_loop(self):
+        # Arrange
+        loop_threads, io_threads = set(), []
+        cache = self.cache
+        open_temp, lookup = cache.open_temp, cache.lookup
+
+        class RecordingFile:
+            def __init__(self, f):
+                self.f = f
+
+            def write(self, data):
+                io_threads.append(threading.get_ident())
+                return self.f.write(data)
+
+            def close(self):
+                io_threads.append(threading.get_ident())
+                self.f.close()
+
+        def recording_open_temp():
+            io_threads.append(threading.get_ident())
+            f, path = open_temp()
+            return RecordingFile(f), path
+
+        def recording_lookup(url):
+            io_threads.append(threading.get_ident())
+            return lookup(url)
+
+        cache.open_temp, cache.lookup = recording_open_temp, recording_lookup
+        content = b"PAR1" + bytes(3 * DOWNLOAD_CHUNK_SIZE)
+
+        async def download():
+            loop_threads.add(threading.get_ident())
+            async with self.make_client(lambda request: httpx.Response(200, content=content)) as client:
+                return await ons_async_client.download_to_cache(client, "http://fake.url/2023.parquet", cache)
+
+        # Act
+        path = asyncio.run(download())
+
+        # Assert
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), content)
+        self.assertGreaterEqual(len(io_threads), 4)
+        self.assertFalse(loop_threads & set(io_threads))
+
+
+if __name__ == '__main__':
+    unittest.main()
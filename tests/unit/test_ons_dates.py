@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from app.pipeline.transformers.aggregator import aggregate_ear_hydro_registry
+from app.pipeline.transformers.data_cleaner import normalize_and_clean
+from app.services import ons_dates
+from app.services.ons_dates import clear_date_formats, parse_dates
+
+
+class TestOnsDates(unittest.TestCase):
+
+    def setUp(self):
+        clear_date_formats()
+
+    def test_parse_dates_detects_day_first_and_iso_formats(self):
+        # Arrange
+        values = pd.Series(["01/02/2023", "15/02/2023", None, "01/02/2023", "2023-03-01", "lixo"], name="ear_data")
+
+        # Act
+        parsed = parse_dates(values, "pkg")
+
+        # Assert
+        self.assertEqual(parsed.tolist(), [
+            pd.Timestamp("2023-02-01"), pd.Timestamp("2023-02-15"), pd.NaT,
+            pd.Timestamp("2023-02-01"), pd.Timestamp("2023-03-01"), pd.NaT
+        ])
+        self.assertEqual(parsed.name, "ear_data")
+
+    def test_parse_dates_keeps_typed_columns_and_parses_categories(self):
+        # Arrange
+        typed = pd.Series(pd.to_datetime(["2023-01-05"]))
+        categorical = pd.Series(pd.Categorical(["2023-01-05", None, "2023-01-06"]), index=[7, 8, 9])
+
+        # Act
+        parsed = parse_dates(categorical)
+
+        # Assert
+        self.assertIs(parse_dates(typed), typed)
+        self.assertEqual(parsed.index.tolist(), [7, 8, 9])
+        self.assertEqual(parsed.tolist(), [pd.Timestamp("2023-01-05"), pd.NaT, pd.Timestamp("2023-01-06")])
+
+    def test_format_is_detected_once_per_resource(self):
+        # Arrange
+        chunks = [pd.Series(["01/01/2023", "02/01/2023"], name="ear_data"), pd.Series(["03/01/2023"], name="ear_data")]
+
+        # Act
+        with patch.object(ons_dates, "detect_date_format", wraps=ons_dates.detect_date_format) as mock_detect:
+            parsed = [parse_dates(chunk, "pkg") for chunk in chunks]
+
+        # Assert
+        mock_detect.assert_called_once()
+        self.assertEqual(parsed[1].iloc[0], pd.Timestamp("2023-01-03"))
+
+    def test_pipeline_does_not_parse_typed_dates_again(self):
+        # Arrange
+        ear = pd.DataFrame({
+            "nom_reservatorio": ["Furnas"] * 2,
+            "ear_data": pd.to_datetime(["2023-01-01", "2023-01-02"]),
+        })
+        hydro = pd.DataFrame({
+            "id_reservatorio": ["FUR"] * 2,
+            "nom_bacia": ["Grande"] * 2,
+            "din_instante": pd.to_datetime(["2023-01-01", "2023-01-02"]),
+            "val_volumeutilcon": [1.0, 2.0],
+        })
+        registry = pd.DataFrame({"nom_reservatorio": ["Furnas"], "id_reservatorio": ["FUR"], "nom_bacia": ["Grande"]})
+
+        # Act
+        with patch.object(ons_dates, "_parse_uniques") as mock_parse:
+            df = normalize_and_clean(aggregate_ear_hydro_registry(ear, hydro, registry))
+
+        # Assert
+        mock_parse.assert_not_called()
+        self.assertEqual(df["dia"].tolist(), [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
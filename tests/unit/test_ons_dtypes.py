@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.services.ons_dtypes import compact_frame, concat_frames, expand_frame, restore_float64
+from app.services.ons_service import records_from_dataframe
+
+
+def make_frame(n: int = 2000) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({
+        "nom_reservatorio": rng.choice(["Furnas", "Sobradinho", "Tucurui"], n),
+        "nom_bacia": rng.choice(["Grande", "Sao Francisco", None], n),
+        "ear_data": pd.date_range("2000-01-01", periods=n, freq="D"),
+        "val_volumeutilcon": np.round(rng.random(n) * 100, 2),
+        "ear_total_mwmes": rng.random(n) * 1e5,
+        "ano": rng.integers(2000, 2025, n),
+        "mes": rng.integers(1, 13, n),
+        "texto": [f"linha {i}" for i in range(n)],
+    })
+
+
+class TestOnsDtypes(unittest.TestCase):
+
+    def test_compact_frame_applies_plan_without_changing_values(self):
+        # Arrange
+        df = make_frame()
+        df.loc[5, "val_volumeutilcon"] = np.nan
+
+        # Act
+        compact, before, after = compact_frame(df)
+
+        # Assert
+        self.assertIsInstance(compact["nom_reservatorio"].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(compact["nom_bacia"].dtype, pd.CategoricalDtype)
+        self.assertEqual(compact["val_volumeutilcon"].dtype, np.float32)
+        self.assertEqual(compact["ear_total_mwmes"].dtype, np.float64)
+        self.assertEqual(compact["ano"].dtype, np.int16)
+        self.assertEqual(compact["mes"].dtype, np.int8)
+        self.assertLess(after, before)
+        pd.testing.assert_frame_equal(expand_frame(compact), df)
+
+    def test_records_of_compact_frame_match_original(self):
+        # Arrange
+        df = make_frame(200)
+        compact, _, _ = compact_frame(df)
+
+        # Act
+        records = records_from_dataframe(compact)
+
+        # Assert
+        self.assertEqual(compact["val_volumeutilcon"].dtype, np.float32)
+        self.assertEqual(records, records_from_dataframe(df))
+
+    def test_restore_float64_returns_shortest_decimal(self):
+        # Arrange
+        values = np.array([12.34, 0.1, -3.5, 1e-5, 250.0, np.nan], dtype=np.float64)
+
+        # Act
+        restored = restore_float64(values.astype(np.float32))
+
+        # Assert
+        np.testing.assert_array_equal(restored, values)
+
+    def test_concat_frames_unifies_categories_and_mixed_floats(self):
+        # Arrange
+        first, _, _ = compact_frame(pd.DataFrame({"nom_reservatorio": ["A", "B"], "val": [1.25, 2.5]}))
+        second, _, _ = compact_frame(pd.DataFrame({"nom_reservatorio": ["C", "A"], "val": [np.pi, 1.0]}))
+
+        # Act
+        result = concat_frames([first, second])
+
+        # Assert
+        self.assertIsInstance(result["nom_reservatorio"].dtype, pd.CategoricalDtype)
+        self.assertEqual(result["nom_reservatorio"].tolist(), ["A", "B", "C", "A"])
+        self.assertEqual(result["val"].dtype, np.float64)
+        self.assertEqual(result["val"].tolist(), [1.25, 2.5, np.pi, 1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from app.config import PIPELINE_CHUNK_ROWS
+from app.pipeline.extractors.ons_extractor import (
+    PIPELINE_COLUMNS,
+    extract_ear_df,
+    extract_registry_df,
+)
+
+
+class TestOnsExtractor(unittest.TestCase):
+
+    @patch('app.pipeline.extractors.ons_extractor.iter_reservoir_chunks')
+    def test_extract_ear_df_returns_typed_frame(self, mock_chunks):
+        # Arrange
+        mock_chunks.return_value = iter([
+            pd.DataFrame({
+                'nom_reservatorio': [' Furnas '],
+                'ear_data': pd.to_datetime(['2023-01-01 06:00']),
+                'ear_reservatorio_percentual': [45.5],
+            }),
+            pd.DataFrame({
+                'nom_reservatorio': [''],
+                'ear_data': pd.to_datetime(['2023-01-02 00:00']),
+                'ear_reservatorio_percentual': [50.0],
+            }),
+        ])
+
+        # Act
+        df = extract_ear_df("ear_pkg", "2023-01-01", "2023-01-31")
+
+        # Assert
+        mock_chunks.assert_called_once_with(
+            "ear_pkg", pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-31"), PIPELINE_CHUNK_ROWS,
+            columns=PIPELINE_COLUMNS
+        )
+        self.assertEqual(df.index.tolist(), [0, 1])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['ear_data']))
+        self.assertEqual(df['ear_data'].tolist(), [pd.Timestamp('2023-01-01'), pd.Timestamp('2023-01-02')])
+        self.assertEqual(df['nom_reservatorio'].iloc[0], 'Furnas')
+        self.assertTrue(pd.isna(df['nom_reservatorio'].iloc[1]))
+        self.assertEqual(df['ear_reservatorio_percentual'].dtype, 'float64')
+
+    @patch('app.pipeline.extractors.ons_extractor.iter_reservoir_chunks')
+    def test_extract_ear_df_without_parquet_returns_empty(self, mock_chunks):
+        # Arrange
+        mock_chunks.return_value = iter([])
+
+        # Act
+        df = extract_ear_df("ear_pkg", "2023-01-01", "2023-01-31")
+
+        # Assert
+        self.assertTrue(df.empty)
+
+    @patch('app.pipeline.extractors.ons_extractor.iter_reservoir_chunks')
+    def test_extract_ear_df_keeps_categorical_names_stripped(self, mock_chunks):
+        # Arrange
+        mock_chunks.return_value = iter([
+            pd.DataFrame({'nom_reservatorio': pd.Categorical([' Furnas', 'Furnas ', '', None])}),
+            pd.DataFrame({'nom_reservatorio': pd.Categorical(['Tucurui', ' Furnas'])}),
+        ])
+
+        # Act
+        df = extract_ear_df("ear_pkg", "2023-01-01", "2023-01-31")
+
+        # Assert
+        self.assertIsInstance(df['nom_reservatorio'].dtype, pd.CategoricalDtype)
+        self.assertEqual(
+            df['nom_reservatorio'].astype(object).where(df['nom_reservatorio'].notna(), None).tolist(),
+            ['Furnas', 'Furnas', None, None, 'Tucurui', 'Furnas']
+        )
+
+    @patch('app.pipeline.extractors.ons_extractor.fetch_package_metadata')
+    @patch('app.pipeline.extractors.ons_extractor.find_parquet_url')
+    @patch('app.pipeline.extractors.ons_extractor.read_parquet_from_url')
+    def test_extract_registry_df_reads_only_pipeline_columns(self, mock_read, mock_find, mock_fetch):
+        # Arrange
+        mock_fetch.return_value = {"id": "meta"}
+        mock_find.return_value = "http://fake.url/registry.parquet"
+        mock_read.return_value = pd.DataFrame({'nom_reservatorio': ['Furnas'], 'id_reservatorio': ['FUR']})
+
+        # Act
+        df = extract_registry_df("registry_pkg")
+
+        # Assert
+        mock_read.assert_called_once_with("http://fake.url/registry.parquet", columns=PIPELINE_COLUMNS)
+        self.assertEqual(df.to_dict(orient="records"), [{'nom_reservatorio': 'Furnas', 'id_reservatorio': 'FUR'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,21 +1,37 @@
+import io
+import json
+import os
+import tempfile
+import time
 import unittest
+from datetime import date
 from unittest.mock import patch, MagicMock, call
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from fastapi.responses import JSONResponse
 
+from app.services import ons_service
 from app.services.ons_service import (
+    clear_metadata_cache,
     fetch_package_metadata,
     find_parquet_url,
     read_parquet_from_url,
     get_reservoir_data,
     records_from_dataframe,
+    build_parquet_filter,
+    iter_reservoir_chunks,
+    RecordsJSONResponse,
 )
+from app.services.query_cache import encode_cursor
 
 class TestOnsService(unittest.TestCase):
 
     def setUp(self):
         # Clear cache before each test to ensure isolation
-        fetch_package_metadata.cache_clear()
+        clear_metadata_cache()
+        ons_service._query_cache.clear()
 
     @patch('app.services.ons_service._session.get')
     def test_fetch_package_metadata_success(self, mock_get):
@@ -59,18 +75,97 @@ class TestOnsService(unittest.TestCase):
         self.assertEqual(find_parquet_url(metadata), "http://example.com/data-2023.parquet") # No year
         self.assertIsNone(find_parquet_url({"resources": []}))
 
-    @patch('pandas.read_parquet')
-    def test_read_parquet_from_url_success(self, mock_read_parquet):
+    @patch.object(ons_service._parquet_cache, 'max_bytes', 0)
+    @patch('app.services.ons_service._session.head')
+    @patch('app.services.ons_service._session.get')
+    def test_read_parquet_from_url_success(self, mock_get, mock_head):
         # Arrange
-        mock_df = pd.DataFrame({'a': [1, 2]})
-        mock_read_parquet.return_value = mock_df
+        buf = io.BytesIO()
+        pd.DataFrame({'a': [1, 2]}).to_parquet(buf)
+        mock_head.return_value = MagicMock(status_code=200, url="http://fake.url/data.parquet", headers={})
+        mock_get.return_value = MagicMock(content=buf.getvalue())
 
         # Act
         df = read_parquet_from_url("http://fake.url/data.parquet")
 
         # Assert
-        self.assertTrue(df.equals(mock_df))
-        mock_read_parquet.assert_called_once_with("http://fake.url/data.parquet", engine="pyarrow")
+        self.assertEqual(df['a'].tolist(), [1, 2])
+        mock_get.assert_called_once_with("http://fake.url/data.parquet", timeout=(5, 60))
+
+    @patch('app.services.ons_service._parquet_cache.fetch')
+    def test_read_parquet_from_url_uses_disk_cache(self, mock_fetch):
+        # Arrange
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "data.parquet")
+            pd.DataFrame({'a': [1, 2]}).to_parquet(path)
+            mock_fetch.return_value = path
+
+            # Act
+            df = read_parquet_from_url("http://fake.url/data.parquet")
+
+        # Assert
+        mock_fetch.assert_called_once_with("http://fake.url/data.parquet", ons_service._session)
+        self.assertEqual(df['a'].tolist(), [1, 2])
+
+    @patch('app.services.ons_service._parquet_cache.fetch')
+    def test_read_parquet_from_url_pushes_filters_and_projection(self, mock_fetch):
+        # Arrange
+        table = pa.table({
+            'ear_data': pa.array([date(2023, 1, d) for d in range(1, 11)], pa.date32()),
+            'nom_reservatorio': ['Furnas', 'TRÊS MARIAS'] * 5,
+            'val': list(range(10)),
+            'extra': ['x'] * 10,
+        })
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "data.parquet")
+            pq.write_table(table, path, row_group_size=2)
+            mock_fetch.return_value = path
+
+            # Act
+            df = read_parquet_from_url(
+                "http://fake.url/data.parquet",
+                columns=['val'],
+                start_ts=pd.Timestamp('2023-01-03'),
+                end_ts=pd.Timestamp('2023-01-08 12:00'),
+            )
+
+        # Assert
+        self.assertEqual(list(df.columns), ['val', 'ear_data'])
+        self.assertEqual(df['val'].tolist(), [2, 3, 4, 5, 6, 7])
+        self.assertEqual(str(df['ear_data'].dtype), 'datetime64[ms]')
+
+    @patch('app.services.ons_service.resolve_reservoir_urls')
+    @patch('app.services.ons_service._parquet_cache.fetch')
+    def test_iter_reservoir_chunks_reads_whole_range_in_bounded_chunks(self, mock_fetch, mock_urls):
+        # Arrange
+        table = pa.table({
+            'ear_data': pa.array([date(2023, 1, d) for d in range(1, 31)], pa.date32()),
+            'val': list(range(30)),
+            'extra': ['x'] * 30,
+        })
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "data.parquet")
+            pq.write_table(table, path, row_group_size=8)
+            mock_fetch.return_value = path
+            mock_urls.return_value = ["http://fake.url/2023.parquet"]
+
+            # Act
+            chunks = list(iter_reservoir_chunks(
+                "pkg", pd.Timestamp('2023-01-03'), pd.Timestamp('2023-01-27'), 5, columns=['ear_data', 'val']
+            ))
+
+        # Assert
+        self.assertTrue(all(len(c) <= 5 for c in chunks))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(pd.concat(chunks)['val'].tolist(), list(range(2, 27)))
+        self.assertEqual(list(chunks[0].columns), ['ear_data', 'val'])
+
+    def test_build_parquet_filter_skips_non_native_predicates(self):
+        # Arrange
+        schema = pa.schema([('ear_data', pa.string()), ('nom_reservatorio', pa.string())])
+
+        # Act & Assert
+        self.assertIsNone(build_parquet_filter(schema, pd.Timestamp('2023-01-01'), pd.Timestamp('2023-12-31')))
 
     def test_records_from_dataframe(self):
         # Arrange
@@ -87,6 +182,44 @@ class TestOnsService(unittest.TestCase):
         ]
         self.assertEqual(records, expected)
 
+    def test_records_from_dataframe_converts_column_types(self):
+        # Arrange
+        df = pd.DataFrame({
+            'data': pd.to_datetime(['2023-01-15 10:30', None]),
+            'val': [float('inf'), 2.5],
+            'nome': pd.Categorical([' Furnas ', None]),
+            'vazio': ['  ', 'x'],
+            'misto': [np.int64(3), 'y '],
+            'flag': [True, False],
+        })
+
+        # Act
+        records = records_from_dataframe(df)
+
+        # Assert
+        expected = [
+            {'data': '2023-01-15', 'val': None, 'nome': 'Furnas', 'vazio': None, 'misto': 3, 'flag': True},
+            {'data': None, 'val': 2.5, 'nome': None, 'vazio': 'x', 'misto': 'y', 'flag': False},
+        ]
+        self.assertEqual(records, expected)
+
+    def test_records_json_response_matches_json_response_bytes(self):
+        # Arrange
+        frames = [
+            pd.DataFrame({'nome': ['Três Marias', 'Furnas'], 'val': [45.37, 1e-5]}),
+            pd.DataFrame({'nome': ['Três Marias', 'Furnas'], 'val': [45.37, 1e3]}),
+        ]
+
+        for df in frames:
+            content = {"page": 1, "data": records_from_dataframe(df)}
+
+            # Act
+            body = RecordsJSONResponse(content, frame=df).body
+
+            # Assert
+            self.assertEqual(body, JSONResponse(content).body)
+
+    @patch('app.services.ons_service.ONS_LAZY_PAGES', False)
     @patch('app.services.ons_service.fetch_package_metadata')
     @patch('app.services.ons_service.find_parquet_url')
     @patch('app.services.ons_service.read_parquet_from_url')
@@ -113,7 +246,111 @@ class TestOnsService(unittest.TestCase):
 
         mock_fetch_meta.assert_called_once_with("pkg_id")
         mock_find_url.assert_called_once_with({"id": "meta"}, 2023)
-        mock_read_parquet.assert_called_once_with("http://fake.url/2023.parquet")
+        mock_read_parquet.assert_called_once_with(
+            "http://fake.url/2023.parquet",
+            columns=None,
+            start_ts=pd.Timestamp("2023-01-01"),
+            end_ts=pd.Timestamp("2023-12-31"),
+        )
+
+    @patch('app.services.ons_service.ONS_LAZY_PAGES', False)
+    @patch('app.services.ons_service.fetch_package_metadata')
+    @patch('app.services.ons_service.find_parquet_url')
+    @patch('app.services.ons_service.read_parquet_from_url')
+    def test_get_reservoir_data_reads_years_concurrently_in_order(self, mock_read_parquet, mock_find_url, mock_fetch_meta):
+        # Arrange
+        mock_fetch_meta.return_value = {"id": "meta"}
+        mock_find_url.side_effect = lambda metadata, year: f"http://fake.url/{year}.parquet"
+        running = []
+        peak = []
+
+        def slow_read(url, **kwargs):
+            running.append(url)
+            peak.append(len(running))
+            time.sleep(0.05)
+            running.remove(url)
+            year = int(url.rsplit("/", 1)[1].split(".")[0])
+            return pd.DataFrame({'data': pd.to_datetime([f'{year}-06-01']), 'ano': [year]})
+
+        mock_read_parquet.side_effect = slow_read
+
+        # Act
+        response = get_reservoir_data("pkg_id", None, None, None, "2020-01-01", "2023-12-31", 1, 10)
+
+        # Assert
+        body = json.loads(response.body)
+        self.assertEqual([r['ano'] for r in body['data']], [2020, 2021, 2022, 2023])
+        self.assertEqual(mock_read_parquet.call_count, 4)
+        self.assertGreater(max(peak), 1)
+
+    @patch('app.services.ons_service.ONS_LAZY_PAGES', False)
+    @patch('app.services.ons_service.fetch_package_metadata')
+    @patch('app.services.ons_service.find_parquet_url')
+    @patch('app.services.ons_service.read_parquet_from_url')
+    def test_get_reservoir_data_cursor_pagination_reads_once(self, mock_read_parquet, mock_find_url, mock_fetch_meta):
+        # Arrange
+        mock_fetch_meta.return_value = {"id": "meta"}
+        mock_find_url.return_value = "http://fake.url/2023.parquet"
+        mock_read_parquet.return_value = pd.DataFrame({
+            'data': pd.date_range('2023-01-01', periods=5),
+            'val': [1, 2, 3, 4, 5],
+        })
+
+        # Act
+        first = json.loads(get_reservoir_data("pkg_id", 2023, None, None, None, None, 1, 2).body)
+        second = json.loads(get_reservoir_data("pkg_id", None, None, None, None, None, 1, 100,
+                                               cursor=first["next_cursor"]).body)
+        third = json.loads(get_reservoir_data("pkg_id", None, None, None, None, None, 1, 100,
+                                              cursor=second["next_cursor"]).body)
+
+        # Assert
+        self.assertEqual((first["total_rows"], first["total_pages"]), (5, 3))
+        self.assertEqual([r['val'] for r in first['data']], [1, 2])
+        self.assertEqual([r['val'] for r in second['data']], [3, 4])
+        self.assertEqual(second["page"], 2)
+        self.assertEqual([r['val'] for r in third['data']], [5])
+        self.assertFalse(third["has_more"])
+        self.assertIsNone(third["next_cursor"])
+        mock_read_parquet.assert_called_once()
+
+    def test_get_reservoir_data_invalid_cursor(self):
+        # Act
+        response = get_reservoir_data("pkg_id", None, None, None, None, None, 1, 10, cursor="não-é-cursor")
+
+        # Assert
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Cursor", response.body.decode())
+
+    def test_get_reservoir_data_rejects_incomplete_or_foreign_cursor(self):
+        # Arrange
+        query = {"package_id": "pkg_id", "ano": 2023, "mes": None, "nome_reservatorio": None,
+                 "start_date": None, "end_date": None, "columns": None}
+        incomplete = encode_cursor({k: v for k, v in query.items() if k != "ano"}, 10, 10)
+        foreign = encode_cursor({**query, "package_id": "outro_pkg"}, 10, 10)
+
+        # Act
+        responses = [get_reservoir_data("pkg_id", None, None, None, None, None, 1, 10, cursor=c)
+                     for c in (incomplete, foreign)]
+
+        # Assert
+        self.assertEqual([r.status_code for r in responses], [400, 400])
+        self.assertIn("Cursor", responses[0].body.decode())
+        self.assertIn("package_id", responses[1].body.decode())
+
+    @patch('app.services.ons_service.ONS_LAZY_PAGES', True)
+    @patch('app.services.ons_service.load_reservoir_pages')
+    def test_get_reservoir_data_returns_404_when_page_plan_cannot_be_rebuilt(self, mock_load_pages):
+        # Arrange
+        stale = MagicMock(nbytes=0)
+        stale.page.side_effect = FileNotFoundError("blob removido")
+        mock_load_pages.side_effect = [stale, None]
+
+        # Act
+        response = get_reservoir_data("pkg_id", 2023, None, None, None, None, 1, 10)
+
+        # Assert
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(mock_load_pages.call_count, 2)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+import requests
+
+from app.services.parquet_cache import ParquetCache
+
+
+def make_response(status_code, content=b"", headers=None):
+    resp = MagicMock()
+    resp.status_code = status_code
+    resp.headers = headers or {}
+    resp.iter_content.return_value = [content]
+    resp.__enter__.return_value = resp
+    if status_code >= 400:
+        resp.raise_for_status.side_effect = requests.HTTPError(str(status_code))
+    return resp
+
+
+class TestParquetCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ParquetCache(self.tmpdir.name, max_bytes=1024)
+        self.session = MagicMock()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_fetch_downloads_and_stores_content(self):
+        # Arrange
+        self.session.get.return_value = make_response(200, b"PAR1data", {"ETag": '"v1"'})
+
+        # Act
+        path = self.cache.fetch("http://fake.url/2023.parquet", self.session)
+
+        # Assert
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"PAR1data")
+        self.assertEqual(self.cache.lookup("http://fake.url/2023.parquet")["etag"], '"v1"')
+        self.session.get.assert_called_once_with(
+            "http://fake.url/2023.parquet", headers={}, stream=True, timeout=(5, 60)
+        )
+
+    def test_fetch_revalidates_with_conditional_request(self):
+        # Arrange
+        self.session.get.side_effect = [
+            make_response(200, b"PAR1data", {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}),
+            make_response(304),
+        ]
+        first = self.cache.fetch("http://fake.url/2023.parquet", self.session)
+
+        # Act
+        second = self.cache.fetch("http://fake.url/2023.parquet", self.session)
+
+        # Assert
+        self.assertEqual(first, second)
+        _, kwargs = self.session.get.call_args
+        self.assertEqual(kwargs["headers"], {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+        })
+
+    def test_fetch_serves_cached_copy_when_validation_fails(self):
+        # Arrange
+        self.session.get.side_effect = [
+            make_response(200, b"PAR1data", {"ETag": '"v1"'}),
+            requests.ConnectionError("offline"),
+        ]
+        first = self.cache.fetch("http://fake.url/2023.parquet", self.session)
+
+        # Act
+        second = self.cache.fetch("http://fake.url/2023.parquet", self.session)
+
+        # Assert
+        self.assertEqual(first, second)
+
+    def test_identical_content_is_stored_once(self):
+        # Arrange
+        self.session.get.side_effect = [make_response(200, b"same"), make_response(200, b"same")]
+
+        # Act
+        a = self.cache.fetch("http://fake.url/a.parquet", self.session)
+        b = self.cache.fetch("http://fake.url/b.parquet", self.session)
+
+        # Assert
+        self.assertEqual(a, b)
+        self.assertEqual(len(os.listdir(os.path.join(self.tmpdir.name, "blobs"))), 1)
+
+    def test_evicts_least_recently_used_blob(self):
+        # Arrange
+        self.session.get.side_effect = [
+            make_response(200, b"a" * 400),
+            make_response(200, b"b" * 400),
+            make_response(304),
+            make_response(200, b"c" * 400),
+        ]
+        self.cache.fetch("http://fake.url/a.parquet", self.session)
+        path_b = self.cache.fetch("http://fake.url/b.parquet", self.session)
+        os.utime(path_b, (0, 0))  # b passa a ser o menos usado...
+        self.cache.fetch("http://fake.url/a.parquet", self.session)  # ...e a é renovado
+
+        # Act
+        self.cache.fetch("http://fake.url/c.parquet", self.session)
+
+        # Assert
+        self.assertIsNotNone(self.cache.lookup("http://fake.url/a.parquet"))
+        self.assertIsNone(self.cache.lookup("http://fake.url/b.parquet"))
+        self.assertIsNotNone(self.cache.lookup("http://fake.url/c.parquet"))
+
+
+if __name__ == '__main__':
+    unittest.main()
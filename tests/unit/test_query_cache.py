@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from app.services.query_cache import QueryCache, decode_cursor, encode_cursor, query_key
+
+
+class TestQueryCache(unittest.TestCase):
+
+    def test_get_returns_stored_value_until_ttl_expires(self):
+        # Arrange
+        cache = QueryCache(max_entries=4, ttl_seconds=10, max_bytes=1024)
+        with patch('app.services.query_cache.time.monotonic', return_value=100.0):
+            cache.put("k", "valor", size=1)
+
+        # Act & Assert
+        with patch('app.services.query_cache.time.monotonic', return_value=105.0):
+            self.assertEqual(cache.get("k"), "valor")
+        with patch('app.services.query_cache.time.monotonic', return_value=111.0):
+            self.assertIsNone(cache.get("k"))
+
+    def test_evicts_least_recently_used_by_entries_and_bytes(self):
+        # Arrange
+        cache = QueryCache(max_entries=2, ttl_seconds=60, max_bytes=10)
+        cache.put("a", 1, size=4)
+        cache.put("b", 2, size=4)
+        cache.get("a")
+
+        # Act
+        cache.put("c", 3, size=4)
+
+        # Assert
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_dataframe_size_is_measured(self):
+        # Arrange
+        cache = QueryCache(max_entries=2, ttl_seconds=60, max_bytes=16)
+
+        # Act
+        cache.put("grande", pd.DataFrame({'a': range(100)}))
+
+        # Assert
+        self.assertIsNone(cache.get("grande"))
+
+    def test_cursor_round_trip(self):
+        # Arrange
+        query = {"package_id": "pkg", "ano": 2023, "mes": None}
+
+        # Act
+        decoded = decode_cursor(encode_cursor(query, 200, 100))
+
+        # Assert
+        self.assertEqual(decoded, (query, 200, 100))
+        self.assertEqual(query_key(query), query_key(dict(reversed(list(query.items())))))
+
+    def test_decode_cursor_rejects_garbage(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("###")
+
+    def test_decode_cursor_checks_query_fields_and_types(self):
+        # Arrange
+        fields = {"package_id": (str,), "ano": (int, type(None)), "columns": (list, type(None))}
+        valid = {"package_id": "pkg", "ano": 2023, "columns": ["val"]}
+        invalid = [
+            {"package_id": "pkg", "columns": None},                         # falta ano
+            {"package_id": "pkg", "ano": "2023", "columns": None},          # tipo errado
+            {"package_id": "pkg", "ano": True, "columns": None},            # bool não é ano
+            {"package_id": "pkg", "ano": None, "columns": [1]},             # lista de não-texto
+            {"package_id": "pkg", "ano": None, "columns": None, "x": 1},    # campo a mais
+        ]
+
+        # Act & Assert
+        self.assertEqual(decode_cursor(encode_cursor(valid, 0, 10), fields)[0], valid)
+        for query in invalid:
+            with self.subTest(query=query), self.assertRaises(ValueError):
+                decode_cursor(encode_cursor(query, 0, 10), fields)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from app.services import ons_service
+from app.services.ons_service import clear_metadata_cache, get_reservoir_data
+from app.services.reservoir_index import IndexedFrame, filter_by_names, parse_reservoir_names
+
+
+def make_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "nom_reservatorio": ["Três Marias", "FURNAS", None, "Sobradinho", "Furnas", "Tres Irmaos"],
+        "ear_data": pd.to_datetime(["2023-01-01", "2023-01-01", "2023-01-02", "2023-01-02", "2023-01-03", "2023-01-03"]),
+        "val": [1, 2, 3, 4, 5, 6],
+    })
+
+
+class TestReservoirIndex(unittest.TestCase):
+
+    def setUp(self):
+        clear_metadata_cache()
+        ons_service._query_cache.clear()
+
+    def test_parse_reservoir_names_normalizes_and_splits(self):
+        # Act
+        names = parse_reservoir_names(" Três Marias, furnas,,TRES marias ")
+
+        # Assert
+        self.assertEqual(names, ["tres marias", "furnas"])
+        self.assertEqual(parse_reservoir_names(None), [])
+
+    def test_select_ignores_accents_and_case_and_keeps_row_order(self):
+        # Arrange
+        indexed = IndexedFrame(make_frame())
+
+        # Act
+        df = indexed.select(parse_reservoir_names("furnas,três"), columns=["val"])
+
+        # Assert
+        self.assertEqual(df["val"].tolist(), [1, 2, 5, 6])
+        self.assertEqual(df.columns.tolist(), ["val"])
+        self.assertEqual(df.index.tolist(), [0, 1, 2, 3])
+
+    def test_filter_by_names_matches_categorical_frames(self):
+        # Arrange
+        df = make_frame()
+        compact = df.assign(nom_reservatorio=df["nom_reservatorio"].astype("category"))
+
+        # Act
+        result = filter_by_names(compact, ["furnas"])
+
+        # Assert
+        self.assertEqual(result["val"].tolist(), [2, 5])
+        self.assertTrue(filter_by_names(df, ["itaipu"]).empty)
+        self.assertIs(filter_by_names(df, []), df)
+
+    @patch('app.services.ons_service.fetch_package_metadata')
+    @patch('app.services.ons_service.find_parquet_url')
+    @patch('app.services.ons_service.read_parquet_from_url')
+    def test_get_reservoir_data_reuses_base_frame_across_names(self, mock_read_parquet, mock_find_url, mock_fetch_meta):
+        # Arrange
+        mock_fetch_meta.return_value = {"id": "meta"}
+        mock_find_url.return_value = "http://fake.url/2023.parquet"
+        mock_read_parquet.return_value = make_frame()
+
+        # Act
+        furnas = get_reservoir_data("pkg_id", None, None, "furnas", "2023-01-01", "2023-12-31", 1, 10)
+        tres = get_reservoir_data("pkg_id", None, None, "tres", "2023-01-01", "2023-12-31", 1, 10)
+
+        # Assert
+        mock_read_parquet.assert_called_once()
+        self.assertEqual([r["val"] for r in json.loads(furnas.body)["data"]], [2, 5])
+        self.assertEqual([r["val"] for r in json.loads(tres.body)["data"]], [1, 6])
+
+
+if __name__ == '__main__':
+    unittest.main()
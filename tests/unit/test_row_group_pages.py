@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services import ons_service
+from app.services.ons_service import get_reservoir_data
+from app.services.row_group_pages import RowGroup, RowGroupPages
+
+
+def write_year(directory: str, year: int, text_dates: bool = False) -> str:
+    dates = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq="D")
+    rng = np.random.default_rng(year)
+    df = pd.DataFrame({
+        "nom_reservatorio": rng.choice(["Furnas", "Sobradinho"], len(dates)),
+        "din_instante": dates.strftime("%d/%m/%Y") if text_dates else dates,
+        "val_volumeutilcon": np.round(rng.random(len(dates)) * 100, 2),
+    })
+    path = os.path.join(directory, f"hydro-{year}.parquet")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=50)
+    return path
+
+
+class TestRowGroupPages(unittest.TestCase):
+
+    def setUp(self):
+        ons_service._query_cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def serve(self, paths):
+        patches = [
+            patch('app.services.ons_service.fetch_package_metadata', return_value={"id": "meta"}),
+            patch('app.services.ons_service.find_parquet_url', side_effect=lambda metadata, year: f"http://fake.url/{year}"),
+            patch('app.services.ons_service._fetch_parquet_source', side_effect=lambda url: paths[int(url.rsplit("/", 1)[1])]),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def read_pages(self, start_date, end_date, page_size, pages):
+        return [json.loads(get_reservoir_data("pkg", None, None, None, start_date, end_date, page, page_size).body)
+                for page in pages]
+
+    def test_pages_match_full_read(self):
+        for text_dates in (False, True):
+            with self.subTest(text_dates=text_dates):
+                # Arrange
+                ons_service._query_cache.clear()
+                self.serve({year: write_year(self.tmp.name, year, text_dates) for year in (2022, 2023)})
+
+                # Act
+                lazy = self.read_pages("2022-06-10", "2023-02-03", 37, range(1, 10))
+                with patch('app.services.ons_service.ONS_LAZY_PAGES', False):
+                    full = self.read_pages("2022-06-10", "2023-02-03", 37, range(1, 10))
+
+                # Assert
+                self.assertEqual(lazy, full)
+                self.assertEqual(lazy[0]["total_rows"], 239)
+                self.assertFalse(lazy[-1]["has_more"])
+
+    def test_only_row_groups_covering_the_page_are_decoded(self):
+        # Arrange
+        self.serve({2023: write_year(self.tmp.name, 2023)})
+        read_row_group = pq.ParquetFile.read_row_group
+        decoded = []
+
+        def spy(pf, i, *args, **kwargs):
+            decoded.append(i)
+            return read_row_group(pf, i, *args, **kwargs)
+
+        # Act
+        with patch.object(pq.ParquetFile, 'read_row_group', autospec=True, side_effect=spy):
+            body = self.read_pages("2023-03-01", "2023-12-31", 10, [3])[0]
+
+        # Assert
+        # março começa no row group 1 (linhas 50-99), que as estatísticas não cobrem inteiro:
+        # só a coluna de data dele é lida no plano; a página (linhas 20-29 do filtro) está nele também
+        self.assertEqual(decoded, [1, 1])
+        self.assertEqual(body["total_rows"], 306)
+        self.assertEqual(body["data"][0]["din_instante"][:10], "2023-03-21")
+
+    def test_page_spans_row_group_boundaries(self):
+        # Arrange
+        frames = {i: pd.DataFrame({"v": range(i * 10, i * 10 + rows)}) for i, rows in enumerate([3, 0, 4, 2])}
+        groups = [RowGroup("f", i, len(df)) for i, df in frames.items()]
+        pages = RowGroupPages(groups, lambda group: frames[group.index])
+
+        # Act
+        middle = pages.page(2, 5)
+
+        # Assert
+        self.assertEqual(pages.total_rows, 9)
+        self.assertEqual(middle["v"].tolist(), [2, 20, 21, 22, 23])
+        self.assertEqual(pages.page(8, 5)["v"].tolist(), [31])
+        self.assertTrue(pages.page(9, 5).empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
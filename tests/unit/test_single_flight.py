@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pandas as pd
+
+from app.services import ons_service
+from app.services.single_flight import SingleFlight
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condição não atingida")
+        time.sleep(0.005)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_execution(self):
+        # Arrange
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def load():
+            calls.append(1)
+            release.wait(5)
+            return object()
+
+        # Act
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            futures = [pool.submit(flights.do, "pkg/2023", load) for _ in range(5)]
+            wait_for(lambda: flights.coalesced == 4)
+            release.set()
+            results = [f.result() for f in futures]
+
+        # Assert
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(flights.stats(), {"fresh": 1, "coalesced": 4, "in_flight": 0})
+
+    def test_errors_reach_every_waiter_and_are_not_kept(self):
+        # Arrange
+        flights = SingleFlight()
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise ConnectionError("fora do ar")
+
+        # Act
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(flights.do, "k", fail) for _ in range(3)]
+            wait_for(lambda: flights.coalesced == 2)
+            release.set()
+            errors = [f.exception() for f in futures]
+        retried = flights.do("k", lambda: "ok")
+
+        # Assert
+        self.assertTrue(all(isinstance(e, ConnectionError) for e in errors))
+        self.assertEqual(retried, "ok")
+        self.assertEqual(flights.fresh, 2)
+
+    @patch('app.services.ons_service._read_parquet_frame')
+    def test_read_parquet_from_url_coalesces_identical_reads(self, mock_read):
+        # Arrange
+        release = threading.Event()
+
+        def slow_read(*args):
+            release.wait(5)
+            return pd.DataFrame({"nom_reservatorio": ["Furnas"], "val": [1.5]})
+
+        mock_read.side_effect = slow_read
+        flights = ons_service._parquet_flights
+        start = flights.stats()
+
+        # Act
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(ons_service.read_parquet_from_url, "http://fake.url/2023.parquet") for _ in range(3)]
+            other = pool.submit(ons_service.read_parquet_from_url, "http://fake.url/2023.parquet", columns=["val"])
+            wait_for(lambda: flights.coalesced - start["coalesced"] == 2 and flights.fresh - start["fresh"] == 2)
+            release.set()
+            frames = [f.result() for f in futures]
+            other.result()
+        frames[0]["extra"] = 1
+
+        # Assert
+        self.assertEqual(mock_read.call_count, 2)
+        self.assertNotIn("extra", frames[1].columns)
+        pd.testing.assert_frame_equal(frames[1], frames[2])
+        self.assertEqual(ons_service.download_metrics()["parquet"]["in_flight"], 0)
+
+
+    @patch('app.services.ons_service.load_reservoir_pages')
+    def test_page_plan_builds_are_reported_apart_from_parquet_reads(self, mock_load_pages):
+        # Arrange
+        ons_service._query_cache.clear()
+        mock_load_pages.return_value = None
+        parquet_before = ons_service.download_metrics()["parquet"]
+        plans_before = ons_service.download_metrics()["page_plans"]
+        query = {"package_id": "pkg", "columns": None, "nome_reservatorio": None}
+
+        # Act
+        ons_service._load_page_plan(query, pd.Timestamp("2023-01-01"), pd.Timestamp("2023-12-31"))
+        metrics = ons_service.download_metrics()
+
+        # Assert
+        self.assertEqual(metrics["parquet"], parquet_before)
+        self.assertEqual(metrics["page_plans"]["fresh"], plans_before["fresh"] + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+import pyarrow as pa
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import stream_service
+from app.services.ons_service import records_from_dataframe
+
+
+def make_frames():
+    return [
+        pd.DataFrame({'ear_data': pd.to_datetime(['2022-12-31']), 'nom_reservatorio': [' Furnas '], 'val': [1.5]}),
+        pd.DataFrame({'ear_data': pd.to_datetime(['2023-01-01', '2023-01-02']), 'nom_reservatorio': ['Sobradinho', ''],
+                      'val': [float('nan'), 2.0]}),
+    ]
+
+
+class TestStreamService(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_iter_ndjson_matches_json_records(self):
+        # Arrange
+        frames = make_frames()
+
+        # Act
+        with patch.object(stream_service, 'STREAM_BATCH_ROWS', 1):
+            body = b"".join(stream_service.iter_ndjson(frames))
+
+        # Assert
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        expected = records_from_dataframe(pd.concat(frames, ignore_index=True))
+        self.assertEqual(lines, expected)
+
+    def test_iter_arrow_streams_all_frames_with_first_schema(self):
+        # Arrange
+        frames = make_frames()
+
+        # Act
+        chunks = list(stream_service.iter_arrow(frames))
+
+        # Assert
+        self.assertGreater(len(chunks), 2)
+        table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.column('nom_reservatorio').to_pylist(), [' Furnas ', 'Sobradinho', ''])
+
+    def test_iter_arrow_column_null_in_first_frame_takes_later_text(self):
+        # Arrange
+        # ex.: nom_bacia vazia no parquet do primeiro ano (tipo null no Arrow) e preenchida no seguinte
+        frames = [
+            pd.DataFrame({'val': [1.0], 'nom_bacia': pd.Series([None], dtype=object)}),
+            pd.DataFrame({'val': [2.0, 3.0], 'nom_bacia': ['Grande', None]}),
+        ]
+
+        # Act
+        table = pa.ipc.open_stream(b"".join(stream_service.iter_arrow(frames))).read_all()
+
+        # Assert
+        self.assertEqual(table.schema.field('nom_bacia').type, pa.large_string())
+        self.assertEqual(table.column('nom_bacia').to_pylist(), [None, 'Grande', None])
+
+    def test_iter_arrow_column_type_changing_between_frames(self):
+        # Arrange
+        # ex.: ear_total_mwmes inteiro no primeiro ano e float64 (com NaN e frações) no seguinte
+        frames = [
+            pd.DataFrame({'ano': [2022], 'ear_total_mwmes': pd.Series([10], dtype='int64')}),
+            pd.DataFrame({'ano': [2023, 2023], 'ear_total_mwmes': [12.5, float('nan')], 'extra': ['x', 'y']}),
+            pd.DataFrame({'ano': [2024]}),
+        ]
+
+        # Act
+        table = pa.ipc.open_stream(b"".join(stream_service.iter_arrow(frames))).read_all()
+
+        # Assert
+        self.assertEqual(table.schema.field('ear_total_mwmes').type, pa.float64())
+        self.assertEqual(table.column('ear_total_mwmes').to_pylist(), [10.0, 12.5, None, None])
+        self.assertEqual(table.column('ano').to_pylist(), [2022, 2023, 2023, 2024])
+        self.assertEqual(table.column_names, ['ano', 'ear_total_mwmes'])
+
+    def test_iter_arrow_without_frames_is_a_valid_empty_stream(self):
+        # Act
+        table = pa.ipc.open_stream(b"".join(stream_service.iter_arrow([]))).read_all()
+
+        # Assert
+        self.assertEqual(table.num_rows, 0)
+
+    @patch('app.services.ons_service.iter_parquet_chunks')
+    @patch('app.services.stream_service.resolve_reservoir_urls')
+    def test_ear_endpoint_streams_ndjson(self, mock_resolve, mock_chunks):
+        # Arrange
+        urls = ["http://fake.url/2022.parquet", "http://fake.url/2023.parquet"]
+        mock_resolve.return_value = urls
+        frames = dict(zip(urls, make_frames()))
+        mock_chunks.side_effect = lambda url, chunk_rows, **kwargs: iter([frames[url]])
+
+        # Act
+        response = self.client.get("/api/data/ear", params={
+            "package_id": "pkg", "start_date": "2022-12-01", "end_date": "2023-01-31", "format": "ndjson"
+        })
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        lines = response.text.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])["ear_data"], "2022-12-31")
+        # lido em lotes do record batch reader, não o parquet anual inteiro
+        self.assertEqual([call.args for call in mock_chunks.call_args_list],
+                         [(url, stream_service.STREAM_BATCH_ROWS) for url in urls])
+
+    @patch('app.services.stream_service.resolve_reservoir_urls')
+    def test_stream_returns_404_before_streaming(self, mock_resolve):
+        # Arrange
+        mock_resolve.return_value = []
+
+        # Act
+        response = self.client.get("/api/data/hydro", params={"package_id": "pkg", "ano": 2023, "format": "arrow"})
+
+        # Assert
+        self.assertEqual(response.status_code, 404)
+
+    def test_rejects_unknown_format(self):
+        # Act
+        response = self.client.get("/api/data/registry", params={"package_id": "pkg", "format": "xml"})
+
+        # Assert
+        self.assertEqual(response.status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
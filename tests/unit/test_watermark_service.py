@@ -0,0 +1,53 @@
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+
+from google.cloud.exceptions import NotFound
+
+from app.services.gcs_service import reset_storage_clients
+from app.services.watermark_service import read_watermark, write_watermark
+
+
+class TestWatermarkService(unittest.TestCase):
+
+    def setUp(self):
+        reset_storage_clients()
+
+    @patch('google.cloud.storage.Client')
+    def test_read_watermark_missing_returns_none(self, mock_storage_client):
+        # Arrange
+        mock_blob = MagicMock()
+        mock_blob.download_as_text.side_effect = NotFound("missing")
+        mock_storage_client.return_value.bucket.return_value.blob.return_value = mock_blob
+
+        # Act
+        result = read_watermark("bucket", "ear_pkg")
+
+        # Assert
+        self.assertIsNone(result)
+        mock_storage_client.return_value.bucket.return_value.blob.assert_called_once_with(
+            "Data_Engineering/watermarks/ear_pkg.json"
+        )
+
+    @patch('google.cloud.storage.Client')
+    def test_write_then_read_watermark(self, mock_storage_client):
+        # Arrange
+        stored = {}
+        mock_blob = MagicMock()
+        mock_blob.upload_from_string.side_effect = lambda data, content_type: stored.update(data=data)
+        mock_blob.download_as_text.side_effect = lambda: stored["data"]
+        mock_storage_client.return_value.bucket.return_value.blob.return_value = mock_blob
+
+        # Act
+        write_watermark("bucket", "ear_pkg", "2023-03-01", {"val": [0.0, 10.0]}, {"hydro_package_id": "hydro"})
+        result = read_watermark("bucket", "ear_pkg")
+
+        # Assert
+        self.assertEqual(result["last_date"], "2023-03-01")
+        self.assertEqual(result["scale"], {"val": [0.0, 10.0]})
+        self.assertEqual(result["hydro_package_id"], "hydro")
+        self.assertEqual(json.loads(stored["data"])["package_id"], "ear_pkg")
+
+
+if __name__ == '__main__':
+    unittest.main()